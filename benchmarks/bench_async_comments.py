@@ -0,0 +1,45 @@
+"""
+抓取一个景点全部评论页：逐页next_page vs iter_all_comments并发抓取，桩接口每页延迟固定时间
+
+python -m benchmarks.bench_async_comments
+"""
+import asyncio
+import time
+from unittest import mock
+from src.transport import HttpTransport
+from src.xiecheng import CommentView, ParserBackend
+from tests.support import CommentSite, collect
+
+
+def __sequential__(view: CommentView) -> int:
+    count = 0
+    view.page_now = 0
+    while len(view.next_page()) > 0:
+        count += len(view.current_view)
+    return count
+
+
+def main(pages: int = 100, latency: float = 0.02, concurrency: int = 8):
+    site = CommentSite(pages, latency)
+    with site.server() as server, mock.patch.object(CommentView, 'comment_url', server.url('/comment')):
+        url = server.url('/sight/guangzhou152/107540.html')
+        view = CommentView(transport=HttpTransport(pool_maxsize=concurrency), parser=ParserBackend.LXML,
+                           cache_size=0)
+        view.resolve_sight(url)
+        start = time.perf_counter()
+        before = __sequential__(view)
+        before_seconds = time.perf_counter() - start
+
+        view.resolve_sight(url)
+        start = time.perf_counter()
+        after = len(asyncio.run(collect(view, concurrency)))
+        after_seconds = time.perf_counter() - start
+    assert before == after == pages * 3
+    print("{0}页评论，每页延迟{1:.0f}ms".format(pages, latency * 1000))
+    print("{0:32}{1:8.2f}s".format('next_page (before)', before_seconds))
+    print("{0:32}{1:8.2f}s".format('iter_all_comments(concurrency={0})'.format(concurrency), after_seconds))
+    print("加速比 {0:.2f}x".format(before_seconds / after_seconds))
+
+
+if __name__ == '__main__':
+    main()
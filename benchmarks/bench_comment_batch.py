@@ -0,0 +1,47 @@
+"""
+100万条评论的内存占用对比：SingleComment列表 vs CommentBatch列式存储
+
+python -m benchmarks.bench_comment_batch
+"""
+import gc
+import time
+import tracemalloc
+from src.comment_batch import CommentBatch
+from src.xiecheng import SingleComment
+
+__comment__ = '景色很好，排队时间有点长，适合带小孩周末来玩。'
+
+
+def __comments__(total: int):
+    for i in range(total):
+        yield SingleComment('旅行者{0}'.format(i % 50000), (i % 5 + 1) * 1.0, __comment__ + str(i),
+                            '2019-{0:02d}-{1:02d}'.format(i % 12 + 1, i % 28 + 1))
+
+
+def __measure__(build) -> tuple:
+    """
+    :return:(峰值内存MB, 保留内存MB, 耗时秒)
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak / 2 ** 20, current / 2 ** 20, elapsed
+
+
+def main(total: int = 1000000):
+    before = __measure__(lambda: list(__comments__(total)))
+    after = __measure__(lambda: CommentBatch.from_comments(__comments__(total)))
+    print("{0}条评论".format(total))
+    print("{0:16}{1:>12}{2:>12}{3:>10}".format('', '峰值MB', '保留MB', '秒'))
+    print("{0:16}{1:12.1f}{2:12.1f}{3:10.2f}".format('list(before)', *before))
+    print("{0:16}{1:12.1f}{2:12.1f}{3:10.2f}".format('CommentBatch', *after))
+    print("内存缩减 {0:.1f}x".format(before[1] / after[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+评论网页解析耗时对比：BeautifulSoup构建文档树 vs lxml直接XPath提取
+
+python -m benchmarks.bench_comment_parser
+"""
+import time
+from src.xiecheng import ParserBackend, parse_comment_page
+from tests.support import load_fixture
+
+
+def __page__(copies: int) -> str:
+    """
+    用样例网页中的评论拼出一页评论数较多的网页，接近线上每页10条评论的大小
+    """
+    html = load_fixture('comment_page.html')
+    start = html.index('<div class="comment_single')
+    end = html.index('<div class="comment_single_extra')
+    return html[:start] + html[start:end] * copies + html[end:]
+
+
+def __run__(html: str, parser: ParserBackend, rounds: int) -> float:
+    """
+    :return:每页平均耗时（毫秒）
+    """
+    parse_comment_page(html, parser)  # 预热
+    start = time.perf_counter()
+    for _ in range(rounds):
+        parse_comment_page(html, parser)
+    return (time.perf_counter() - start) * 1000 / rounds
+
+
+def main(rounds: int = 500):
+    html = __page__(4)
+    count = len(parse_comment_page(html, ParserBackend.LXML))
+    before = __run__(html, ParserBackend.BS4, rounds)
+    after = __run__(html, ParserBackend.LXML, rounds)
+    print("每页{0}条评论，{1}字节".format(count, len(html.encode('utf-8'))))
+    print("{0:12}{1:>12}".format('', '毫秒/页'))
+    print("{0:12}{1:12.3f}".format('bs4', before))
+    print("{0:12}{1:12.3f}".format('lxml', after))
+    print("加速比 {0:.2f}x".format(before / after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""
+各导出写入方式的吞吐：ExportFile.add_rows批量写入后close，记录每秒行数和文件大小。
+xls最多65536行，按60000行测试
+
+python -m benchmarks.bench_export_backends
+"""
+import os
+import tempfile
+import time
+from src.export_file import ExportFile, FileType
+from benchmarks.bench_export_streaming import fund_row
+
+
+def __write__(base: str, file_type: FileType, total: int) -> tuple:
+    """
+    :return:(每秒行数, 文件大小MB)
+    """
+    start = time.perf_counter()
+    writer = ExportFile(base, file_type)
+    writer.add_rows(fund_row(i) for i in range(total))
+    writer.close()
+    elapsed = time.perf_counter() - start
+    return total / elapsed, os.path.getsize(writer.file_name) / 2 ** 20
+
+
+def main(total: int = 200000):
+    print("{0:10}{1:>10}{2:>12}{3:>10}".format('', '行数', '行/秒', '文件MB'))
+    with tempfile.TemporaryDirectory() as directory:
+        for file_type in FileType:
+            rows = min(total, 60000) if file_type == FileType.XLS else total
+            try:
+                speed, size = __write__(os.path.join(directory, 'funds'), file_type, rows)
+            except ImportError as e:  # 没有安装对应的可选依赖
+                print("{0:10}跳过：{1}".format(file_type.value, e))
+                continue
+            print("{0:10}{1:10}{2:12.0f}{3:10.1f}".format(file_type.value, rows, speed, size))
+
+
+if __name__ == '__main__':
+    main()
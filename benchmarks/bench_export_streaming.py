@@ -0,0 +1,47 @@
+"""
+流式追加写入：按FundInfo.write_info的方式每40行保存一次。
+before为原先的xls追加（每次保存重新序列化整个工作簿，最多65536行，只测少量行数），
+after为csv、xlsx流式写入500000行，记录耗时和进程峰值内存（RSS），行数增加时峰值内存应基本不变
+
+python -m benchmarks.bench_export_streaming
+"""
+import os
+import resource
+import tempfile
+import time
+from src.export_file import ExportFile, FileModel, FileType
+
+
+def fund_row(i: int) -> list:
+    return ['基金{0}'.format(i), '{0:06d}'.format(i), 'J{0}'.format(i), '股票型', '中', '消费,医药']
+
+
+def __write__(base: str, file_type: FileType, total: int, streaming: bool, batch: int = 40) -> tuple:
+    """
+    :return:(耗时秒, 进程峰值内存MB)
+    """
+    start = time.perf_counter()
+    writer = ExportFile(base, file_type, FileModel.ADD, streaming)
+    for begin in range(0, total, batch):
+        writer.add_rows([fund_row(i) for i in range(begin, min(begin + batch, total))])
+        writer.save()
+    writer.close()
+    elapsed = time.perf_counter() - start
+    return elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux下单位为KB
+
+
+def main(total: int = 500000, before_rows: tuple = (1000, 2000, 4000)):
+    print("{0:24}{1:>10}{2:>10}{3:>12}".format('', '行数', '秒', '峰值RSS MB'))
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in before_rows:
+            seconds, peak = __write__(os.path.join(directory, 'before{0}'.format(rows)), FileType.XLS, rows, False)
+            print("{0:24}{1:10}{2:10.2f}{3:12.1f}".format('xls (before)', rows, seconds, peak))
+        for file_type in (FileType.CSV, FileType.XLSX):
+            for rows in (total // 5, total):
+                seconds, peak = __write__(os.path.join(directory, '{0}{1}'.format(file_type.value, rows)),
+                                          file_type, rows, True)
+                print("{0:24}{1:10}{2:10.2f}{3:12.1f}".format(file_type.value + ' streaming', rows, seconds, peak))
+
+
+if __name__ == '__main__':
+    main()
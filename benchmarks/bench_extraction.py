@@ -0,0 +1,58 @@
+"""
+热点提取路径的微基准：原先每次调用re.search/re.match/re.sub（先解码网页） vs extraction模块的预编译规则
+
+python -m benchmarks.bench_extraction
+"""
+import re
+import timeit
+from src.extraction import find_poiid, parse_sight_url, parse_star, parse_tab
+
+__url__ = 'https://you.ctrip.com/sight/guangzhou152/107540.html'
+# 接近线上大小的景点网页，poiid位于网页中部
+__page__ = ('<html>' + '<div class="item">景点介绍</div>' * 3000 + '<script>var poiid = "76865";</script>' +
+            '<div class="item">景点介绍</div>' * 3000 + '</html>').encode('utf-8')
+
+
+def __poiid_before__(content: bytes) -> int:
+    return int(re.search('poiid\\D+(\\d+)"', content.decode('utf-8')).group(1))
+
+
+def __sight_before__(url: str) -> tuple:
+    return (re.search('sight/([a-zA-Z]+)\\d', url).group(1).capitalize(),
+            int(re.search('sight/[a-zA-Z]+(\\d+)\\D', url).group(1)),
+            int(re.search('\\d+/(\\d+)\\Shtml', url).group(1)))
+
+
+def __star_before__(style: str) -> float:
+    return int(re.match('\\D+(\\d+)', style).group(1)) / 20
+
+
+def __tab_before__(text: str) -> tuple:
+    temp = re.match("(\\D+)(\\d+)", re.sub('\\s', '', text))
+    return temp.group(1), int(temp.group(2))
+
+
+def __sight_after__(url: str) -> tuple:
+    sight = parse_sight_url(url)
+    return sight.district_name, sight.district_id, sight.resource_id
+
+
+__cases__ = [
+    ('poiid', lambda: __poiid_before__(__page__), lambda: find_poiid(__page__), 2000),
+    ('sight_url', lambda: __sight_before__(__url__), lambda: __sight_after__(__url__), 200000),
+    ('star', lambda: __star_before__('width:80%'), lambda: parse_star('width:80%'), 200000),
+    ('tab', lambda: __tab_before__(' 景点 120 '), lambda: parse_tab(' 景点 120 '), 200000),
+]
+
+
+def main():
+    print("{0:12}{1:>14}{2:>14}{3:>10}".format('', 'before(us)', 'after(us)', '加速比'))
+    for name, before, after, number in __cases__:
+        assert before() == after()
+        before_us = min(timeit.repeat(before, number=number, repeat=3)) / number * 1e6
+        after_us = min(timeit.repeat(after, number=number, repeat=3)) / number * 1e6
+        print("{0:12}{1:14.3f}{2:14.3f}{3:9.2f}x".format(name, before_us, after_us, before_us / after_us))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+全部基金实时估值扫描一轮的耗时：原先逐只调用get_realtime_rate（按抽样耗时推算全部基金） vs FundWatcher.tick并发扫描。
+桩估值接口每个请求延迟latency秒模拟网络往返，要求10000只基金一轮在60秒内完成
+
+python -m benchmarks.bench_fund_watcher
+"""
+import time
+from src.fund_watcher import FundWatcher
+from src.tonghuashun import FundCodeInfo, FundInfo, FundTrend
+from src.transport import HttpTransport
+from tests.stub_server import StubServer, StubResponse
+from tests.support import valuation_payload
+
+
+def main(total: int = 10000, sample: int = 200, concurrency: int = 64, latency: float = 0.02):
+    def valuation(request):
+        time.sleep(latency)
+        special_code = request.query['info'][len('vm_fd_'):]
+        return StubResponse(valuation_payload(special_code, change=int(special_code[1:]) % 11 - 5))
+
+    with StubServer({'/': valuation}) as server:
+        fund_info = FundInfo(HttpTransport(pool_maxsize=concurrency))
+        fund_info.valuation_url = server.url('/?info=vm_fd_{0}&start={1}')
+        funds = [FundCodeInfo('{0:06d}'.format(i), 'J{0:06d}'.format(i)) for i in range(total)]
+
+        start = time.perf_counter()
+        for fund in funds[:sample]:
+            fund_info.get_realtime_rate(fund.spceial_code, FundTrend.ROSE)
+        before = (time.perf_counter() - start) * total / sample
+
+        watcher = FundWatcher(fund_info, funds, concurrency=concurrency)
+        start = time.perf_counter()
+        changes = watcher.tick()
+        after = time.perf_counter() - start
+        watcher.close()
+        fund_info.transport.close()
+
+    print("{0:32}{1:>12}".format('', '一轮秒数'))
+    print("{0:32}{1:12.1f}".format('逐只get_realtime_rate(before)', before))
+    print("{0:32}{1:12.1f}".format('FundWatcher.tick(after)', after))
+    print("基金数 {0}，区间变化 {1}，加速比 {2:.1f}x，{3}60秒".format(
+        total, len(changes), before / after, '未超过' if after <= 60 else '超过'))
+
+
+if __name__ == '__main__':
+    main()
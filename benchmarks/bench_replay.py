@@ -0,0 +1,72 @@
+"""
+回放基准测试：不访问线上接口，用录制的回放数据测量评论、景点列表、搜索和基金各场景的吞吐、解析耗时和内存峰值，
+并与benchmarks/replay_baseline.json比较，任一场景变慢或内存增加超过容忍比例时退出码为1。
+回放数据默认从本地桩站点录制；--live从线上接口录制到--archive指定的文件，之后可反复离线回放。
+基准结果与机器有关，换机器后先用--update-baseline重新生成
+
+python -m benchmarks.bench_replay
+python -m benchmarks.bench_replay --update-baseline
+python -m benchmarks.bench_replay --archive fixtures.db --live
+"""
+import argparse
+import os
+import sys
+import tempfile
+from src.replay import FixtureArchive, RecordingTransport, ReplayTransport, compare_results, run_benchmark, \
+    save_results
+from tests.support import record_site, scenarios
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'replay_baseline.json')
+
+
+def record_live(archive: FixtureArchive, pages: int):
+    transport = RecordingTransport(archive)
+    for name, scenario, args in scenarios(transport, pages=pages):
+        scenario(*args)
+    transport.close()
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description='回放基准测试')
+    parser.add_argument('--archive', help='回放数据SQLite文件，默认从本地桩站点录制到临时文件')
+    parser.add_argument('--live', action='store_true', help='从线上接口录制到--archive')
+    parser.add_argument('--pages', type=int, default=20, help='评论、景点列表的页数和搜索次数')
+    parser.add_argument('--repeat', type=int, default=5, help='每个场景运行次数，取最快的一次')
+    parser.add_argument('--latency', type=float, default=0, help='每个请求的模拟延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0, help='模拟延迟的波动范围（秒）')
+    parser.add_argument('--baseline', default=BASELINE, help='基准结果文件')
+    parser.add_argument('--update-baseline', action='store_true', help='用本次结果覆盖基准结果')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='容忍比例')
+    args = parser.parse_args(argv)
+    if args.live and not args.archive:
+        parser.error('--live需要指定--archive')
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.archive or os.path.join(directory, 'fixtures.db')
+        archive = FixtureArchive.open(path)
+        if args.live:
+            record_live(archive, args.pages)
+        elif len(archive) == 0:
+            record_site(archive, args.pages)
+        transport = ReplayTransport(archive, latency=args.latency, jitter=args.jitter, seed=0)
+        results = list()
+        for name, scenario, scenario_args in scenarios(transport, pages=args.pages):
+            runs = [run_benchmark(name, scenario, *scenario_args) for _ in range(args.repeat)]
+            results.append(min(runs, key=lambda result: result.seconds))
+        transport.close()
+        archive.close()
+
+    for result in results:
+        print(result)
+    if args.update_baseline or not os.path.exists(args.baseline):
+        save_results(results, args.baseline)
+        print("基准结果已保存到", args.baseline)
+        return 0
+    regressions = compare_results(results, args.baseline, args.tolerance)
+    for regression in regressions:
+        print("回退", regression)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+调度器前后的抓取吞吐对比：原先手写循环逐页请求 vs CrawlScheduler按域名并发和频率限制调度，
+两个域名（127.0.0.1与localhost指向同一个桩服务）各自限制并发数，任务列表中含重复页
+
+python -m benchmarks.bench_scheduler
+"""
+import time
+from urllib import parse
+from src.scheduler import CrawlScheduler, HostPolicy, Job, JobType
+from src.transport import HttpTransport
+from tests.stub_server import StubServer, StubResponse
+
+__latency__ = 0.01  # 模拟服务端每页耗时
+
+
+def __page__(request) -> StubResponse:
+    time.sleep(__latency__)
+    return StubResponse('<html>' + 'x' * 2048 + '</html>')
+
+
+def __urls__(port: int, pages: int) -> list:
+    urls = list()
+    for host in ('127.0.0.1', 'localhost'):
+        urls.extend('http://{0}:{1}/comment/{2}'.format(host, port, page) for page in range(pages))
+    return urls + urls[:pages // 4]  # 重复提交的页面
+
+
+def main(pages: int = 200, concurrency: int = 4, rate: float = 200):
+    with StubServer({'/': __page__}) as server:
+        port = parse.urlsplit(server.base_url).port
+        urls = __urls__(port, pages)
+        transport = HttpTransport(pool_maxsize=concurrency)
+
+        start = time.perf_counter()
+        seen = set()
+        for url in urls:
+            if url not in seen:
+                seen.add(url)
+                assert transport.get(url).status_code == 200
+        before = len(seen) / (time.perf_counter() - start)
+
+        def handler(job: Job):
+            assert transport.get(job.url).status_code == 200
+
+        policy = HostPolicy(concurrency, rate)
+        hosts = ['{0}:{1}'.format(host, port) for host in ('127.0.0.1', 'localhost')]  # 调度器按netloc区分域名
+        scheduler = CrawlScheduler(concurrency=concurrency * 2, host_policies=dict.fromkeys(hosts, policy))
+        scheduler.submit_all(Job(JobType.COMMENT_PAGE, url, handler) for url in urls)
+        start = time.perf_counter()
+        scheduler.run()
+        after = scheduler.completed / (time.perf_counter() - start)
+        transport.close()
+        assert not scheduler.failed and scheduler.completed == len(seen)
+        print("{0:28}{1:>12}".format('', '页/秒'))
+        print("{0:28}{1:12.0f}".format('手写循环(before)', before))
+        print("{0:28}{1:12.0f}".format('CrawlScheduler(after)', after))
+        print("重复任务 {0}，加速比 {1:.2f}x".format(scheduler.duplicates, after / before))
+
+
+if __name__ == '__main__':
+    main()
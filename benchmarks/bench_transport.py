@@ -0,0 +1,41 @@
+"""
+共享连接池前后的请求吞吐对比：每次请求新建连接（原先的requests.get） vs HttpTransport复用连接
+
+python -m benchmarks.bench_transport
+"""
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from src.transport import HttpTransport
+from tests.stub_server import StubServer, StubResponse
+
+__body__ = '<html>' + 'x' * 2048 + '</html>'
+
+
+def __run__(get, url: str, total: int, concurrency: int) -> float:
+    """
+    :return:每秒请求数
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for response in executor.map(lambda _: get(url), range(total)):
+            assert response.status_code == 200
+    return total / (time.perf_counter() - start)
+
+
+def main(total: int = 2000, concurrency: int = 8):
+    with StubServer({'/': lambda request: StubResponse(__body__)}) as server:
+        url = server.url('/comment')
+        before = __run__(requests.get, url, total, concurrency)
+        connections_before = server.connections
+        transport = HttpTransport(pool_maxsize=concurrency)
+        after = __run__(transport.get, url, total, concurrency)
+        transport.close()
+        print("{0:24}{1:>12}{2:>12}".format('', '请求/秒', 'TCP连接数'))
+        print("{0:24}{1:12.0f}{2:12}".format('requests.get(before)', before, connections_before))
+        print("{0:24}{1:12.0f}{2:12}".format('HttpTransport(after)', after, server.connections - connections_before))
+        print("加速比 {0:.2f}x".format(after / before))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+实时估值数据解析和统计：原先按字符串逐点拆分、只计算平均涨跌幅 vs parse_valuation_payload + batch_stats。
+没有可公开的线上数据，使用固定种子生成的交易日分时数据（每只基金241个点）代替保存的接口返回
+
+python -m benchmarks.bench_valuation
+"""
+import re
+import time
+import numpy as np
+from src.valuation import batch_stats, parse_valuation_payload
+from tests.support import generate_payloads
+
+
+def __mean_before__(text: str) -> float:
+    """
+    原get_realtime_rate中的解析方式
+    """
+    result = re.search('~(\\d{4}.*)', text).group(1)
+    total = 0
+    count = 0
+    for valuation in result.strip(';').split(';'):
+        info = valuation.split(',')
+        now_valuation = float(info[1])
+        yesterday_valuation = float(info[2])
+        total += (now_valuation - yesterday_valuation) / yesterday_valuation * 100
+        count += 1
+    return total / count
+
+
+def __stats_before__(text: str) -> tuple:
+    """
+    沿用逐点拆分的方式计算与batch_stats相同的5项统计
+    """
+    result = re.search('~(\\d{4}.*)', text).group(1)
+    changes = list()
+    minutes = list()
+    for valuation in result.strip(';').split(';'):
+        info = valuation.split(',')
+        minutes.append(int(info[0][:2]) * 60 + int(info[0][2:]))
+        yesterday_valuation = float(info[2])
+        changes.append((float(info[1]) - yesterday_valuation) / yesterday_valuation * 100)
+    weights = [max(minutes[i + 1] - minutes[i], 1) for i in range(len(minutes) - 1)] + [1]
+    twap = sum(c * w for c, w in zip(changes, weights)) / sum(weights)
+    return sum(changes) / len(changes), min(changes), max(changes), twap, changes[-1]
+
+
+def main(count: int = 5000):
+    payloads = generate_payloads(count)
+    start = time.perf_counter()
+    before = [__mean_before__(text) for text in payloads]
+    before_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    before_full = [__stats_before__(text) for text in payloads]
+    before_full_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    series_list = [parse_valuation_payload(text) for text in payloads]
+    parse_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    stats = batch_stats(series_list)
+    stats_seconds = time.perf_counter() - start
+    assert np.allclose(stats.mean, before)
+    assert np.allclose(stats.twap, [item[3] for item in before_full])
+
+    print("{0}只基金，每只{1}个点".format(count, len(series_list[0])))
+    after_seconds = parse_seconds + stats_seconds
+    print("{0:28}{1:>8}".format('', '秒'))
+    print("{0:28}{1:8.3f}".format('before: mean only', before_seconds))
+    print("{0:28}{1:8.3f}".format('before: 5 stats', before_full_seconds))
+    print("{0:28}{1:8.3f}".format('parse_valuation_payload', parse_seconds))
+    print("{0:28}{1:8.3f}".format('batch_stats (5 stats)', stats_seconds))
+    print("加速比 {0:.2f}x（对比只算平均值），{1:.2f}x（对比5项统计）".format(
+        before_seconds / after_seconds, before_full_seconds / after_seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,337 @@
+import abc
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import requests
+from urllib import parse
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# 常用接口的缓存时间（秒），按链接前缀匹配
+DEFAULT_ENDPOINT_TTLS = {
+    'https://you.ctrip.com/SearchSite': 24 * 3600,  # 搜索结果及景点列表
+    'http://fund.10jqka.com.cn/hqcode.js': 24 * 3600,  # 基金代码表
+}
+
+# 内容已被解码，这些响应头不能再随缓存返回
+__dropped_headers__ = {'content-encoding', 'transfer-encoding', 'content-length', 'connection'}
+
+
+class CacheEntry(object):
+    """
+    缓存的响应
+    """
+    __slots__ = ['url', 'status_code', 'headers', 'content', 'expires_at', 'etag', 'last_modified']
+
+    def __init__(self, url: str, status_code: int, headers: dict, content: bytes, expires_at: float,
+                 etag: str = None, last_modified: str = None):
+        """
+        :param url: 最终响应链接（重定向之后）
+        :param status_code: 状态码
+        :param headers: 响应头
+        :param content: 响应内容
+        :param expires_at: 过期时间戳
+        :param etag: ETag，用于重新验证
+        :param last_modified: Last-Modified，用于重新验证
+        """
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.expires_at = expires_at
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def to_response(self) -> requests.Response:
+        response = requests.Response()
+        response.status_code = self.status_code
+        response.headers = CaseInsensitiveDict(self.headers)
+        response._content = self.content
+        response.url = self.url
+        response.encoding = get_encoding_from_headers(response.headers)
+        return response
+
+
+class CacheBackend(object, metaclass=abc.ABCMeta):
+    """
+    缓存存储方式
+    """
+
+    @abc.abstractmethod
+    def get(self, key: str) -> CacheEntry:
+        pass
+
+    @abc.abstractmethod
+    def set(self, key: str, entry: CacheEntry):
+        pass
+
+    @abc.abstractmethod
+    def touch(self, key: str):
+        """
+        更新最近访问时间
+        """
+        pass
+
+    @abc.abstractmethod
+    def evict(self, max_entries: int) -> int:
+        """
+        淘汰最久未访问的条目，直到数目不超过max_entries
+        :return:淘汰数目
+        """
+        pass
+
+    @abc.abstractmethod
+    def __len__(self):
+        pass
+
+
+class SqliteCacheBackend(CacheBackend):
+    """
+    SQLite缓存。最近访问时间先记在内存中，攒够touch_batch条或淘汰、关闭时才批量写入；
+    条目数在打开时统计一次，之后自行维护，多个进程同时写入同一文件时会不准确
+    """
+
+    def __init__(self, path: str, touch_batch: int = 256):
+        """
+        :param path: SQLite文件路径
+        :param touch_batch: 累计多少次访问后写入最近访问时间
+        """
+        self.path = path
+        self.touch_batch = touch_batch
+        self.__touched__ = dict()  # 尚未写入的最近访问时间，存储格式{键:时间戳}
+        self.__lock__ = threading.Lock()
+        self.__conn__ = sqlite3.connect(path, check_same_thread=False)
+        self.__conn__.execute("CREATE TABLE IF NOT EXISTS entries ("
+                              "key TEXT PRIMARY KEY, url TEXT, status_code INTEGER, headers TEXT, content BLOB, "
+                              "expires_at REAL, etag TEXT, last_modified TEXT, last_access REAL)")
+        self.__conn__.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access)")
+        self.__conn__.commit()
+        self.__size__ = self.__conn__.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def get(self, key: str) -> CacheEntry:
+        with self.__lock__:
+            row = self.__conn__.execute("SELECT url, status_code, headers, content, expires_at, etag, last_modified "
+                                        "FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return CacheEntry(row[0], row[1], json.loads(row[2]), row[3], row[4], row[5], row[6])
+
+    def set(self, key: str, entry: CacheEntry):
+        values = (entry.url, entry.status_code, json.dumps(entry.headers), entry.content, entry.expires_at,
+                  entry.etag, entry.last_modified, time.time())
+        with self.__lock__:
+            self.__touched__.pop(key, None)
+            cursor = self.__conn__.execute("UPDATE entries SET url = ?, status_code = ?, headers = ?, content = ?, "
+                                           "expires_at = ?, etag = ?, last_modified = ?, last_access = ? "
+                                           "WHERE key = ?", values + (key,))
+            if cursor.rowcount == 0:
+                self.__conn__.execute("INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", (key,) + values)
+                self.__size__ += 1
+            self.__conn__.commit()
+
+    def touch(self, key: str):
+        with self.__lock__:
+            self.__touched__[key] = time.time()
+            if len(self.__touched__) >= self.touch_batch:
+                self.__flush_touched__()
+
+    def __flush_touched__(self):
+        """
+        批量写入最近访问时间，调用前需持有锁
+        """
+        if not self.__touched__:
+            return
+        self.__conn__.executemany("UPDATE entries SET last_access = ? WHERE key = ?",
+                                  ((last_access, key) for key, last_access in self.__touched__.items()))
+        self.__conn__.commit()
+        self.__touched__.clear()
+
+    def evict(self, max_entries: int) -> int:
+        with self.__lock__:
+            count = self.__size__ - max_entries
+            if count <= 0:
+                return 0
+            self.__flush_touched__()
+            cursor = self.__conn__.execute("DELETE FROM entries WHERE key IN "
+                                           "(SELECT key FROM entries ORDER BY last_access LIMIT ?)", (count,))
+            self.__conn__.commit()
+            self.__size__ -= cursor.rowcount
+        return cursor.rowcount
+
+    def __len__(self):
+        return self.__size__
+
+    def close(self):
+        with self.__lock__:
+            self.__flush_touched__()
+        self.__conn__.close()
+
+
+class DirectoryCacheBackend(CacheBackend):
+    """
+    目录缓存，每个条目一个元数据文件和一个内容文件，以元数据文件修改时间作为最近访问时间。
+    文件系统写入时记录的时间精度较低，间隔很近的访问会无法区分先后，所以显式设置为time.time()
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.__lock__ = threading.Lock()
+        self.__size__ = len(self.__metas__())
+
+    def __path__(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str) -> CacheEntry:
+        path = self.__path__(key)
+        try:
+            with open(path + '.json', mode='r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(path + '.body', mode='rb') as f:
+                content = f.read()
+        except (OSError, ValueError):
+            return None
+        return CacheEntry(meta['url'], meta['status_code'], meta['headers'], content, meta['expires_at'],
+                          meta.get('etag'), meta.get('last_modified'))
+
+    def set(self, key: str, entry: CacheEntry):
+        path = self.__path__(key)
+        meta = {'url': entry.url, 'status_code': entry.status_code, 'headers': entry.headers,
+                'expires_at': entry.expires_at, 'etag': entry.etag, 'last_modified': entry.last_modified}
+        with self.__lock__:
+            if not os.path.exists(path + '.json'):
+                self.__size__ += 1
+            with open(path + '.body.tmp', mode='wb') as f:
+                f.write(entry.content)
+            os.replace(path + '.body.tmp', path + '.body')
+            with open(path + '.json.tmp', mode='w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            now = time.time()
+            os.utime(path + '.json.tmp', (now, now))
+            os.replace(path + '.json.tmp', path + '.json')
+
+    def touch(self, key: str):
+        now = time.time()
+        try:
+            os.utime(self.__path__(key) + '.json', (now, now))
+        except OSError:
+            pass
+
+    def __metas__(self) -> list:
+        return [name for name in os.listdir(self.directory) if name.endswith('.json')]
+
+    def evict(self, max_entries: int) -> int:
+        with self.__lock__:
+            if self.__size__ <= max_entries:
+                return 0
+            metas = self.__metas__()
+            metas.sort(key=lambda name: os.path.getmtime(os.path.join(self.directory, name)))
+            removed = metas[:len(metas) - max_entries]
+            for name in removed:
+                path = self.__path__(name[:-len('.json')])
+                for suffix in ('.json', '.body'):
+                    try:
+                        os.remove(path + suffix)
+                    except OSError:
+                        pass
+            self.__size__ = len(metas) - len(removed)
+        return len(removed)
+
+    def __len__(self):
+        return self.__size__
+
+
+class ResponseCache(object):
+    """
+    HTTP响应缓存，按请求方法+链接+请求体缓存，过期后使用ETag/Last-Modified重新验证
+    """
+
+    def __init__(self, backend: CacheBackend, endpoint_ttls: dict = None, default_ttl: float = 0,
+                 max_entries: int = 10000):
+        """
+        :param backend: 存储方式
+        :param endpoint_ttls: 接口缓存时间，存储格式{链接前缀:秒数}，取最长匹配前缀
+        :param default_ttl: 未匹配接口的缓存时间，0表示不缓存
+        :param max_entries: 缓存条目上限，超出后淘汰最久未访问的条目
+        """
+        self.backend = backend
+        self.endpoint_ttls = dict(DEFAULT_ENDPOINT_TTLS if endpoint_ttls is None else endpoint_ttls)
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'stores': 0, 'evictions': 0}
+        self.__lock__ = threading.Lock()
+
+    def ttl_for(self, url: str) -> float:
+        prefix = ''
+        ttl = self.default_ttl
+        for endpoint, endpoint_ttl in self.endpoint_ttls.items():
+            if url.startswith(endpoint) and len(endpoint) > len(prefix):
+                prefix = endpoint
+                ttl = endpoint_ttl
+        return ttl
+
+    @staticmethod
+    def cache_key(method: str, url: str, params=None, data=None) -> str:
+        if params:
+            url = ''.join([url, '&' if '?' in url else '?', parse.urlencode(sorted(dict(params).items()))])
+        if isinstance(data, dict):
+            body = parse.urlencode(sorted(data.items()))
+        elif isinstance(data, str):
+            body = data
+        elif isinstance(data, bytes):
+            body = data.decode('latin-1')
+        else:
+            body = ''
+        return hashlib.sha1('\n'.join([method.upper(), url, body]).encode('utf-8')).hexdigest()
+
+    def __count__(self, name: str, n: int = 1):
+        with self.__lock__:
+            self.stats[name] += n
+
+    def request(self, send, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        经过缓存发送请求
+        :param send: 实际发送请求的函数，参数与requests.Session.request一致
+        :param method: 请求方法
+        :param url: 链接
+        :return:
+        """
+        ttl = self.ttl_for(url)
+        if ttl <= 0:
+            return send(method, url, **kwargs)
+        key = self.cache_key(method, url, kwargs.get('params'), kwargs.get('data'))
+        entry = self.backend.get(key)
+        now = time.time()
+        if entry is not None and entry.expires_at > now:
+            self.__count__('hits')
+            self.backend.touch(key)
+            return entry.to_response()
+
+        if entry is not None and (entry.etag or entry.last_modified):
+            headers = dict(kwargs.get('headers') or {})
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+            kwargs['headers'] = headers
+        response = send(method, url, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            self.__count__('revalidated')
+            entry.expires_at = now + ttl
+            self.backend.set(key, entry)
+            return entry.to_response()
+
+        self.__count__('misses')
+        if response.status_code == 200:
+            headers = {k: v for k, v in response.headers.items() if k.lower() not in __dropped_headers__}
+            self.backend.set(key, CacheEntry(response.url, response.status_code, headers, response.content,
+                                             now + ttl, response.headers.get('ETag'),
+                                             response.headers.get('Last-Modified')))
+            self.__count__('stores')
+            evicted = self.backend.evict(self.max_entries)
+            if evicted:
+                self.__count__('evictions', evicted)
+        return response
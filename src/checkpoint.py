@@ -0,0 +1,145 @@
+import json
+import os
+import time
+from src.transport import HttpTransport
+from src.xiecheng import AttractionListView, CommentView, KeyWordException
+
+
+class CrawlCheckpoint(object):
+    """
+    爬取进度检查点：记录搜索关键词、景点列表页码、每个景点的评论页码以及已完成的景点，
+    按时间间隔原子写入文件，中断后可从中断处继续
+    """
+
+    def __init__(self, path: str, interval: float = 5.0, clock=time.monotonic):
+        """
+        :param path: 检查点文件路径
+        :param interval: 两次写入的最小间隔（秒），进度更新只修改内存，不会每页都写文件
+        :param clock: 时钟
+        """
+        self.path = path
+        self.interval = interval
+        self.clock = clock
+        self.keyword = None  # 搜索关键词
+        self.list_page = 1  # 下一个待处理的景点列表页
+        self.in_flight = dict()  # 进行中的景点，存储格式{景点链接:下一个待抓取的评论页}
+        self.completed = set()  # 已完成的景点链接
+        self.__dirty__ = False
+        self.__last_save__ = clock()
+        if os.path.exists(path):
+            self.load()
+
+    def load(self):
+        with open(self.path, mode='r', encoding='utf-8') as f:
+            state = json.load(f)
+        self.keyword = state.get('keyword')
+        self.list_page = state.get('list_page', 1)
+        self.in_flight = dict(state.get('in_flight', {}))
+        self.completed = set(state.get('completed', []))
+
+    def reset(self, keyword: str):
+        """
+        开始新的关键词爬取，清空原有进度
+        """
+        self.keyword = keyword
+        self.list_page = 1
+        self.in_flight = dict()
+        self.completed = set()
+        self.__dirty__ = True
+        self.save()
+
+    def set_list_page(self, page: int):
+        self.list_page = page
+        self.__changed__()
+
+    def comment_page(self, url: str) -> int:
+        """
+        景点下一个待抓取的评论页
+        """
+        return self.in_flight.get(url, 1)
+
+    def advance(self, url: str, page: int):
+        """
+        记录景点的评论已处理到page之前
+        :param url: 景点链接
+        :param page: 下一个待抓取的评论页
+        """
+        self.in_flight[url] = page
+        self.__changed__()
+
+    def complete(self, url: str):
+        self.in_flight.pop(url, None)
+        self.completed.add(url)
+        self.__changed__()
+
+    def is_completed(self, url: str) -> bool:
+        return url in self.completed
+
+    def __changed__(self):
+        self.__dirty__ = True
+        if self.clock() - self.__last_save__ >= self.interval:
+            self.save()
+
+    def save(self):
+        """
+        写入临时文件后替换，写入过程中断不会损坏原有检查点
+        :return:
+        """
+        if not self.__dirty__:
+            return
+        state = {
+            'keyword': self.keyword,
+            'list_page': self.list_page,
+            'in_flight': self.in_flight,
+            'completed': sorted(self.completed),
+        }
+        temp = self.path + '.tmp'
+        with open(temp, mode='w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.path)
+        self.__dirty__ = False
+        self.__last_save__ = self.clock()
+
+
+def crawl_keyword(keyword: str, checkpoint: CrawlCheckpoint, on_comments, transport: HttpTransport = None,
+                  max_list_pages: int = None):
+    """
+    爬取关键词相关的全部景点评论，检查点中已有该关键词的进度时从中断处继续
+    :param keyword: 搜索关键词
+    :param checkpoint: 检查点
+    :param on_comments: 回调，参数为(AttractionInfo, 评论页码, SingleComment列表)
+    :param transport: 共享连接池
+    :param max_list_pages: 最多处理的景点列表页数，None表示不限制
+    :return:
+    """
+    if checkpoint.keyword != keyword:
+        checkpoint.reset(keyword)
+    list_view = AttractionListView(keyword, transport=transport)
+    list_view.page_now = checkpoint.list_page
+    list_view.get_vacation_list_view(keyword)
+    comment_view = CommentView(transport=transport)
+    handled = 0
+    try:
+        while list_view.current_list_view and (max_list_pages is None or handled < max_list_pages):
+            for attraction in list_view.current_list_view:
+                if checkpoint.is_completed(attraction.url):
+                    continue
+                try:
+                    comment_view.resolve_sight(attraction.url)
+                except KeyWordException:
+                    checkpoint.complete(attraction.url)
+                    continue
+                comment_view.page_now = checkpoint.comment_page(attraction.url) - 1
+                comments = comment_view.next_page()
+                while comments:
+                    on_comments(attraction, comment_view.page_now, comments)
+                    checkpoint.advance(attraction.url, comment_view.page_now + 1)
+                    comments = comment_view.next_page()
+                checkpoint.complete(attraction.url)
+            handled += 1
+            checkpoint.set_list_page(list_view.page_now + 1)
+            list_view.next_page()
+    finally:
+        checkpoint.save()
@@ -0,0 +1,213 @@
+import numpy as np
+from array import array
+from typing import Iterable
+from src.xiecheng import SingleComment
+
+
+class StringColumn(object):
+    """
+    紧凑字符串列：所有字符串UTF-8编码后首尾相接存放，另存一份偏移量
+    """
+    __slots__ = ['data', 'offsets']
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array('q', [0])  # 第i个字符串位于data[offsets[i]:offsets[i+1]]
+
+    def append(self, value: str):
+        """
+        内存被导出（如to_arrow返回的Table仍在使用）时抛出BufferError，且不改变已有数据
+        """
+        encoded = value.encode('utf-8')
+        self.data += encoded
+        try:
+            self.offsets.append(len(self.data))
+        except BufferError:
+            del self.data[len(self.data) - len(encoded):]
+            raise
+
+    def truncate(self, size: int):
+        """
+        只保留前size个字符串
+        """
+        if size < len(self):
+            del self.data[self.offsets[size]:]
+            del self.offsets[size + 1:]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return self.data[self.offsets[index]:self.offsets[index + 1]].decode('utf-8')
+
+    def take(self, indices: Iterable) -> 'StringColumn':
+        column = StringColumn()
+        for i in indices:
+            column.data += self.data[self.offsets[i]:self.offsets[i + 1]]
+            column.offsets.append(len(column.data))
+        return column
+
+    def slice(self, start: int, stop: int) -> 'StringColumn':
+        column = StringColumn()
+        base = self.offsets[start]
+        column.data = self.data[base:self.offsets[stop]]
+        column.offsets = array('q', (offset - base for offset in self.offsets[start:stop + 1]))
+        return column
+
+    def nbytes(self) -> int:
+        return len(self.data) + self.offsets.itemsize * len(self.offsets)
+
+
+class CommentRow(object):
+    """
+    CommentBatch中某一条评论的轻量视图，访问字段时才解码
+    """
+    __slots__ = ['batch', 'index']
+
+    def __init__(self, batch: 'CommentBatch', index: int):
+        self.batch = batch
+        self.index = index
+
+    @property
+    def author(self) -> str:
+        return self.batch.author[self.index]
+
+    @property
+    def star(self) -> float:
+        return float(self.batch.star[self.index])
+
+    @property
+    def comment(self) -> str:
+        return self.batch.comment[self.index]
+
+    @property
+    def date_published(self) -> str:
+        return self.batch.date_published[self.index]
+
+    def to_comment(self) -> SingleComment:
+        return SingleComment(self.author, self.star, self.comment, self.date_published)
+
+    def __str__(self):
+        return str(self.to_comment())
+
+
+class CommentBatch(object):
+    """
+    列式存储的评论集合，用于替代大量SingleComment对象组成的列表
+    """
+
+    def __init__(self, capacity: int = 1024):
+        """
+        :param capacity: 评分数组初始容量，不足时自动翻倍
+        """
+        self.author = StringColumn()
+        self.comment = StringColumn()
+        self.date_published = StringColumn()
+        self.__star__ = np.empty(max(capacity, 1), dtype=np.float64)
+        self.__size__ = 0
+
+    @classmethod
+    def from_comments(cls, comments: Iterable) -> 'CommentBatch':
+        batch = cls()
+        batch.extend(comments)
+        return batch
+
+    @property
+    def star(self) -> np.ndarray:
+        return self.__star__[:self.__size__]
+
+    def append_row(self, author: str, star: float, comment: str, date_published: str):
+        """
+        追加一行，to_arrow返回的Table释放之前追加会抛出BufferError，且不改变已有数据
+        """
+        columns = (self.author, self.comment, self.date_published)
+        try:
+            for column, value in zip(columns, (author, comment, date_published)):
+                column.append(value)
+        except BufferError:
+            # 已追加成功的列回退到原有行数，保证各列长度一致
+            for column in columns:
+                column.truncate(self.__size__)
+            raise
+        if self.__size__ == len(self.__star__):
+            grown = np.empty(len(self.__star__) * 2, dtype=np.float64)
+            grown[:self.__size__] = self.__star__
+            self.__star__ = grown
+        self.__star__[self.__size__] = star
+        self.__size__ += 1
+
+    def append(self, comment: SingleComment):
+        self.append_row(comment.author, comment.star, comment.comment, comment.date_published)
+
+    def extend(self, comments: Iterable):
+        for comment in comments:
+            self.append(comment)
+
+    def __len__(self):
+        return self.__size__
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(self.__size__)
+            if step == 1:
+                return self.__from_columns__(self.author.slice(start, max(start, stop)),
+                                             self.comment.slice(start, max(start, stop)),
+                                             self.date_published.slice(start, max(start, stop)),
+                                             self.star[start:max(start, stop)])
+            indices = np.arange(start, stop, step)  # 与range一致，负步长时不会把stop当作切片边界重新解释
+            return self.__from_columns__(self.author.take(indices), self.comment.take(indices),
+                                         self.date_published.take(indices), self.star[indices])
+        if item < 0:
+            item += self.__size__
+        if not 0 <= item < self.__size__:
+            raise IndexError('CommentBatch index out of range')
+        return CommentRow(self, item)
+
+    @classmethod
+    def __from_columns__(cls, author: StringColumn, comment: StringColumn, date_published: StringColumn,
+                         star: np.ndarray) -> 'CommentBatch':
+        batch = cls(len(star))
+        batch.author = author
+        batch.comment = comment
+        batch.date_published = date_published
+        batch.__star__[:len(star)] = star
+        batch.__size__ = len(star)
+        return batch
+
+    def __iter__(self):
+        for i in range(self.__size__):
+            yield CommentRow(self, i)
+
+    def nbytes(self) -> int:
+        """
+        列数据占用字节数
+        """
+        return self.author.nbytes() + self.comment.nbytes() + self.date_published.nbytes() + self.star.nbytes
+
+    def to_arrow(self):
+        """
+        导出为pyarrow.Table，字符串列和评分列直接引用现有内存，不复制。
+        返回的Table释放之前不能继续追加数据，追加会抛出BufferError
+        :return:
+        """
+        import pyarrow as pa
+
+        def string_array(column: StringColumn):
+            return pa.LargeStringArray.from_buffers(len(column), pa.py_buffer(column.offsets),
+                                                   pa.py_buffer(column.data))
+
+        return pa.table({
+            'author': string_array(self.author),
+            'star': pa.array(self.star),
+            'comment': string_array(self.comment),
+            'date_published': string_array(self.date_published),
+        })
+
+    def to_parquet(self, path: str, **kwargs):
+        """
+        写入parquet文件
+        :param path: 文件路径
+        :return:
+        """
+        import pyarrow.parquet as pq
+        pq.write_table(self.to_arrow(), path, **kwargs)
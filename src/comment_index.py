@@ -0,0 +1,236 @@
+import re
+import numpy as np
+from array import array
+from collections import OrderedDict
+from typing import Iterable, List
+from src.comment_batch import CommentBatch, CommentRow, StringColumn
+from src.incremental import comment_hash
+
+__cjk_pattern__ = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')  # 连续的中日韩统一表意文字
+__word_pattern__ = re.compile(r'[0-9a-z]+')  # 字母和数字组成的词
+
+
+def tokenize(text: str) -> set:
+    """
+    分词：连续汉字、连续字母数字（转小写）都切分为相邻两字，单个字符不建索引。
+    字母数字同样按两字切分，查询"ok"可以匹配到"okNice"，与汉字一样是子串语义
+    :param text: 评论内容
+    :return:词集合
+    """
+    tokens = set()
+    for run in __cjk_pattern__.findall(text) + __word_pattern__.findall(text.lower()):
+        tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def __date_key__(date_published: str) -> int:
+    """
+    发布日期转为YYYYMMDD整数，无法解析时为0
+    """
+    digits = ''.join(ch for ch in date_published[:10] if ch.isdigit())
+    return int(digits) if len(digits) == 8 else 0
+
+
+class CommentIndex(object):
+    """
+    评论索引：评论内容的倒排索引、每个景点的评分分布和按月汇总，可随新评论页增量更新
+    """
+
+    def __init__(self):
+        self.batch = CommentBatch()  # 评论数据，文档编号即在batch中的位置
+        self.__poi__ = array('q')  # 每条评论所属景点
+        self.__date__ = array('i')  # 每条评论的发布日期，YYYYMMDD
+        self.__postings__ = dict()  # 存储格式{词:文档编号数组}，编号递增
+        self.__hashes__ = set()  # 已索引评论，存储格式{(景点, 评论指纹)}
+        self.__star_histograms__ = dict()  # 存储格式{景点:[0~5星评论数]}
+        self.__star_sums__ = dict()  # 存储格式{景点:评分之和}
+        self.__months__ = dict()  # 存储格式{(景点, YYYY-MM):[评论数, 评分之和]}
+
+    def __len__(self):
+        return len(self.batch)
+
+    def add(self, poi_id: int, comments: Iterable) -> int:
+        """
+        增量添加评论，已索引的评论（同一景点下作者和内容相同）会被忽略
+        :param poi_id: 景点poi_id
+        :param comments: SingleComment的可迭代对象，如一页评论
+        :return:新增条数
+        """
+        added = 0
+        for comment in comments:
+            key = (poi_id, comment_hash(comment))
+            if key in self.__hashes__:
+                continue
+            self.__hashes__.add(key)
+            doc = len(self.batch)
+            self.batch.append(comment)
+            self.__poi__.append(poi_id)
+            date = __date_key__(comment.date_published)
+            self.__date__.append(date)
+            for token in tokenize(comment.comment):
+                postings = self.__postings__.get(token)
+                if postings is None:
+                    postings = self.__postings__[token] = array('I')
+                postings.append(doc)
+            self.__aggregate__(poi_id, comment.star, date)
+            added += 1
+        return added
+
+    def __aggregate__(self, poi_id: int, star: float, date: int):
+        """
+        更新评分分布和按月汇总
+        """
+        histogram = self.__star_histograms__.get(poi_id)
+        if histogram is None:
+            histogram = self.__star_histograms__[poi_id] = [0] * 6
+        histogram[min(5, max(0, int(round(star))))] += 1
+        self.__star_sums__[poi_id] = self.__star_sums__.get(poi_id, 0.0) + star
+        if date:
+            month = self.__months__.setdefault((poi_id, '{0:04d}-{1:02d}'.format(date // 10000, date // 100 % 100)),
+                                               [0, 0.0])
+            month[0] += 1
+            month[1] += star
+
+    def __candidates__(self, term: str) -> np.ndarray:
+        """
+        包含term全部词的文档编号，词越少的先求交集
+        :return:文档编号数组，无法使用倒排索引（如单个汉字或字母）时为None
+        """
+        tokens = tokenize(term)
+        if not tokens:
+            return None
+        postings = sorted((self.__postings__.get(token, array('I')) for token in tokens), key=len)
+        result = np.frombuffer(postings[0], dtype=np.uint32) if len(postings[0]) else np.empty(0, dtype=np.uint32)
+        for other in postings[1:]:
+            if len(result) == 0:
+                break
+            result = np.intersect1d(result, np.frombuffer(other, dtype=np.uint32), assume_unique=True)
+        return result
+
+    def query(self, term: str = None, poi_id: int = None, year: int = None, min_star: float = None,
+              max_star: float = None, limit: int = None) -> List[CommentRow]:
+        """
+        查询评论，如：提到"排队"、景点X、2025年、评分不高于2的评论
+        :param term: 评论中包含的文字，None表示不限制
+        :param poi_id: 景点poi_id
+        :param year: 发布年份
+        :param min_star: 最低评分（含）
+        :param max_star: 最高评分（含）
+        :param limit: 最多返回条数
+        :return:CommentRow列表，按添加顺序排列
+        """
+        size = len(self.batch)
+        term = term.strip() if term else None
+        candidates = self.__candidates__(term) if term else None
+        # 查询文字本身就是一个词时倒排索引结果即为答案，否则（如相邻两字都出现但原文不连续、单个字符逐条查找）需核对原文
+        verify = term is not None and (candidates is None or tokenize(term) != {term.lower()})
+        if candidates is None:
+            candidates = np.arange(size, dtype=np.int64)
+        mask = np.ones(len(candidates), dtype=bool)
+        if poi_id is not None:
+            mask &= np.frombuffer(self.__poi__, dtype=np.int64)[:size][candidates] == poi_id
+        if year is not None:
+            mask &= np.frombuffer(self.__date__, dtype=np.int32)[:size][candidates] // 10000 == year
+        if min_star is not None:
+            mask &= self.batch.star[candidates] >= min_star
+        if max_star is not None:
+            mask &= self.batch.star[candidates] <= max_star
+        candidates = candidates[mask]
+        rows = list()
+        needle = term.lower() if term else None
+        for doc in candidates.tolist():
+            if verify and needle not in self.batch.comment[doc].lower():
+                continue
+            rows.append(CommentRow(self.batch, doc))
+            if limit is not None and len(rows) >= limit:
+                break
+        return rows
+
+    def count(self, term: str = None, **filters) -> int:
+        return len(self.query(term, **filters))
+
+    def star_histogram(self, poi_id: int) -> List[int]:
+        """
+        :return:0~5星（四舍五入）评论数
+        """
+        return list(self.__star_histograms__.get(poi_id, [0] * 6))
+
+    def average_star(self, poi_id: int) -> float:
+        """
+        :return:景点平均评分，没有评论时为None
+        """
+        histogram = self.__star_histograms__.get(poi_id)
+        if not histogram:
+            return None
+        return self.__star_sums__[poi_id] / sum(histogram)
+
+    def monthly(self, poi_id: int, year: int = None) -> OrderedDict:
+        """
+        按月汇总
+        :param poi_id: 景点poi_id
+        :param year: 年份，None表示全部
+        :return:存储格式{YYYY-MM:(评论数, 平均评分)}，按月份排序
+        """
+        result = OrderedDict()
+        prefix = None if year is None else '{0:04d}-'.format(year)
+        for (poi, month), (count, star_sum) in sorted(self.__months__.items(), key=lambda item: item[0][1]):
+            if poi != poi_id or (prefix is not None and not month.startswith(prefix)):
+                continue
+            result[month] = (count, star_sum / count)
+        return result
+
+    def save(self, path: str):
+        """
+        保存为numpy的npz文件
+        :param path: 文件路径
+        :return:
+        """
+        terms = list(self.__postings__.keys())
+        lengths = np.array([len(self.__postings__[term]) for term in terms], dtype=np.int64)
+        postings = np.concatenate([np.frombuffer(self.__postings__[term], dtype=np.uint32) for term in terms]) \
+            if terms else np.empty(0, dtype=np.uint32)
+        size = len(self.batch)
+        np.savez(path,
+                 poi=np.frombuffer(self.__poi__, dtype=np.int64)[:size],
+                 date=np.frombuffer(self.__date__, dtype=np.int32)[:size],
+                 star=self.batch.star,
+                 author_data=np.frombuffer(bytes(self.batch.author.data), dtype=np.uint8),
+                 author_offsets=np.frombuffer(self.batch.author.offsets, dtype=np.int64),
+                 comment_data=np.frombuffer(bytes(self.batch.comment.data), dtype=np.uint8),
+                 comment_offsets=np.frombuffer(self.batch.comment.offsets, dtype=np.int64),
+                 date_data=np.frombuffer(bytes(self.batch.date_published.data), dtype=np.uint8),
+                 date_offsets=np.frombuffer(self.batch.date_published.offsets, dtype=np.int64),
+                 terms=np.frombuffer('\n'.join(terms).encode('utf-8'), dtype=np.uint8),
+                 lengths=lengths,
+                 postings=postings)
+
+    @classmethod
+    def load(cls, path: str) -> 'CommentIndex':
+        """
+        读取save保存的索引，评分分布、按月汇总和去重指纹按评论数据重新计算
+        :param path: 文件路径
+        :return:
+        """
+        index = cls()
+        with np.load(path) as data:
+            for name in ('author', 'comment', 'date'):
+                column = StringColumn()
+                column.data = bytearray(data[name + '_data'].tobytes())
+                column.offsets = array('q', data[name + '_offsets'].tobytes())
+                setattr(index.batch, 'date_published' if name == 'date' else name, column)
+            star = data['star']
+            index.batch.__star__ = np.array(star, dtype=np.float64) if len(star) else np.empty(1, dtype=np.float64)
+            index.batch.__size__ = len(star)
+            index.__poi__ = array('q', data['poi'].astype(np.int64).tobytes())
+            index.__date__ = array('i', data['date'].astype(np.int32).tobytes())
+            terms = data['terms'].tobytes().decode('utf-8').split('\n') if len(data['terms']) else list()
+            postings = data['postings']
+            start = 0
+            for term, length in zip(terms, data['lengths'].tolist()):
+                index.__postings__[term] = array('I', postings[start:start + length].tobytes())
+                start += length
+        for doc in range(len(index.batch)):
+            row = CommentRow(index.batch, doc)
+            index.__hashes__.add((index.__poi__[doc], comment_hash(row)))
+            index.__aggregate__(index.__poi__[doc], row.star, index.__date__[doc])
+        return index
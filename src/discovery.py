@@ -0,0 +1,125 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List
+from urllib import parse
+from src.transport import HttpTransport, get_default_transport
+from src.xiecheng import AttractionListView, AttractionInfo, CityVacationsAdView
+
+
+class AttractionDiscovery(object):
+    """
+    批量发现多个城市的景点：并发解析搜索标签，并发翻页直到没有数据，按景区链接去重
+    """
+
+    def __init__(self, transport: HttpTransport = None, concurrency: int = 16, pages_ahead: int = 4,
+                 user_agent=None, cookie=None, page_retries: int = 2, max_failed_pages: int = 3):
+        """
+        :param transport: 共享连接池
+        :param concurrency: 同时进行的请求数
+        :param pages_ahead: 每个关键词最多同时请求的页数
+        :param page_retries: 景点列表页出错时的重试次数
+        :param max_failed_pages: 关键词连续多少页重试后仍失败时放弃该关键词
+        """
+        self.transport = transport if transport is not None else get_default_transport()
+        self.concurrency = concurrency
+        self.pages_ahead = pages_ahead
+        self.page_retries = page_retries
+        self.max_failed_pages = max_failed_pages
+        self.user_agent = user_agent
+        self.cookie = cookie
+        self.failed_keywords = list()  # 搜索失败或连续多页失败而放弃的关键词
+        self.failed_pages = list()  # 重试后仍失败的景点列表页，存储格式[(关键词, 页码)]
+        # 搜索和景点列表都请求同一域名，连接池按并发数设置，每个线程一个连接
+        self.transport.ensure_host_pool_size(parse.urlparse(CityVacationsAdView.search_url).netloc, concurrency)
+
+    def __resolve__(self, keyword: str) -> AttractionListView:
+        view = AttractionListView(keyword, self.user_agent, self.cookie, transport=self.transport)
+        view.resolve_search(keyword)
+        return view
+
+    def discover(self, keywords: List[str]) -> List[AttractionInfo]:
+        """
+        :param keywords: 城市关键词列表
+        :return:去重后的景点列表，按发现顺序排列
+        """
+        attractions = OrderedDict()  # 存储格式{景区链接:AttractionInfo}
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        in_flight = dict()  # 存储格式{future:(关键词, 页码)}，页码为None表示搜索请求
+        views = dict()  # 存储格式{关键词:AttractionListView}
+        next_page = dict()  # 存储格式{关键词:下一个待请求页码}
+        last_page = dict()  # 存储格式{关键词:第一个空页页码}，放弃的关键词为第一个未请求的页码
+        running = dict()  # 存储格式{关键词:正在请求的页数}
+        attempts = dict()  # 存储格式{(关键词, 页码):已失败次数}
+        failed_in_row = dict()  # 存储格式{关键词:连续失败的页数}
+        failed = list()  # 重试后仍失败的页，存储格式[(关键词, 页码)]
+        pending_keywords = list(OrderedDict.fromkeys(keywords))
+        pending_keywords.reverse()
+
+        def schedule():
+            # 优先继续翻页，其次发起新的搜索
+            for keyword, view in views.items():
+                while len(in_flight) < self.concurrency and running[keyword] < self.pages_ahead \
+                        and (keyword not in last_page or next_page[keyword] < last_page[keyword]):
+                    future = executor.submit(view.__get_vacations_list_detail__, next_page[keyword])
+                    in_flight[future] = (keyword, next_page[keyword])
+                    next_page[keyword] += 1
+                    running[keyword] += 1
+            while len(in_flight) < self.concurrency and pending_keywords:
+                keyword = pending_keywords.pop()
+                in_flight[executor.submit(self.__resolve__, keyword)] = (keyword, None)
+
+        try:
+            schedule()
+            while in_flight:
+                done, _ = wait(in_flight.keys(), return_when=FIRST_COMPLETED)
+                for future in done:
+                    keyword, page = in_flight.pop(future)
+                    if page is None:
+                        try:
+                            views[keyword] = future.result()
+                        except Exception:
+                            self.failed_keywords.append(keyword)
+                            continue
+                        next_page[keyword] = 1
+                        running[keyword] = 0
+                        failed_in_row[keyword] = 0
+                        continue
+                    try:
+                        elements = future.result()
+                    except Exception:
+                        # 出错的页不能当作空页，否则会截断该关键词的后续页
+                        failures = attempts[(keyword, page)] = attempts.get((keyword, page), 0) + 1
+                        if failures <= self.page_retries:
+                            retry = executor.submit(views[keyword].__get_vacations_list_detail__, page)
+                            in_flight[retry] = (keyword, page)
+                        else:
+                            running[keyword] -= 1
+                            failed.append((keyword, page))
+                            failed_in_row[keyword] += 1
+                            if failed_in_row[keyword] >= self.max_failed_pages and keyword not in last_page:
+                                # 一直出错的关键词不再翻页，已发出的页仍然收集结果
+                                last_page[keyword] = next_page[keyword]
+                                self.failed_keywords.append(keyword)
+                        continue
+                    running[keyword] -= 1
+                    failed_in_row[keyword] = 0
+                    if len(elements) == 0:
+                        last_page[keyword] = min(page, last_page.get(keyword, page))
+                        continue
+                    if keyword in last_page and page > last_page[keyword]:
+                        continue
+                    for attraction in elements:
+                        if attraction.url not in attractions:
+                            attractions[attraction.url] = attraction
+                # 已翻完的关键词不再参与调度
+                for keyword in [k for k in views if k in last_page and running[k] == 0]:
+                    views.pop(keyword)
+                schedule()
+        finally:
+            for future in in_flight:
+                future.cancel()
+            executor.shutdown(wait=True)
+        # 最后一页之后的页出错不影响结果
+        self.failed_pages.extend((keyword, page) for keyword, page in failed
+                                 if keyword not in last_page or page < last_page[keyword])
+        return list(attractions.values())
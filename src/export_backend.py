@@ -0,0 +1,412 @@
+import abc
+import csv
+import json
+import mmap
+import os
+import sqlite3
+from typing import Iterable
+
+
+class ExportBackend(object, metaclass=abc.ABCMeta):
+    """
+    导出文件的写入方式，每种文件类型对应一个实现
+    """
+
+    def __init__(self, file_name: str, sheet_name: str = None, append: bool = False, streaming: bool = False):
+        """
+        :param file_name: 文件名
+        :param sheet_name: 表名，None表示默认表
+        :param append: 是否在原有数据后追加
+        :param streaming: 流式写入，flush只刷新缓冲，close时才完成文件；否则每次flush后文件都完整可读
+        """
+        self.file_name = file_name
+        self.sheet_name = sheet_name
+        self.append = append
+        self.streaming = streaming
+        self.row = 0  # 文件中已有行数
+
+    def add_row(self, data: list):
+        self.add_rows((data,))
+
+    @abc.abstractmethod
+    def add_rows(self, rows: Iterable) -> int:
+        """
+        批量写入
+        :param rows: 行数据
+        :return:写入行数
+        """
+        pass
+
+    @abc.abstractmethod
+    def flush(self):
+        """
+        将已写入数据落盘，非流式写入时落盘后的文件必须完整可读
+        """
+        pass
+
+    @abc.abstractmethod
+    def close(self):
+        pass
+
+
+def count_lines(file_name: str, chunk_size: int = 1 << 24) -> int:
+    """
+    通过内存映射统计换行符得到行数，不解析文件内容。字段内含换行符的csv会多计
+    :param file_name: 文件名
+    :param chunk_size: 每次统计的字节数
+    :return:
+    """
+    size = os.path.getsize(file_name)
+    if size == 0:
+        return 0
+    count = 0
+    with open(file_name, mode='rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for start in range(0, size, chunk_size):
+            count += mm[start:start + chunk_size].count(b'\n')
+        if mm[size - 1:size] != b'\n':  # 最后一行没有换行符
+            count += 1
+    return count
+
+
+class CsvBackend(ExportBackend):
+    """
+    csv文件，行数记录在旁路文件<文件名>.rows中，追加时无需读取原文件。逐行追加，flush后文件即完整可读
+    """
+
+    def __init__(self, file_name: str, sheet_name: str = None, append: bool = False, streaming: bool = False):
+        self.__base_rows__ = 0  # 打开前文件中的行数，None表示尚未统计
+        self.__added_rows__ = 0  # 本次写入行数
+        ExportBackend.__init__(self, file_name, sheet_name, append, streaming)
+        self.__rows_file__ = file_name + '.rows'
+        if append and os.path.exists(file_name):
+            self.__base_rows__ = self.__read_rows_file__()
+        self.__file__ = open(file_name, mode='a' if append else 'w', newline='')
+        self.__writer__ = csv.writer(self.__file__)
+
+    def __read_rows_file__(self):
+        """
+        旁路文件记录的文件大小与实际一致时才可信
+        """
+        try:
+            with open(self.__rows_file__, mode='r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('size') != os.path.getsize(self.file_name):
+            return None
+        return meta.get('rows')
+
+    def __write_rows_file__(self):
+        if self.__base_rows__ is None:
+            return
+        temp = self.__rows_file__ + '.tmp'
+        with open(temp, mode='w') as f:
+            json.dump({'rows': self.row, 'size': os.path.getsize(self.file_name)}, f)
+        os.replace(temp, self.__rows_file__)
+
+    @property
+    def row(self) -> int:
+        if self.__base_rows__ is None:
+            # 没有可用的旁路文件，只统计打开前已落盘的部分
+            self.__file__.flush()
+            self.__base_rows__ = count_lines(self.file_name) - self.__added_rows__
+        return self.__base_rows__ + self.__added_rows__
+
+    @row.setter
+    def row(self, value: int):
+        self.__base_rows__ = value - self.__added_rows__
+
+    def add_rows(self, rows: Iterable) -> int:
+        rows = rows if isinstance(rows, (list, tuple)) else list(rows)
+        self.__writer__.writerows(rows)
+        self.__added_rows__ += len(rows)
+        return len(rows)
+
+    def flush(self):
+        self.__file__.flush()
+        self.__write_rows_file__()
+
+    def close(self):
+        self.__file__.close()
+        self.__write_rows_file__()
+
+
+class JsonLinesBackend(ExportBackend):
+    """
+    每行一个JSON数组，逐行追加，flush后文件即完整可读
+    """
+
+    def __init__(self, file_name: str, sheet_name: str = None, append: bool = False, streaming: bool = False):
+        ExportBackend.__init__(self, file_name, sheet_name, append, streaming)
+        if append and os.path.exists(file_name):
+            self.row = count_lines(file_name)
+        self.__file__ = open(file_name, mode='a' if append else 'w', encoding='utf-8')
+
+    def add_rows(self, rows: Iterable) -> int:
+        lines = [json.dumps(list(data), ensure_ascii=False) + '\n' for data in rows]
+        self.__file__.writelines(lines)
+        self.row += len(lines)
+        return len(lines)
+
+    def flush(self):
+        self.__file__.flush()
+
+    def close(self):
+        self.__file__.close()
+
+
+class XlsBackend(ExportBackend):
+    """
+    旧版xls（BIFF），基于xlwt，整个工作簿保存在内存中，最多65536行，不支持流式写入
+    """
+
+    def __init__(self, file_name: str, sheet_name: str = None, append: bool = False, streaming: bool = False):
+        import xlrd, xlwt
+        from xlutils.copy import copy
+
+        if streaming:
+            raise ValueError("XLS不支持流式写入")
+        ExportBackend.__init__(self, file_name, sheet_name, append, streaming)
+        if append and os.path.exists(file_name):
+            book = xlrd.open_workbook(file_name)
+            self.__book__ = copy(book)  # 完成xlrd对象向xlwt对象转换
+            try:
+                index = book.sheet_names().index(sheet_name) if sheet_name else 0
+            except ValueError:
+                index = 0
+            self.__worksheet__ = self.__book__.get_sheet(index)
+            self.row = book.sheet_by_index(index).nrows  # 获得行数
+        else:
+            self.__book__ = xlwt.Workbook(encoding='ascii')
+            self.__worksheet__ = self.__book__.add_sheet(sheetname=sheet_name or 'My Worksheet')
+
+    def add_rows(self, rows: Iterable) -> int:
+        before = self.row
+        for data in rows:
+            for c, label in enumerate(data):
+                self.__worksheet__.write(self.row, c, label)
+            self.row += 1
+        return self.row - before
+
+    def flush(self):
+        self.__book__.save(self.file_name)
+
+    def close(self):
+        self.flush()
+
+
+class XlsxBackend(ExportBackend):
+    """
+    基于openpyxl只写模式，行数据直接写入临时文件，内存占用与文件大小无关。
+    只写工作簿只能保存一次：流式写入时flush不写入文件，close时才一次性保存；
+    非流式写入时每次flush都保存文件，下次写入时重新复制原有数据
+    """
+
+    def __init__(self, file_name: str, sheet_name: str = None, append: bool = False, streaming: bool = False):
+        ExportBackend.__init__(self, file_name, sheet_name, append, streaming)
+        self.__book__ = None
+        self.__worksheet__ = None
+        self.__open__(append)
+
+    def __open__(self, append: bool):
+        from openpyxl import Workbook, load_workbook
+
+        self.__book__ = Workbook(write_only=True)
+        self.__worksheet__ = None
+        self.row = 0
+        if append and os.path.exists(self.file_name):
+            # 只读模式逐行复制原有数据，只需读取一次
+            source = load_workbook(self.file_name, read_only=True)
+            target_name = self.sheet_name if self.sheet_name in source.sheetnames else source.sheetnames[0]
+            for name in source.sheetnames:
+                sheet = self.__book__.create_sheet(title=name)
+                count = 0
+                for values in source[name].iter_rows(values_only=True):
+                    sheet.append(values)
+                    count += 1
+                if name == target_name:
+                    self.__worksheet__ = sheet
+                    self.row = count
+            source.close()
+        if self.__worksheet__ is None:
+            self.__worksheet__ = self.__book__.create_sheet(title=self.sheet_name or 'My Worksheet')
+
+    def add_rows(self, rows: Iterable) -> int:
+        if self.__book__ is None:
+            self.__open__(True)
+        before = self.row
+        for data in rows:
+            self.__worksheet__.append(data)
+            self.row += 1
+        return self.row - before
+
+    def flush(self):
+        """
+        流式写入时不做任何事，数据在close时写入
+        """
+        if not self.streaming:
+            self.close()
+
+    def close(self):
+        """
+        写入临时文件后替换原文件
+        :return:
+        """
+        if self.__book__ is None:
+            return
+        temp_name = self.file_name + '.tmp'
+        self.__book__.save(temp_name)
+        os.replace(temp_name, self.file_name)
+        self.__book__ = None
+
+
+class ParquetBackend(ExportBackend):
+    """
+    parquet列式文件，列名为c0、c1...，列数由第一批数据中最长的一行决定，较短的行以空值补齐。
+    数据先写入临时文件，流式写入时close才替换原文件；非流式写入时每次flush都替换，下次写入时重新复制原有数据
+    """
+
+    def __init__(self, file_name: str, sheet_name: str = None, append: bool = False, streaming: bool = False,
+                 batch_size: int = 10000):
+        ExportBackend.__init__(self, file_name, sheet_name, append, streaming)
+        self.batch_size = batch_size
+        self.__buffer__ = list()
+        self.__writer__ = None
+        self.__schema__ = None
+        self.__source__ = None  # 追加时原有文件
+        if append and os.path.exists(file_name):
+            import pyarrow.parquet as pq
+            self.__source__ = pq.ParquetFile(file_name)
+            self.__schema__ = self.__source__.schema_arrow
+            self.row = self.__source__.metadata.num_rows
+
+    def __open_writer__(self, table):
+        import pyarrow.parquet as pq
+
+        if self.__schema__ is None:
+            self.__schema__ = table.schema
+        self.__writer__ = pq.ParquetWriter(self.file_name + '.tmp', self.__schema__)
+        if self.__source__ is not None:
+            # parquet文件无法原地追加，按行组复制原有数据
+            for i in range(self.__source__.num_row_groups):
+                self.__writer__.write_table(self.__source__.read_row_group(i))
+            self.__source__ = None
+
+    def __write_buffer__(self):
+        import pyarrow as pa
+
+        if len(self.__buffer__) == 0:
+            return
+        width = len(self.__schema__) if self.__schema__ is not None else max(len(r) for r in self.__buffer__)
+        columns = [list() for _ in range(width)]
+        for data in self.__buffer__:
+            if len(data) > width:
+                raise ValueError("行数据列数{0}超过parquet文件列数{1}".format(len(data), width))
+            for i in range(width):
+                columns[i].append(data[i] if i < len(data) else None)
+        names = self.__schema__.names if self.__schema__ is not None else ['c{0}'.format(i) for i in range(width)]
+        if self.__schema__ is None:
+            table = pa.table(dict(zip(names, columns)))
+            # 整列为空时无法推断类型，按字符串处理
+            fields = [pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in table.schema]
+            self.__schema__ = pa.schema(fields)
+            table = table.cast(self.__schema__)
+        else:
+            table = pa.table(dict(zip(names, columns)), schema=self.__schema__)
+        if self.__writer__ is None:
+            self.__open_writer__(table)
+        self.__writer__.write_table(table)
+        self.__buffer__ = list()
+
+    def add_rows(self, rows: Iterable) -> int:
+        before = self.row
+        for data in rows:
+            self.__buffer__.append(list(data))
+            self.row += 1
+            if len(self.__buffer__) >= self.batch_size:
+                self.__write_buffer__()
+        return self.row - before
+
+    def flush(self):
+        if self.streaming:
+            self.__write_buffer__()
+            return
+        if self.__writer__ is None and len(self.__buffer__) == 0:
+            return
+        import pyarrow.parquet as pq
+
+        self.close()
+        self.__source__ = pq.ParquetFile(self.file_name)
+
+    def close(self):
+        self.__write_buffer__()
+        if self.__writer__ is not None:
+            self.__writer__.close()
+            self.__writer__ = None
+            os.replace(self.file_name + '.tmp', self.file_name)
+
+
+class SqliteBackend(ExportBackend):
+    """
+    SQLite表，表名为sheet_name，列名为c0、c1...，遇到更长的行自动加列，flush时提交事务
+    """
+
+    def __init__(self, file_name: str, sheet_name: str = None, append: bool = False, streaming: bool = False):
+        ExportBackend.__init__(self, file_name, sheet_name, append, streaming)
+        self.table = (sheet_name or 'My Worksheet').replace('"', '""')
+        self.__conn__ = sqlite3.connect(file_name)
+        if not append:
+            self.__conn__.execute('DROP TABLE IF EXISTS "{0}"'.format(self.table))
+        self.__conn__.execute('CREATE TABLE IF NOT EXISTS "{0}" (c0)'.format(self.table))
+        self.__width__ = len(self.__conn__.execute('PRAGMA table_info("{0}")'.format(self.table)).fetchall())
+        self.row = self.__conn__.execute('SELECT COUNT(*) FROM "{0}"'.format(self.table)).fetchone()[0]
+
+    def __ensure_width__(self, width: int):
+        while self.__width__ < width:
+            self.__conn__.execute('ALTER TABLE "{0}" ADD COLUMN c{1}'.format(self.table, self.__width__))
+            self.__width__ += 1
+
+    def add_rows(self, rows: Iterable) -> int:
+        rows = [list(data) for data in rows]
+        if len(rows) == 0:
+            return 0
+        self.__ensure_width__(max(len(data) for data in rows))
+        placeholders = ', '.join('?' * self.__width__)
+        self.__conn__.executemany('INSERT INTO "{0}" VALUES ({1})'.format(self.table, placeholders),
+                                  (data + [None] * (self.__width__ - len(data)) for data in rows))
+        self.row += len(rows)
+        return len(rows)
+
+    def flush(self):
+        self.__conn__.commit()
+
+    def close(self):
+        self.__conn__.commit()
+        self.__conn__.close()
+
+
+__backends__ = {
+    'csv': CsvBackend,
+    'xls': XlsBackend,
+    'xlsx': XlsxBackend,
+    'parquet': ParquetBackend,
+    'jsonl': JsonLinesBackend,
+    'db': SqliteBackend,
+}
+
+
+def register_backend(extension: str, backend: type):
+    """
+    注册文件类型对应的写入方式
+    :param extension: 文件后缀，与FileType的值一致
+    :param backend: ExportBackend子类
+    :return:
+    """
+    __backends__[extension] = backend
+
+
+def get_backend(extension: str) -> type:
+    try:
+        return __backends__[extension]
+    except KeyError:
+        raise ValueError("不支持的文件类型：{0}".format(extension))
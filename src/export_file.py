@@ -1,13 +1,17 @@
-import xlrd, xlwt, csv, os
-from io import TextIOWrapper
+import xlrd, itertools
 from enum import Enum
-from xlutils.copy import copy
+from typing import Iterable
+from src.export_backend import ExportBackend, get_backend
+from src.metrics import METRICS
 
 
 class FileType(Enum):
     CSV = 'csv'
     XLS = 'xls'
     XLSX = 'xlsx'
+    PARQUET = 'parquet'
+    JSONL = 'jsonl'
+    SQLITE = 'db'
 
 
 class FileModel(Enum):
@@ -17,52 +21,44 @@ class FileModel(Enum):
 
 
 class ExportFile(object):
-    __data_file__ = None  # 文件实例
-    row = 0  # 行数
-    __worksheet__ = None  # 表
-    __copy_adjust__ = False  # 用来判断是否获取过一次行数
+    __backend__: ExportBackend = None  # 写入方式实例
+    __row__ = 0  # 行数
 
-    def __init__(self, file_name: str, file_type: FileType, write_model: FileModel = FileModel.WB):
+    def __init__(self, file_name: str, file_type: FileType, write_model: FileModel = FileModel.WB,
+                 streaming: bool = False):
         """
 
         :param file_name:文件名
-        :param file_type:文件类型
+        :param file_type:文件类型，对应的写入方式见export_backend中的注册表
         :param write_model:写入方式：追加和覆盖
+        :param streaming:流式写入，追加开销只与新增行数有关，save只刷新缓冲，xlsx和parquet在close时才完成写入，
+                         必须调用close；非流式写入时每次save后文件都完整可读。不支持XLS
         """
+        if streaming and file_type == FileType.XLS:
+            raise ValueError("XLS不支持流式写入")
         self.file_type = file_type
         self.file_name = ''.join([file_name, '.', file_type.value])
         self.write_model = write_model
-        if write_model == FileModel.ADD:
-            self.__copy_adjust__ = True  # 可以获取文本行数
+        self.streaming = streaming
+
+    def __get_backend__(self, sheet_name: str = None) -> ExportBackend:
+        if self.__backend__ is None:
+            backend = get_backend(self.file_type.value)
+            self.__backend__ = backend(self.file_name, sheet_name, append=self.write_model == FileModel.ADD,
+                                       streaming=self.streaming)
+        return self.__backend__
+
+    @property
+    def row(self) -> int:
+        """
+        文件行数，追加csv时只在访问时才统计
+        """
+        if self.__backend__ is not None:
+            self.__row__ = self.__backend__.row
+        return self.__row__
 
     def write_to_file(self, data: list, sheet_name: str = 'My Worksheet'):
-        if self.file_type == FileType.XLS or self.file_type == FileType.XLSX:
-            if self.__data_file__ is None:
-                self.__data_file__ = xlwt.Workbook(encoding='ascii')
-                self.__worksheet__ = self.__data_file__.add_sheet(sheetname=sheet_name)
-            if self.file_type == FileType.XLS:
-
-                for c, label in enumerate(data):
-                    self.__write_to_xls__(self.row, c, label)
-            elif self.file_type == FileType.XLSX:
-                for c, label in enumerate(data):
-                    self.__write_to_xlsx__(self.row, c, label)
-            self.row += 1
-        elif self.file_type == FileType.CSV:
-            if self.__data_file__ is None:
-                if os.path.exists(self.file_name):
-
-                    if self.write_model == FileModel.ADD:
-                        self.__data_file__ = open(self.file_name, mode='a+', newline='')
-                    elif self.write_model == FileModel.WB:
-                        self.__data_file__ = open(self.file_name, mode='w+', newline='')
-                    self.__worksheet__ = csv.writer(self.__data_file__)
-
-                else:
-                    open(self.file_name, 'x').close()
-                    self.write_to_file(data, sheet_name)
-                    return
-            self.__write_to_csv__(data)
+        self.add_rows((data,), sheet_name)
 
     def add_row(self, data: list, sheet_name: str = None):
         """
@@ -70,117 +66,70 @@ class ExportFile(object):
         :param data: 数据列表
         :return:
         """
-        # 判断文件是否已经存在，不存在则创建后写入
-        if not os.path.exists(self.file_name):
-            if sheet_name is None:
-                self.write_to_file(data)
-            else:
-                self.write_to_file(data, sheet_name)
-            self.save()
-            return
-        if self.file_type == FileType.XLS or self.file_type == FileType.XLSX:
-
-            if self.__copy_adjust__:  # 确保文件只读取复制一次
-                book = xlrd.open_workbook(self.file_name)
-                self.__data_file__: xlwt.Workbook = copy(book)  # 完成xlrd对象向xlwt对象转换
-                if sheet_name is None:
-                    sheet = book.sheet_by_index(0)
-                    self.__worksheet__ = self.__data_file__.get_sheet(0)
-
-                else:
-                    try:
-                        sheet = book.sheet_by_name(sheet_name)
-                        self.__worksheet__ = self.__data_file__.get_sheet(sheet_name)
-
-                    except xlrd.XLRDError:
-                        sheet = book.sheet_by_index(0)
-                        self.__worksheet__ = self.__data_file__.get_sheet(0)
-                self.row = sheet.nrows  # 获得行数
-                self.__copy_adjust__ = False  # 后面的追加操作不能再读取行数了。
-
-        elif self.file_type == FileType.CSV:
-            if self.__copy_adjust__:  # 确保文件只读取复制一次
-                # 读取行数
-                with open(self.file_name, mode='r') as r:
-                    self.row = len([i for i in csv.reader(r)])
-
-                if self.write_model == FileModel.ADD:
-                    self.__data_file__: TextIOWrapper = open(self.file_name, mode='a+', newline='')
-                elif self.write_model == FileModel.WB:
-                    self.__data_file__: TextIOWrapper = open(self.file_name, mode='w+', newline='')
-                self.__worksheet__ = csv.writer(self.__data_file__)
-                self.__copy_adjust__ = False
-
-        if sheet_name is None:
-            self.write_to_file(data)
-        else:
-
-            self.write_to_file(data, sheet_name)
-
-    def __write_to_xls__(self, row, colum, label):
-        """
-        写入xls
-        :param row: 第几行
-        :param colum: 第几列
-        :param label: 数据
-        :return:
-        """
-        self.__worksheet__.write(row, colum, label)
-        self.row += 1
+        self.add_rows((data,), sheet_name)
 
-    def __write_to_xlsx__(self, row, colum, label):
+    def add_rows(self, rows: Iterable, sheet_name: str = None, batch_size: int = 1000) -> int:
         """
-        写入xls
-        :param row: 第几行
-        :param colum: 第几列
-        :param label: 数据
-        :return:
+        批量写入多行，按batch_size分批交给写入方式，内存占用与数据总量无关
+        :param rows: 行数据，可以是生成器
+        :param sheet_name: 表名
+        :param batch_size: 每批行数
+        :return:写入行数
         """
-        self.__worksheet__.write(row, colum, label)
+        backend = self.__get_backend__(sheet_name)
+        if isinstance(rows, (list, tuple)) and len(rows) <= batch_size:
+            return backend.add_rows(rows)
+        count = 0
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if len(batch) == 0:
+                break
+            count += backend.add_rows(batch)
+        return count
 
-    def __write_to_csv__(self, data: list):
+    def save(self):
         """
-        写入csv文件
-        :param data:数据列表
+        保存数据，保存后文件完整可读；流式写入时只刷新缓冲，xlsx和parquet在close时才写入文件
         :return:
         """
-        self.__worksheet__.writerow(data)
+        if self.__backend__ is None:
+            return
+        with METRICS.timer('save', self.file_type.value):
+            self.__backend__.flush()
 
-    def save(self):
+    def close(self):
         """
-        保存数据
+        完成写入并关闭文件
         :return:
         """
-        if self.file_type == FileType.XLS or self.file_type == FileType.XLSX:
-
-            self.__data_file__.save(self.file_name)
-
-        elif self.file_type == FileType.CSV:
-            if not self.__copy_adjust__:
-                self.__data_file__.close()
+        if self.__backend__ is None:
+            return
+        self.__row__ = self.__backend__.row
+        self.__backend__.close()
+        self.__backend__ = None
+        self.write_model = FileModel.ADD  # 再次写入时在已保存数据后追加
 
     @property
     def fieldnames(self):
-        return self.__data_file__
+        return self.__backend__
 
     @fieldnames.setter
     def fieldnames(self, value):
         """
 
-        :param value: xlwt.Workbook类型或者TextIOWrapper类型
+        :param value: ExportBackend实例
         :return:
         """
-        self.__data_file__ = value
+        self.__backend__ = value
 
     @fieldnames.getter
     def fieldnames(self):
-        if isinstance(self.__data_file__, TextIOWrapper):
-            return self.__data_file__.name
-        elif isinstance(self.__data_file__, xlwt.Workbook):
+        if self.__backend__ is not None:
             return self.file_name
 
     def read_rows(self, start_colx=0, end_colx=None, sheetname: str = None):
-        if self.file_type == FileType.XLSX or self.file_type == FileType.XLS:
+        if self.file_type == FileType.XLS:
             book = xlrd.open_workbook(self.file_name)
             if sheetname is None:
                 table = book.sheet_by_index(0)
@@ -190,3 +139,11 @@ class ExportFile(object):
                 end_colx = table.nrows
             for i in range(start_colx, end_colx):
                 yield table.row_values(i)
+        elif self.file_type == FileType.XLSX:
+            from openpyxl import load_workbook
+
+            book = load_workbook(self.file_name, read_only=True)
+            table = book.worksheets[0] if sheetname is None else book[sheetname]
+            for values in table.iter_rows(min_row=start_colx + 1, max_row=end_colx, values_only=True):
+                yield list(values)
+            book.close()
@@ -0,0 +1,97 @@
+import re
+
+# 预编译的提取规则，热点路径上不再每次调用re.search/re.match时查找模式缓存
+POIID_PATTERN = re.compile(r'poiid\D+(\d+)"')  # 景点网页中的poiid
+POIID_BYTES_PATTERN = re.compile(rb'poiid\D+(\d+)"')  # 同上，直接匹配未解码的网页
+SIGHT_URL_PATTERN = re.compile(r'sight/([a-zA-Z]+)(\d+)/(\d+)\Shtml')  # 景点链接，如/sight/guangzhou152/107540.html
+STAR_PATTERN = re.compile(r'\D+(\d+)')  # 评分样式，如width:80%
+TAB_PATTERN = re.compile(r'(\D+)(\d+)')  # 搜索结果标签，如景点120
+WHITESPACE_PATTERN = re.compile(r'\s')
+HQJSON_PATTERN = re.compile(r'var hqjson=')  # 基金代码列表脚本前缀
+# 评论网页中的评论节点，class属性中含有完整的comment_single类名，不匹配comment_single_extra等
+COMMENT_SINGLE_PATTERN = re.compile(r'<div\b[^>]*\bclass\s*=\s*["\'](?:[^"\']*\s)?comment_single(?:\s[^"\']*)?["\']')
+
+
+class SightIds(object):
+    """
+    景点链接中的城市和景区信息
+    """
+    __slots__ = ['district_name', 'district_id', 'resource_id']
+
+    def __init__(self, district_name: str, district_id: int, resource_id: int):
+        """
+        :param district_name: 城市名，拼音首字母大写，如Guangzhou
+        :param district_id: 城市id
+        :param resource_id: 景区id
+        """
+        self.district_name = district_name
+        self.district_id = district_id
+        self.resource_id = resource_id
+
+    def __str__(self):
+        return "{district_name}\t{district_id}\t{resource_id}".format_map(
+            {'district_name': self.district_name, 'district_id': self.district_id, 'resource_id': self.resource_id})
+
+
+def parse_sight_url(url: str) -> SightIds:
+    """
+    一次匹配解析景点链接中的全部信息
+    :param url: 景点链接
+    :return:SightIds，不是景点链接时为None
+    """
+    result = SIGHT_URL_PATTERN.search(url)
+    if result is None:
+        return None
+    return SightIds(result.group(1).capitalize(), int(result.group(2)), int(result.group(3)))
+
+
+def has_comment(html: str) -> bool:
+    """
+    不解析网页，判断评论网页中是否有评论节点，用于决定是否继续翻页
+    :param html: 评论网页文本
+    :return:
+    """
+    return COMMENT_SINGLE_PATTERN.search(html) is not None
+
+
+def find_poiid(content) -> int:
+    """
+    查找景点网页中的poiid，bytes直接匹配，不需要先把整个网页解码为文本
+    :param content: 网页内容，bytes或str
+    :return:poiid，找不到时为None
+    """
+    pattern = POIID_BYTES_PATTERN if isinstance(content, (bytes, bytearray, memoryview)) else POIID_PATTERN
+    result = pattern.search(content)
+    if result is None:
+        return None
+    return int(result.group(1))
+
+
+def parse_star(style: str) -> float:
+    """
+    评分样式转换为评分，如width:80% -> 4.0
+    :param style: 评分span的style属性
+    :return:
+    """
+    return int(STAR_PATTERN.match(style).group(1)) / 20
+
+
+def parse_tab(text: str) -> tuple:
+    """
+    解析搜索结果标签
+    :param text: 标签文本，如"景点 120"
+    :return:(标签, 结果数目)
+    """
+    result = TAB_PATTERN.match(strip_whitespace(text))
+    return result.group(1), int(result.group(2))
+
+
+def strip_whitespace(text: str) -> str:
+    return WHITESPACE_PATTERN.sub('', text)
+
+
+def strip_hqjson(text: str) -> str:
+    """
+    去掉基金代码列表脚本中的变量声明，只保留JSON
+    """
+    return HQJSON_PATTERN.sub('', text)
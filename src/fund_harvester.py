@@ -0,0 +1,98 @@
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Iterable
+from urllib import parse
+from src.export_file import ExportFile
+from src.tonghuashun import FundInfo, FundCodeInfo
+from src.transport import HostRateLimiter
+
+
+class FundHarvester(object):
+    """
+    并发抓取全部基金的详情并直接写入文件
+    """
+
+    def __init__(self, fund_info: FundInfo = None, concurrency: int = 16, rate: float = None, retries: int = 3,
+                 retry_delay: float = 1.0):
+        """
+        :param fund_info: 基金信息接口
+        :param concurrency: 同时进行的请求数
+        :param rate: 基金详情接口每秒最多请求数，None表示不限制
+        :param retries: 网络错误重试次数
+        :param retry_delay: 第一次重试等待秒数，之后每次翻倍
+        """
+        self.fund_info = fund_info if fund_info is not None else FundInfo()
+        self.concurrency = concurrency
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.failed = list()  # 重试后仍失败的基金代码
+        self.empty = list()  # 没有详情数据的基金代码
+        self.host = parse.urlparse(self.fund_info.fund_detail_url).netloc
+        self.fund_info.transport.ensure_host_pool_size(self.host, concurrency)  # 每个线程一个连接
+        # 频率只限制本次抓取，不修改共享连接池的限制器，其他使用同一连接池的组件不受影响
+        self.rate_limiter = HostRateLimiter(host_rates={self.host: rate}) if rate is not None else None
+
+    def __fetch__(self, fund_code: str) -> list:
+        delay = self.retry_delay
+        for attempt in range(self.retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.wait(self.host)
+            try:
+                return self.fund_info.get_func_info(fund_code, raise_on_error=True)
+            except (requests.RequestException, ValueError):
+                if attempt == self.retries:
+                    raise
+                time.sleep(delay)
+                delay *= 2
+
+    def harvest(self, funds: Iterable, writer: ExportFile, batch_size: int = 200) -> int:
+        """
+        抓取基金详情并分批写入
+        :param funds: FundCodeInfo的可迭代对象，如FundInfo.get_all_fund_base_info()
+        :param writer: 导出文件
+        :param batch_size: 每批写入行数
+        :return:写入行数
+        """
+        funds = iter(funds)
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        in_flight = dict()  # 存储格式{future:基金代码}
+        rows = list()
+        count = 0
+        exhausted = False
+        try:
+            while True:
+                # 限制排队任务数，避免一次性取完生成器
+                while not exhausted and len(in_flight) < self.concurrency * 2:
+                    try:
+                        fund: FundCodeInfo = next(funds)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    in_flight[executor.submit(self.__fetch__, fund.fund_code)] = fund.fund_code
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight.keys(), return_when=FIRST_COMPLETED)
+                for future in done:
+                    fund_code = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception:
+                        self.failed.append(fund_code)
+                        continue
+                    if result is None:
+                        self.empty.append(fund_code)
+                        continue
+                    rows.append(result)
+                if len(rows) >= batch_size:
+                    count += writer.add_rows(rows)
+                    writer.save()
+                    rows = list()
+            if rows:
+                count += writer.add_rows(rows)
+            writer.save()
+        finally:
+            for future in in_flight:
+                future.cancel()
+            executor.shutdown(wait=True)
+        return count
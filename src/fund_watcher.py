@@ -0,0 +1,118 @@
+import logging
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from urllib import parse
+from src.tonghuashun import FundInfo, FundTrend, FUND_TREND_INDEX
+
+logger = logging.getLogger(__name__)
+
+
+class TrendChange(object):
+    """
+    基金涨跌区间变化
+    """
+    __slots__ = ['fund_code', 'special_code', 'rate', 'trend', 'previous']
+
+    def __init__(self, fund_code: str, special_code: str, rate: float, trend: FundTrend, previous: FundTrend):
+        """
+        :param fund_code: 基金代码
+        :param special_code: 信息代码
+        :param rate: 当前涨跌幅
+        :param trend: 当前所在区间
+        :param previous: 上一次所在区间
+        """
+        self.fund_code = fund_code
+        self.special_code = special_code
+        self.rate = rate
+        self.trend = trend
+        self.previous = previous
+
+    def __str__(self):
+        return "{fund_code}\t{rate}\t{previous} -> {trend}".format_map(
+            {'fund_code': self.fund_code, 'rate': self.rate,
+             'previous': self.previous.name if self.previous else None,
+             'trend': self.trend.name if self.trend else None})
+
+
+class FundWatcher(object):
+    """
+    定时扫描全部基金的实时估值，只报告涨跌区间发生变化的基金
+    """
+
+    def __init__(self, fund_info: FundInfo = None, funds: List = None, concurrency: int = 64, interval: float = 60):
+        """
+        :param fund_info: 基金信息接口
+        :param funds: FundCodeInfo列表，None表示使用全部基金
+        :param concurrency: 同时进行的请求数
+        :param interval: 扫描间隔（秒）
+        """
+        self.fund_info = fund_info if fund_info is not None else FundInfo()
+        self.funds = funds
+        self.concurrency = concurrency
+        self.interval = interval
+        self.__trends__ = dict()  # 存储格式{基金代码:FundTrend}
+        self.__executor__ = ThreadPoolExecutor(max_workers=concurrency)
+        # 连接池小于并发数时，多出的线程每次都要新建连接且用完即丢弃
+        self.fund_info.transport.ensure_host_pool_size(parse.urlparse(self.fund_info.valuation_url).netloc,
+                                                       concurrency)
+
+    def __rate__(self, special_code: str):
+        """
+        请求失败或估值数据格式错误时记录日志并返回None，该基金本次不参与比较
+        """
+        try:
+            return self.fund_info.get_realtime_valuation(special_code)
+        except requests.RequestException as e:
+            logger.warning("请求实时估值失败：%s %r", special_code, e)
+        except ValueError as e:
+            logger.warning("实时估值数据格式错误：%s %r", special_code, e)
+        return None
+
+    def tick(self) -> List[TrendChange]:
+        """
+        扫描一次
+        :return:区间发生变化的基金
+        """
+        if self.funds is None:
+            self.funds = list(self.fund_info.get_all_fund_base_info())
+        rates = list(self.__executor__.map(self.__rate__, [fund.spceial_code for fund in self.funds]))
+        trends = FUND_TREND_INDEX.labels([rate if rate is not None else float('nan') for rate in rates])
+        changes = list()
+        for fund, rate, trend in zip(self.funds, rates, trends):
+            if rate is None:
+                continue
+            previous = self.__trends__.get(fund.fund_code)
+            if trend != previous:
+                self.__trends__[fund.fund_code] = trend
+                changes.append(TrendChange(fund.fund_code, fund.spceial_code, rate, trend, previous))
+        return changes
+
+    def run(self, callback, ticks: int = None, clock=time.monotonic, sleep=time.sleep):
+        """
+        按固定间隔扫描，每次把变化交给callback。某次扫描超过间隔时，错过的扫描不再补做，等到下一个间隔开始
+        :param callback: 参数为TrendChange列表
+        :param ticks: 扫描次数，None表示一直运行
+        :param clock: 时钟
+        :param sleep: 等待函数
+        :return:
+        """
+        start = clock()
+        slot = 0  # 当前扫描所在的间隔序号
+        count = 0
+        while ticks is None or count < ticks:
+            changes = self.tick()
+            if changes:
+                callback(changes)
+            count += 1
+            if ticks is not None and count >= ticks:
+                break
+            now = clock()
+            slot = max(slot + 1, int((now - start) // self.interval) + 1)
+            delay = start + slot * self.interval - now
+            if delay > 0:
+                sleep(delay)
+
+    def close(self):
+        self.__executor__.shutdown(wait=True)
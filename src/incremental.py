@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import threading
+from typing import List
+from src.xiecheng import CommentView, SingleComment, parse_comment_page
+
+
+def comment_hash(comment: SingleComment) -> str:
+    """
+    评论指纹：作者+评论内容
+    :param comment:
+    :return:
+    """
+    return hashlib.sha1('\x00'.join([comment.author, comment.comment]).encode('utf-8')).hexdigest()[:16]
+
+
+class Watermark(object):
+    """
+    某个景点已抓取到的最新评论位置
+    """
+    __slots__ = ['date_published', 'hashes']
+
+    def __init__(self, date_published: str, hashes: list):
+        """
+        :param date_published: 已抓取的最新评论发布日期
+        :param hashes: 该日期下已抓取评论的指纹
+        """
+        self.date_published = date_published
+        self.hashes = hashes
+
+    def seen(self, comment: SingleComment) -> bool:
+        """
+        判断评论是否已经抓取过，评论按发布日期从新到旧排列
+        """
+        if comment.date_published < self.date_published:
+            return True
+        return comment.date_published == self.date_published and comment_hash(comment) in self.hashes
+
+    def covers(self, comment: SingleComment) -> bool:
+        """
+        作为上一轮抓取到的最旧位置时，判断评论是否不早于该位置，即上一轮已经抓取过
+        """
+        if comment.date_published > self.date_published:
+            return True
+        return comment.date_published == self.date_published and comment_hash(comment) in self.hashes
+
+    def to_dict(self) -> dict:
+        return {'date_published': self.date_published, 'hashes': self.hashes}
+
+
+def __mark__(comments: List, date_published: str, base: Watermark = None) -> Watermark:
+    """
+    由某个发布日期下的评论生成抓取位置
+    :param comments: 评论
+    :param date_published: 发布日期
+    :param base: 已有位置，日期相同时合并指纹
+    :return:
+    """
+    hashes = [comment_hash(comment) for comment in comments if comment.date_published == date_published]
+    if base is not None and base.date_published == date_published:
+        hashes = base.hashes + [h for h in hashes if h not in base.hashes]
+    return Watermark(date_published, hashes)
+
+
+class ResumePoint(object):
+    """
+    因页数限制未翻到旧抓取位置时的断点，下次从断点继续往旧评论抓取，抓取完成后才推进抓取位置
+    """
+    __slots__ = ['page', 'newest', 'oldest']
+
+    def __init__(self, page: int, newest: Watermark, oldest: Watermark):
+        """
+        :param page: 下次开始抓取的评论分页
+        :param newest: 本轮抓取到的最新评论，抓取完成后作为新的抓取位置
+        :param oldest: 本轮已抓取到的最旧评论，新评论使分页后移时据此跳过已抓取的评论
+        """
+        self.page = page
+        self.newest = newest
+        self.oldest = oldest
+
+
+class WatermarkStore(object):
+    """
+    保存每个景点的抓取位置，存储格式{"poi_id:resource_id":{"date_published":..., "hashes":[...], "resume":{...}}}，
+    resume为未完成的断点，格式{"page":..., "newest":{...}, "oldest":{...}}
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: json文件路径
+        """
+        self.path = path
+        self.__lock__ = threading.Lock()
+        self.__marks__ = dict()
+        if os.path.exists(path):
+            with open(path, mode='r', encoding='utf-8') as f:
+                self.__marks__ = json.load(f)
+
+    @staticmethod
+    def key(poi_id: int, resource_id: int) -> str:
+        return '{0}:{1}'.format(poi_id, resource_id)
+
+    def get(self, poi_id: int, resource_id: int) -> Watermark:
+        mark = self.__marks__.get(self.key(poi_id, resource_id))
+        if mark is None or mark.get('date_published') is None:
+            return None
+        return Watermark(mark['date_published'], mark['hashes'])
+
+    def get_resume(self, poi_id: int, resource_id: int) -> ResumePoint:
+        mark = self.__marks__.get(self.key(poi_id, resource_id))
+        if mark is None or mark.get('resume') is None:
+            return None
+        resume = mark['resume']
+        return ResumePoint(resume['page'], Watermark(**resume['newest']), Watermark(**resume['oldest']))
+
+    def update(self, poi_id: int, resource_id: int, comments: List):
+        """
+        抓取已到达旧抓取位置（或最后一页）时推进抓取位置，并清除断点
+        :param comments: 新评论，按发布日期从新到旧排列
+        :return:
+        """
+        resume = self.get_resume(poi_id, resource_id)
+        if resume is not None:
+            mark = __mark__(comments, resume.newest.date_published, resume.newest)  # 断点之后的评论都不晚于newest
+        elif len(comments) > 0:
+            mark = __mark__(comments, max(comment.date_published for comment in comments),
+                            self.get(poi_id, resource_id))
+        else:
+            return
+        with self.__lock__:
+            self.__marks__[self.key(poi_id, resource_id)] = mark.to_dict()
+
+    def suspend(self, poi_id: int, resource_id: int, page: int, comments: List):
+        """
+        未到达旧抓取位置时保存断点，抓取位置保持不变
+        :param page: 下次开始抓取的评论分页
+        :param comments: 本轮新评论，按发布日期从新到旧排列
+        :return:
+        """
+        resume = self.get_resume(poi_id, resource_id)
+        if len(comments) > 0:
+            oldest_date = min(comment.date_published for comment in comments)
+            oldest = __mark__(comments, oldest_date, resume.oldest if resume is not None else None)
+            newest = resume.newest if resume is not None else \
+                __mark__(comments, max(comment.date_published for comment in comments))
+        elif resume is not None:
+            newest, oldest = resume.newest, resume.oldest
+        else:
+            return
+        with self.__lock__:
+            mark = self.__marks__.setdefault(self.key(poi_id, resource_id), dict())
+            mark['resume'] = {'page': page, 'newest': newest.to_dict(), 'oldest': oldest.to_dict()}
+
+    def save(self):
+        """
+        原子写入，避免中途退出损坏文件
+        :return:
+        """
+        with self.__lock__:
+            temp = self.path + '.tmp'
+            with open(temp, mode='w', encoding='utf-8') as f:
+                json.dump(self.__marks__, f, ensure_ascii=False)
+            os.replace(temp, self.path)
+
+
+def crawl_new_comments(view: CommentView, url: str, store: WatermarkStore, max_pages: int = None) -> List:
+    """
+    增量抓取景点评论，遇到已抓取过的评论即停止翻页。
+    受max_pages限制未翻到已抓取过的评论时不推进抓取位置，而是保存断点，下次从断点继续抓取，
+    直到到达旧抓取位置或最后一页才推进抓取位置
+    :param view: 评论视图
+    :param url: 景点网页链接
+    :param store: 抓取位置存储
+    :param max_pages: 本次最多抓取页数，None表示不限制
+    :return:新评论列表，按发布日期从新到旧排列
+    """
+    view.resolve_sight(url)
+    watermark = store.get(view.poi_id, view.resource_id)
+    resume = store.get_resume(view.poi_id, view.resource_id)
+    elements = list()
+    page = resume.page if resume is not None else 1
+    fetched = 0
+    finished = False  # 到达旧抓取位置或最后一页
+    while not finished and (max_pages is None or fetched < max_pages):
+        comments = parse_comment_page(view.fetch_page(page), view.parser)
+        fetched += 1
+        if len(comments) == 0:
+            finished = True
+            break
+        for comment in comments:
+            if resume is not None and resume.oldest.covers(comment):
+                continue  # 上次已抓取，新评论使分页后移
+            if watermark is not None and watermark.seen(comment):
+                finished = True
+                break
+            elements.append(comment)
+        page += 1
+    if finished:
+        store.update(view.poi_id, view.resource_id, elements)
+    else:
+        store.suspend(view.poi_id, view.resource_id, page, elements)
+    store.save()
+    return elements
@@ -0,0 +1,227 @@
+import bisect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# 耗时直方图的桶上界（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class EndpointStats(object):
+    """
+    单个接口（或解析、保存步骤）的统计：耗时直方图、字节数、数据条数、错误数
+    """
+    __slots__ = ['buckets', 'counts', 'count', 'total_seconds', 'nbytes', 'items', 'errors']
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个桶为+Inf
+        self.count = 0
+        self.total_seconds = 0.0
+        self.nbytes = 0
+        self.items = 0
+        self.errors = 0
+
+    def observe(self, seconds: float, nbytes: int = 0, items: int = 0, error: bool = False):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total_seconds += seconds
+        self.nbytes += nbytes
+        self.items += items
+        if error:
+            self.errors += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        按桶估计分位数，返回所在桶的上界
+        :param q: 0~1
+        :return:没有数据时为None，落在+Inf桶时为inf
+        """
+        if self.count == 0:
+            return None
+        target = q * self.count
+        total = 0
+        for i, count in enumerate(self.counts):
+            total += count
+            if total >= target and count > 0:
+                return self.buckets[i] if i < len(self.buckets) else float('inf')
+        return float('inf')
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'seconds': self.total_seconds,
+            'bytes': self.nbytes,
+            'items': self.items,
+            'errors': self.errors,
+            'error_rate': self.errors / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'buckets': OrderedDict((str(le), count) for le, count in
+                                   zip(list(self.buckets) + ['+Inf'], self.counts)),
+        }
+
+
+class Timer(object):
+    """
+    计时上下文，退出时记录一次观测；with块内可设置nbytes、items、error
+    """
+    __slots__ = ['registry', 'kind', 'endpoint', 'nbytes', 'items', 'error', 'start']
+
+    def __init__(self, registry, kind: str, endpoint: str):
+        self.registry = registry
+        self.kind = kind
+        self.endpoint = endpoint
+        self.nbytes = 0
+        self.items = 0
+        self.error = False
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.registry.observe(self.kind, self.endpoint, time.perf_counter() - self.start, self.nbytes, self.items,
+                              self.error or exc_type is not None)
+        return False
+
+
+class NullTimer(object):
+    """
+    关闭统计时使用的空计时上下文，不记录任何数据
+    """
+    __slots__ = ['nbytes', 'items', 'error']
+
+    def __init__(self):
+        self.nbytes = 0
+        self.items = 0
+        self.error = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+__null_timer__ = NullTimer()
+
+
+class MetricsRegistry(object):
+    """
+    统计数据注册表，按(类别, 接口)汇总。类别如http、parse、save
+    """
+
+    def __init__(self, enabled: bool = False, buckets: tuple = DEFAULT_BUCKETS):
+        """
+        :param enabled: 是否开启统计，关闭时timer返回空计时上下文
+        :param buckets: 耗时直方图的桶上界（秒）
+        """
+        self.enabled = enabled
+        self.buckets = buckets
+        self.__stats__ = dict()  # 存储格式{(类别, 接口):EndpointStats}
+        self.__lock__ = threading.Lock()
+
+    def timer(self, kind: str, endpoint: str):
+        """
+        :param kind: 类别
+        :param endpoint: 接口或步骤名
+        :return:计时上下文
+        """
+        if not self.enabled:
+            return __null_timer__
+        return Timer(self, kind, endpoint)
+
+    def observe(self, kind: str, endpoint: str, seconds: float, nbytes: int = 0, items: int = 0,
+                error: bool = False):
+        if not self.enabled:
+            return
+        key = (kind, endpoint)
+        with self.__lock__:
+            stats = self.__stats__.get(key)
+            if stats is None:
+                stats = self.__stats__[key] = EndpointStats(self.buckets)
+            stats.observe(seconds, nbytes, items, error)
+
+    def get(self, kind: str, endpoint: str) -> EndpointStats:
+        return self.__stats__.get((kind, endpoint))
+
+    def reset(self):
+        with self.__lock__:
+            self.__stats__.clear()
+
+    def snapshot(self) -> OrderedDict:
+        """
+        :return:存储格式{类别:{接口:统计字典}}
+        """
+        result = OrderedDict()
+        with self.__lock__:
+            for (kind, endpoint), stats in sorted(self.__stats__.items()):
+                result.setdefault(kind, OrderedDict())[endpoint] = stats.to_dict()
+        return result
+
+    def to_prometheus(self, prefix: str = 'xiecheng') -> str:
+        """
+        导出为Prometheus文本格式
+        :param prefix: 指标名前缀
+        :return:
+        """
+        lines = list()
+        with self.__lock__:
+            items = sorted(self.__stats__.items())
+            lines.append('# TYPE {0}_duration_seconds histogram'.format(prefix))
+            for (kind, endpoint), stats in items:
+                labels = 'kind="{0}",endpoint="{1}"'.format(__escape__(kind), __escape__(endpoint))
+                total = 0
+                for le, count in zip(list(stats.buckets) + ['+Inf'], stats.counts):
+                    total += count
+                    lines.append('{0}_duration_seconds_bucket{{{1},le="{2}"}} {3}'.format(prefix, labels, le, total))
+                lines.append('{0}_duration_seconds_sum{{{1}}} {2}'.format(prefix, labels, stats.total_seconds))
+                lines.append('{0}_duration_seconds_count{{{1}}} {2}'.format(prefix, labels, stats.count))
+            for name, field in (('bytes', 'nbytes'), ('items', 'items'), ('errors', 'errors')):
+                lines.append('# TYPE {0}_{1}_total counter'.format(prefix, name))
+                for (kind, endpoint), stats in items:
+                    labels = 'kind="{0}",endpoint="{1}"'.format(__escape__(kind), __escape__(endpoint))
+                    lines.append('{0}_{1}_total{{{2}}} {3}'.format(prefix, name, labels, getattr(stats, field)))
+        return '\n'.join(lines) + '\n'
+
+    def write_json(self, path: str):
+        """
+        写入本地JSON文件（先写临时文件再替换）
+        :param path: 文件路径
+        :return:
+        """
+        temp = path + '.tmp'
+        with open(temp, mode='w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(temp, path)
+
+    def write_prometheus(self, path: str):
+        """
+        写入Prometheus文本文件，供node_exporter的textfile采集
+        :param path: 文件路径
+        :return:
+        """
+        temp = path + '.tmp'
+        with open(temp, mode='w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        os.replace(temp, path)
+
+
+def __escape__(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+METRICS = MetricsRegistry()  # 进程内共享的统计数据，默认关闭
+
+
+def enable_metrics(enabled: bool = True) -> MetricsRegistry:
+    """
+    开启或关闭进程内统计
+    :return:METRICS
+    """
+    METRICS.enabled = enabled
+    return METRICS
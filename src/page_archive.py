@@ -0,0 +1,332 @@
+import importlib.util
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+from urllib import parse
+from src.xiecheng import ParserBackend, parse_comment_page, parse_attraction_list
+
+# 记录格式：头部 + 键 + 元数据(JSON) + 压缩后的网页
+# 头部：魔数、压缩方式、键长度、元数据长度、数据长度
+__record_header__ = struct.Struct('<4sBIII')
+__magic__ = b'PGA1'
+__codec_ids__ = {'zlib': 1, 'zstd': 2}
+__codec_names__ = {v: k for k, v in __codec_ids__.items()}
+__local__ = threading.local()
+
+
+def page_key(url: str, body: dict = None) -> str:
+    """
+    归档键：链接+按键排序的POST参数
+    """
+    if not body:
+        return url
+    return '\n'.join([url, parse.urlencode(sorted((str(k), str(v)) for k, v in body.items()))])
+
+
+def zstd_available() -> bool:
+    return importlib.util.find_spec('zstandard') is not None
+
+
+def __compress__(codec: str, data: bytes, level: int) -> bytes:
+    if codec == 'zstd':
+        compressors = getattr(__local__, 'compressors', None)
+        if compressors is None:
+            compressors = __local__.compressors = dict()
+        compressor = compressors.get(level)
+        if compressor is None:
+            import zstandard
+            compressor = compressors[level] = zstandard.ZstdCompressor(level=level)
+        return compressor.compress(data)
+    return zlib.compress(data, level)
+
+
+def __decompress__(codec_id: int, data) -> bytes:
+    if codec_id == __codec_ids__['zstd']:
+        decompressor = getattr(__local__, 'decompressor', None)
+        if decompressor is None:
+            import zstandard
+            decompressor = __local__.decompressor = zstandard.ZstdDecompressor()
+        return decompressor.decompress(data)
+    return zlib.decompress(data)
+
+
+class ArchivedPage(object):
+    """
+    归档中的一个网页
+    """
+    __slots__ = ['kind', 'url', 'body', 'final_url', 'fetched_at', 'html']
+
+    def __init__(self, kind: str, url: str, body: dict, final_url: str, fetched_at: float, html: str):
+        """
+        :param kind: 网页类型，如comment、attraction_list
+        :param url: 请求链接
+        :param body: POST参数
+        :param final_url: 响应链接（重定向之后）
+        :param fetched_at: 抓取时间戳
+        :param html: 网页文本
+        """
+        self.kind = kind
+        self.url = url
+        self.body = body
+        self.final_url = final_url
+        self.fetched_at = fetched_at
+        self.html = html
+
+
+def __read_record__(buffer, offset: int) -> ArchivedPage:
+    magic, codec_id, key_len, meta_len, data_len = __record_header__.unpack_from(buffer, offset)
+    if magic != __magic__:
+        raise ValueError("归档记录损坏，偏移：{0}".format(offset))
+    start = offset + __record_header__.size + key_len
+    meta = json.loads(bytes(buffer[start:start + meta_len]).decode('utf-8'))
+    start += meta_len
+    html = __decompress__(codec_id, buffer[start:start + data_len]).decode('utf-8')
+    return ArchivedPage(meta['kind'], meta['url'], meta.get('body'), meta.get('final_url'), meta['fetched_at'], html)
+
+
+class PageArchive(object):
+    """
+    只追加的原始网页归档：网页压缩后依次写入分段文件，SQLite索引记录每个键最新版本所在的分段和偏移，
+    修复解析错误或网页改版后可用reparse重新解析，不需要重新请求
+    """
+
+    def __init__(self, directory: str, segment_size: int = 256 * 1024 * 1024, codec: str = None, level: int = None):
+        """
+        :param directory: 归档目录
+        :param segment_size: 单个分段文件的大小上限（字节）
+        :param codec: 压缩方式，zstd或zlib，默认安装了zstandard时用zstd
+        :param level: 压缩级别，默认zstd为3，zlib为6
+        """
+        if codec is None:
+            codec = 'zstd' if zstd_available() else 'zlib'
+        if codec not in __codec_ids__:
+            raise ValueError("不支持的压缩方式：{0}".format(codec))
+        self.directory = directory
+        self.segment_size = segment_size
+        self.codec = codec
+        self.level = level if level is not None else (3 if codec == 'zstd' else 6)
+        os.makedirs(directory, exist_ok=True)
+        self.__lock__ = threading.Lock()
+        self.__conn__ = sqlite3.connect(os.path.join(directory, 'index.db'), check_same_thread=False)
+        self.__conn__.execute("PRAGMA journal_mode=WAL")
+        self.__conn__.execute("CREATE TABLE IF NOT EXISTS pages ("
+                              "key TEXT PRIMARY KEY, kind TEXT NOT NULL, segment INTEGER NOT NULL, "
+                              "offset INTEGER NOT NULL, length INTEGER NOT NULL, fetched_at REAL NOT NULL)")
+        self.__conn__.execute("CREATE INDEX IF NOT EXISTS pages_kind ON pages(kind, segment, offset)")
+        self.__conn__.commit()
+        segments = self.segments()
+        self.__segment__ = segments[-1] if segments else 1
+        self.__file__ = open(self.segment_path(self.__segment__), mode='ab')
+        self.__uncommitted__ = 0
+
+    def segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, 'segment-{0:06d}.pga'.format(segment))
+
+    def segments(self) -> List[int]:
+        """
+        :return:已有分段编号，升序
+        """
+        return sorted(int(name[8:14]) for name in os.listdir(self.directory)
+                      if name.startswith('segment-') and name.endswith('.pga'))
+
+    def put(self, kind: str, url: str, body: dict, html: str, final_url: str = None):
+        """
+        写入网页，同一键再次写入时索引指向最新版本
+        :param kind: 网页类型，如comment、attraction_list
+        :param url: 请求链接
+        :param body: POST参数
+        :param html: 网页文本
+        :param final_url: 响应链接（重定向之后）
+        :return:
+        """
+        key = page_key(url, body).encode('utf-8')
+        fetched_at = time.time()
+        meta = json.dumps({'kind': kind, 'url': url, 'body': body, 'final_url': final_url or url,
+                           'fetched_at': fetched_at}, ensure_ascii=False).encode('utf-8')
+        data = __compress__(self.codec, html.encode('utf-8'), self.level)  # 压缩在锁外进行
+        record = b''.join([__record_header__.pack(__magic__, __codec_ids__[self.codec], len(key), len(meta),
+                                                  len(data)), key, meta, data])
+        with self.__lock__:
+            offset = self.__file__.tell()
+            if offset > 0 and offset + len(record) > self.segment_size:
+                self.__file__.close()
+                self.__segment__ += 1
+                self.__file__ = open(self.segment_path(self.__segment__), mode='ab')
+                offset = 0
+            self.__file__.write(record)
+            self.__conn__.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+                                  (key.decode('utf-8'), kind, self.__segment__, offset, len(record), fetched_at))
+            self.__uncommitted__ += 1
+            if self.__uncommitted__ >= 256:
+                self.__flush__()
+
+    def __flush__(self):
+        self.__file__.flush()
+        self.__conn__.commit()
+        self.__uncommitted__ = 0
+
+    def flush(self):
+        """
+        写入磁盘，先写分段再提交索引，索引不会指向未写入的数据
+        """
+        with self.__lock__:
+            self.__flush__()
+
+    def get(self, url: str, body: dict = None) -> ArchivedPage:
+        """
+        :return:最新版本，不存在时为None
+        """
+        with self.__lock__:
+            self.__file__.flush()
+            row = self.__conn__.execute("SELECT segment, offset, length FROM pages WHERE key = ?",
+                                        (page_key(url, body),)).fetchone()
+        if row is None:
+            return None
+        with open(self.segment_path(row[0]), mode='rb') as f:
+            f.seek(row[1])
+            return __read_record__(f.read(row[2]), 0)
+
+    def entries(self, kind: str = None) -> List[tuple]:
+        """
+        :param kind: 网页类型，None表示全部
+        :return:最新版本的位置列表[(分段, 偏移)]，按分段和偏移排序
+        """
+        with self.__lock__:
+            self.__flush__()
+            if kind is None:
+                rows = self.__conn__.execute("SELECT segment, offset FROM pages ORDER BY segment, offset")
+            else:
+                rows = self.__conn__.execute("SELECT segment, offset FROM pages WHERE kind = ? "
+                                             "ORDER BY segment, offset", (kind,))
+            return rows.fetchall()
+
+    def rebuild_index(self) -> int:
+        """
+        扫描全部分段重建索引，用于索引丢失或进程异常退出后
+        :return:索引中的网页数
+        """
+        with self.__lock__:
+            self.__file__.flush()
+            self.__conn__.execute("DELETE FROM pages")
+            for segment in self.segments():
+                with open(self.segment_path(segment), mode='rb') as f:
+                    if os.fstat(f.fileno()).st_size == 0:
+                        continue
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                        offset = 0
+                        while offset + __record_header__.size <= len(buffer):
+                            magic, codec_id, key_len, meta_len, data_len = \
+                                __record_header__.unpack_from(buffer, offset)
+                            length = __record_header__.size + key_len + meta_len + data_len
+                            if magic != __magic__ or offset + length > len(buffer):
+                                break  # 末尾未写完的记录
+                            start = offset + __record_header__.size
+                            key = buffer[start:start + key_len].decode('utf-8')
+                            meta = json.loads(buffer[start + key_len:start + key_len + meta_len].decode('utf-8'))
+                            self.__conn__.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+                                                  (key, meta['kind'], segment, offset, length, meta['fetched_at']))
+                            offset += length
+            self.__conn__.commit()
+            return self.__conn__.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def __len__(self):
+        with self.__lock__:
+            return self.__conn__.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def close(self):
+        with self.__lock__:
+            self.__flush__()
+            self.__file__.close()
+            self.__conn__.close()
+
+
+class ReparsedPage(object):
+    """
+    重新解析的网页
+    """
+    __slots__ = ['kind', 'url', 'body', 'elements']
+
+    def __init__(self, kind: str, url: str, body: dict, elements: List):
+        """
+        :param kind: 网页类型
+        :param url: 请求链接
+        :param body: POST参数，评论网页可从中取得poiID、pagenow等
+        :param elements: 解析结果，SingleComment或AttractionInfo列表
+        """
+        self.kind = kind
+        self.url = url
+        self.body = body
+        self.elements = elements
+
+
+def __extract__(page: ArchivedPage, parser: ParserBackend) -> List:
+    if page.kind == 'comment':
+        return parse_comment_page(page.html, parser)
+    if page.kind == 'attraction_list':
+        return parse_attraction_list(page.html, page.final_url)
+    raise ValueError("不支持的网页类型：{0}".format(page.kind))
+
+
+def __reparse_chunk__(path: str, offsets: List[int], parser: ParserBackend) -> List[ReparsedPage]:
+    """
+    解析进程：映射分段文件，解压并解析给定偏移的记录
+    """
+    result = list()
+    with open(path, mode='rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            for offset in offsets:
+                page = __read_record__(buffer, offset)
+                try:
+                    elements = __extract__(page, parser)
+                except (AttributeError, IndexError, KeyError):
+                    elements = None  # 网页结构不符合解析规则，如缺少节点或评分样式
+                result.append(ReparsedPage(page.kind, page.url, page.body, elements))
+    return result
+
+
+def reparse(archive: PageArchive, kind: str = None, workers: int = None, parser: ParserBackend = ParserBackend.LXML,
+            chunk_size: int = 256):
+    """
+    多进程重新解析归档中每个键的最新版本，每个进程自行映射分段文件，进程间只传递偏移和解析结果
+    :param archive: 网页归档
+    :param kind: 网页类型，None表示全部
+    :param workers: 解析进程数，默认CPU核数
+    :param parser: 评论网页解析方式
+    :param chunk_size: 每个任务解析的网页数
+    :return:ReparsedPage的生成器，按分段和偏移顺序产出；无法解析的网页elements为None
+    """
+    tasks = list()
+    segment, offsets = None, list()
+    for entry_segment, offset in archive.entries(kind):
+        if entry_segment != segment or len(offsets) >= chunk_size:
+            if offsets:
+                tasks.append((archive.segment_path(segment), offsets))
+            segment, offsets = entry_segment, list()
+        offsets.append(offset)
+    if offsets:
+        tasks.append((archive.segment_path(segment), offsets))
+    if not tasks:
+        return
+    workers = workers if workers is not None else os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # 最多同时提交workers*2个任务，避免结果堆积在内存中
+        pending = list()
+        task_iter = iter(tasks)
+        for path, chunk in task_iter:
+            pending.append(executor.submit(__reparse_chunk__, path, chunk, parser))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            future = pending.pop(0)
+            for page in future.result():
+                yield page
+            for path, chunk in task_iter:
+                pending.append(executor.submit(__reparse_chunk__, path, chunk, parser))
+                break
@@ -0,0 +1,155 @@
+import queue
+import threading
+import requests
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List
+from src.extraction import has_comment
+from src.transport import HttpTransport, get_default_transport
+from src.xiecheng import CommentView, KeyWordException, ParserBackend, parse_comment_page
+
+
+class RawCommentPage(object):
+    """
+    下载得到的原始评论网页
+    """
+    __slots__ = ['url', 'page', 'html']
+
+    def __init__(self, url: str, page: int, html: str):
+        """
+        :param url: 景点网页链接
+        :param page: 评论分页
+        :param html: 网页文本
+        """
+        self.url = url
+        self.page = page
+        self.html = html
+
+
+class CommentPage(object):
+    """
+    解析完成的一页评论
+    """
+    __slots__ = ['url', 'page', 'comments']
+
+    def __init__(self, url: str, page: int, comments: List):
+        self.url = url
+        self.page = page
+        self.comments = comments
+
+
+__end__ = None  # 下载线程结束标志
+
+
+class CommentPipeline(object):
+    """
+    批量回填评论：下载线程只负责获取原始网页，解析交给多进程完成，两阶段之间使用有界队列控制积压
+    """
+
+    def __init__(self, io_workers: int = 8, parse_workers: int = None, queue_size: int = 64,
+                 parser: ParserBackend = ParserBackend.LXML, transport: HttpTransport = None,
+                 user_agent=None, cookie=None):
+        """
+        :param io_workers: 下载线程数
+        :param parse_workers: 解析进程数，默认CPU核数
+        :param queue_size: 待解析网页队列上限，队列满时下载线程阻塞
+        :param parser: 评论网页解析方式
+        :param transport: 共享连接池
+        """
+        self.io_workers = io_workers
+        self.parse_workers = parse_workers
+        self.queue_size = queue_size
+        self.parser = parser
+        self.transport = transport if transport is not None else get_default_transport()
+        self.user_agent = user_agent
+        self.cookie = cookie
+        self.failed_urls = list()  # 无法解析或请求失败的景点链接
+        self.failed_pages = list()  # 请求或解析失败的评论分页，存储格式[(景点链接, 分页)]
+
+    def __download__(self, urls: queue.Queue, pages: queue.Queue, stop: threading.Event):
+        """
+        下载线程：逐个景点翻页，直到出现没有评论的网页
+        """
+        view = CommentView(self.user_agent, self.cookie, transport=self.transport)
+        try:
+            while not stop.is_set():
+                try:
+                    url = urls.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    view.resolve_sight(url)
+                except (KeyWordException, AttributeError, requests.RequestException):
+                    self.failed_urls.append(url)
+                    continue
+                page = 1
+                while not stop.is_set():
+                    try:
+                        html = view.fetch_page(page)
+                    except requests.RequestException:
+                        # 无法确定后续分页是否还有评论，放弃该景点剩余分页
+                        self.failed_urls.append(url)
+                        self.failed_pages.append((url, page))
+                        break
+                    if not has_comment(html):  # 没有评论数据
+                        break
+                    self.__put__(pages, RawCommentPage(url, page, html), stop)
+                    page += 1
+        finally:
+            self.__put__(pages, __end__, stop)
+
+    @staticmethod
+    def __put__(pages: queue.Queue, item, stop: threading.Event):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def run(self, urls: List[str]):
+        """
+        抓取并解析多个景点的全部评论
+        :param urls: 景点网页链接列表，与AttractionListView.parse_url相同
+        :return:CommentPage的GeneratorType，按解析完成顺序产出；失败的景点和分页记录在failed_urls、failed_pages中
+        """
+        url_queue = queue.Queue()
+        for url in urls:
+            url_queue.put(url)
+        pages = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        io_workers = max(1, min(self.io_workers, len(urls)))
+        downloader = ThreadPoolExecutor(max_workers=io_workers)
+        parser = ProcessPoolExecutor(max_workers=self.parse_workers)
+        max_in_flight = self.queue_size
+        in_flight = dict()  # 存储格式{future:RawCommentPage}
+        running = io_workers
+        try:
+            for _ in range(io_workers):
+                downloader.submit(self.__download__, url_queue, pages, stop)
+            while running > 0 or in_flight:
+                # 有空闲解析名额时从队列中取网页
+                while running > 0 and len(in_flight) < max_in_flight:
+                    try:
+                        raw = pages.get(timeout=0.05 if in_flight else None)
+                    except queue.Empty:
+                        break
+                    if raw is __end__:
+                        running -= 1
+                        continue
+                    future = parser.submit(parse_comment_page, raw.html, self.parser)
+                    in_flight[future] = raw
+                if not in_flight:
+                    continue
+                done, _ = wait(in_flight.keys(), timeout=0.05, return_when=FIRST_COMPLETED)
+                for future in done:
+                    raw = in_flight.pop(future)
+                    try:
+                        comments = future.result()
+                    except (AttributeError, IndexError, KeyError):
+                        self.failed_pages.append((raw.url, raw.page))  # 网页结构不符合解析规则，跳过该页
+                        continue
+                    yield CommentPage(raw.url, raw.page, comments)
+        finally:
+            stop.set()
+            downloader.shutdown(wait=True)
+            parser.shutdown(wait=True)
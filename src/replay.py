@@ -0,0 +1,384 @@
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import tracemalloc
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+from urllib import parse
+from src.cache import CacheBackend, CacheEntry, SqliteCacheBackend
+from src.metrics import METRICS
+from src.transport import HttpTransport
+from src.xiecheng import CommentView, AttractionListView, CityVacationsAdView
+from src.tonghuashun import FundInfo
+
+# 内容已被解码，这些响应头不能随回放响应返回
+__dropped_headers__ = {'content-encoding', 'transfer-encoding', 'content-length', 'connection'}
+
+
+class FixtureMissing(KeyError):
+    def __init__(self, err="回放数据中没有该请求"):
+        KeyError.__init__(self, err)
+
+
+def fixture_key(method: str, url: str, params=None, data=None) -> str:
+    """
+    回放数据的键：请求方法+路径+查询参数+按键排序的表单参数，不包含域名，
+    同一份数据可以通过ReplayTransport（原域名）或ReplayServer（本地域名）回放
+    :param method: 请求方法
+    :param url: 链接或路径
+    :param params: 查询参数
+    :param data: 表单参数，dict、str或bytes
+    :return:
+    """
+    res = parse.urlsplit(url)
+    query = parse.parse_qsl(res.query, keep_blank_values=True)
+    if params:
+        query.extend((str(k), str(v)) for k, v in dict(params).items())
+    if isinstance(data, dict):
+        body = [(str(k), str(v)) for k, v in data.items()]
+    elif isinstance(data, bytes):
+        body = parse.parse_qsl(data.decode('utf-8'), keep_blank_values=True)
+    elif isinstance(data, str):
+        body = parse.parse_qsl(data, keep_blank_values=True)
+    else:
+        body = list()
+    return '\n'.join([method.upper(), res.path, parse.urlencode(sorted(query)), parse.urlencode(sorted(body))])
+
+
+class FixtureArchive(object):
+    """
+    录制的响应数据，存储方式与响应缓存相同（默认SQLite），且永不过期
+    """
+
+    def __init__(self, backend: CacheBackend):
+        """
+        :param backend: 存储方式，如SqliteCacheBackend、DirectoryCacheBackend
+        """
+        self.backend = backend
+
+    @classmethod
+    def open(cls, path: str):
+        """
+        :param path: SQLite文件路径
+        :return:
+        """
+        return cls(SqliteCacheBackend(path))
+
+    @staticmethod
+    def storage_key(key: str) -> str:
+        """
+        回放数据的键包含换行符和斜杠，不能直接用作文件名，与ResponseCache.cache_key一样取摘要后存储
+        """
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def record(self, key: str, response: requests.Response):
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in __dropped_headers__}
+        self.backend.set(self.storage_key(key),
+                         CacheEntry(response.url, response.status_code, headers, response.content, math.inf))
+
+    def lookup(self, key: str) -> CacheEntry:
+        return self.backend.get(self.storage_key(key))
+
+    def __len__(self):
+        return len(self.backend)
+
+    def close(self):
+        close = getattr(self.backend, 'close', None)
+        if close is not None:
+            close()
+
+
+class RecordingTransport(HttpTransport):
+    """
+    正常发送请求，同时把响应录制到回放数据中
+    """
+
+    def __init__(self, archive: FixtureArchive, **kwargs):
+        """
+        :param archive: 回放数据
+        :param kwargs: 同HttpTransport
+        """
+        HttpTransport.__init__(self, **kwargs)
+        self.archive = archive
+
+    def __request__(self, method: str, url: str, **kwargs) -> requests.Response:
+        response = HttpTransport.__request__(self, method, url, **kwargs)
+        self.archive.record(fixture_key(method, url, kwargs.get('params'), kwargs.get('data')), response)
+        return response
+
+
+class ReplayTransport(HttpTransport):
+    """
+    不发送请求，从回放数据中返回录制的响应，可模拟网络延迟
+    """
+
+    def __init__(self, archive: FixtureArchive, latency: float = 0, jitter: float = 0, strict: bool = True,
+                 seed: int = None, sleep=time.sleep, **kwargs):
+        """
+        :param archive: 回放数据
+        :param latency: 每个请求的平均延迟（秒）
+        :param jitter: 延迟的随机波动范围（秒），实际延迟在latency±jitter之间
+        :param strict: 请求不在回放数据中时抛出FixtureMissing，否则返回404
+        :param seed: 随机数种子，固定后每次运行的延迟相同
+        :param sleep: 等待函数
+        :param kwargs: 同HttpTransport
+        """
+        HttpTransport.__init__(self, **kwargs)
+        self.archive = archive
+        self.latency = latency
+        self.jitter = jitter
+        self.strict = strict
+        self.sleep = sleep
+        self.__random__ = random.Random(seed)
+        self.__lock__ = threading.Lock()
+
+    def delay(self) -> float:
+        with self.__lock__:
+            return max(0.0, self.latency + self.__random__.uniform(-self.jitter, self.jitter))
+
+    def __request__(self, method: str, url: str, **kwargs) -> requests.Response:
+        delay = self.delay()
+        if delay > 0:
+            self.sleep(delay)
+        entry = self.archive.lookup(fixture_key(method, url, kwargs.get('params'), kwargs.get('data')))
+        if entry is None:
+            if self.strict:
+                raise FixtureMissing("回放数据中没有该请求：{0} {1}".format(method, url))
+            response = requests.Response()
+            response.status_code = 404
+            response._content = b''
+            response.url = url
+            return response
+        response = entry.to_response()
+        response.url = url
+        return response
+
+
+class ReplayServer(object):
+    """
+    本地HTTP服务，按路径和参数返回录制的响应，可模拟网络延迟；
+    用于连同连接池、请求头处理在内的端到端测试
+    """
+
+    def __init__(self, archive: FixtureArchive, latency: float = 0, jitter: float = 0, host: str = '127.0.0.1',
+                 port: int = 0, seed: int = None):
+        """
+        :param archive: 回放数据
+        :param latency: 每个请求的平均延迟（秒）
+        :param jitter: 延迟的随机波动范围（秒）
+        :param host: 监听地址
+        :param port: 监听端口，0表示随机端口
+        :param seed: 随机数种子
+        """
+        self.archive = archive
+        self.latency = latency
+        self.jitter = jitter
+        self.__random__ = random.Random(seed)
+        self.__lock__ = threading.Lock()
+        self.__server__ = ThreadingHTTPServer((host, port), self.__handler__())
+        self.__server__.daemon_threads = True
+        self.__thread__ = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.__server__.server_address[:2]
+        return 'http://{0}:{1}'.format(host, port)
+
+    def delay(self) -> float:
+        with self.__lock__:
+            return max(0.0, self.latency + self.__random__.uniform(-self.jitter, self.jitter))
+
+    def __handler__(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def __reply__(self, method: str):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else None
+                delay = server.delay()
+                if delay > 0:
+                    time.sleep(delay)
+                entry = server.archive.lookup(fixture_key(method, self.path, data=body))
+                if entry is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(entry.status_code)
+                for name, value in entry.headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(entry.content)))
+                self.end_headers()
+                self.wfile.write(entry.content)
+
+            def do_GET(self):
+                self.__reply__('GET')
+
+            def do_POST(self):
+                self.__reply__('POST')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.__thread__ = threading.Thread(target=self.__server__.serve_forever, daemon=True)
+        self.__thread__.start()
+        return self
+
+    def close(self):
+        self.__server__.shutdown()
+        self.__server__.server_close()
+
+
+class BenchmarkResult(object):
+    """
+    单个场景的测试结果
+    """
+    __slots__ = ['name', 'pages', 'items', 'seconds', 'parse_seconds', 'peak_memory']
+
+    def __init__(self, name: str, pages: int, items: int, seconds: float, parse_seconds: float, peak_memory: int):
+        """
+        :param name: 场景名
+        :param pages: 请求页数
+        :param items: 解析出的数据条数
+        :param seconds: 总耗时
+        :param parse_seconds: 解析耗时
+        :param peak_memory: Python内存分配峰值（字节）
+        """
+        self.name = name
+        self.pages = pages
+        self.items = items
+        self.seconds = seconds
+        self.parse_seconds = parse_seconds
+        self.peak_memory = peak_memory
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages / self.seconds if self.seconds > 0 else float('inf')
+
+    def to_dict(self) -> dict:
+        return {'name': self.name, 'pages': self.pages, 'items': self.items, 'seconds': self.seconds,
+                'pages_per_second': self.pages_per_second, 'parse_seconds': self.parse_seconds,
+                'peak_memory': self.peak_memory}
+
+    def __str__(self):
+        return "{name:20}\t{pages:6} 页\t{pps:10.1f} 页/秒\t解析 {parse:8.4f} 秒\t内存峰值 {memory:10} 字节".format_map(
+            {'name': self.name, 'pages': self.pages, 'pps': self.pages_per_second, 'parse': self.parse_seconds,
+             'memory': self.peak_memory})
+
+
+def bench_comments(transport: HttpTransport, sight_url: str, pages: int) -> tuple:
+    """
+    评论场景：解析景点链接后依次请求并解析评论页
+    :return:(请求页数, 评论条数)
+    """
+    view = CommentView(transport=transport)
+    view.resolve_sight(sight_url)
+    items = 0
+    for page in range(1, pages + 1):
+        items += len(view.__get_comment_view__(view.poi_id, view.district_id, view.district_name, page,
+                                               view.resource_id))
+    return pages + 1, items
+
+
+def bench_attraction_list(transport: HttpTransport, keyword: str, pages: int) -> tuple:
+    """
+    景点列表场景：搜索关键词后依次请求并解析景点列表页
+    :return:(请求页数, 景点个数)
+    """
+    view = AttractionListView(keyword, transport=transport)
+    view.resolve_search(keyword)
+    items = 0
+    for page in range(1, pages + 1):
+        items += len(view.__get_vacations_list_detail__(page))
+    return pages + 1, items
+
+
+def bench_search(transport: HttpTransport, keyword: str, repeat: int) -> tuple:
+    """
+    搜索场景：重复请求并解析搜索结果标签
+    :return:(请求页数, 标签个数)
+    """
+    engine = CityVacationsAdView(transport=transport)
+    items = 0
+    for _ in range(repeat):
+        items += len(engine.__get_request_response__(keyword).tab_map)
+    return repeat, items
+
+
+def bench_fund(transport: HttpTransport, fund_codes: List, special_codes: List) -> tuple:
+    """
+    基金场景：请求基金详情和实时估值
+    :return:(请求页数, 有数据的结果个数)
+    """
+    fund_info = FundInfo(transport)
+    items = 0
+    for fund_code in fund_codes:
+        items += 1 if fund_info.get_func_info(fund_code) else 0
+    for special_code in special_codes:
+        items += 1 if fund_info.get_valuation_series(special_code) is not None else 0
+    return len(fund_codes) + len(special_codes), items
+
+
+def run_benchmark(name: str, scenario, *args, **kwargs) -> BenchmarkResult:
+    """
+    运行一个场景，解析耗时取自METRICS中parse类的统计
+    :param name: 场景名
+    :param scenario: 场景函数，返回(请求页数, 数据条数)，如bench_comments
+    :param args: 场景函数参数
+    :return:
+    """
+    enabled = METRICS.enabled
+    METRICS.enabled = True
+    METRICS.reset()
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        pages, items = scenario(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        METRICS.enabled = enabled
+    parse_seconds = sum(stats['seconds'] for stats in METRICS.snapshot().get('parse', {}).values())
+    return BenchmarkResult(name, pages, items, seconds, parse_seconds, peak_memory)
+
+
+def compare_results(results: List[BenchmarkResult], baseline_path: str, tolerance: float = 0.2) -> List[str]:
+    """
+    与基准结果比较，找出变慢或内存增加超过容忍比例的场景
+    :param results: 本次结果
+    :param baseline_path: 基准结果JSON文件，由save_results生成
+    :param tolerance: 容忍比例
+    :return:回退说明列表，为空表示没有回退
+    """
+    with open(baseline_path, mode='r', encoding='utf-8') as f:
+        baseline = {item['name']: item for item in json.load(f)}
+    regressions = list()
+    for result in results:
+        base = baseline.get(result.name)
+        if base is None:
+            continue
+        if result.pages_per_second < base['pages_per_second'] * (1 - tolerance):
+            regressions.append("{0}: 吞吐 {1:.1f} -> {2:.1f} 页/秒".format(
+                result.name, base['pages_per_second'], result.pages_per_second))
+        if base['parse_seconds'] > 0 and result.parse_seconds > base['parse_seconds'] * (1 + tolerance):
+            regressions.append("{0}: 解析 {1:.4f} -> {2:.4f} 秒".format(
+                result.name, base['parse_seconds'], result.parse_seconds))
+        if result.peak_memory > base['peak_memory'] * (1 + tolerance):
+            regressions.append("{0}: 内存峰值 {1} -> {2} 字节".format(
+                result.name, base['peak_memory'], result.peak_memory))
+    return regressions
+
+
+def save_results(results: List[BenchmarkResult], path: str):
+    with open(path, mode='w', encoding='utf-8') as f:
+        json.dump([result.to_dict() for result in results], f, ensure_ascii=False, indent=2)
@@ -0,0 +1,382 @@
+import hashlib
+import heapq
+import itertools
+import math
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from enum import Enum
+from typing import List
+from urllib import parse
+from src.transport import HttpTransport, get_default_transport
+from src.xiecheng import CommentView, AttractionListView, CityVacationsAdView
+from src.tonghuashun import FundInfo
+
+
+class JobType(Enum):
+    """
+    任务类型，值为默认优先级，数值越小越先执行
+    """
+    COMMENT_PAGE = 0  # 评论页，优先完成已发现的景点
+    LIST_PAGE = 1  # 景点列表页
+    FUND_DETAIL = 2  # 基金详情
+    SEARCH = 3  # 搜索
+
+
+def fingerprint(url: str, body=None) -> bytes:
+    """
+    请求指纹：链接+按键排序后的POST参数
+    :param url: 请求链接
+    :param body: POST参数
+    :return:
+    """
+    digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16)
+    if body:
+        digest.update(b'\x00')
+        digest.update(parse.urlencode(sorted(body.items())).encode('utf-8'))
+    return digest.digest()
+
+
+class BloomFilter(object):
+    """
+    布隆过滤器，用于海量请求指纹去重，存在一定误判率（误判为已存在），不会漏判
+    """
+
+    def __init__(self, capacity: int = 1000000, error_rate: float = 0.001):
+        """
+        :param capacity: 预计元素个数
+        :param error_rate: 达到预计元素个数时的误判率
+        """
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.__bits__ = bytearray((self.size + 7) // 8)
+        self.__count__ = 0
+
+    def __positions__(self, item: bytes):
+        digest = hashlib.blake2b(item, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item: bytes) -> bool:
+        """
+        :return:元素是否为新加入
+        """
+        added = False
+        for position in self.__positions__(item):
+            mask = 1 << (position & 7)
+            if not self.__bits__[position >> 3] & mask:
+                self.__bits__[position >> 3] |= mask
+                added = True
+        if added:
+            self.__count__ += 1
+        return added
+
+    def __contains__(self, item: bytes):
+        return all(self.__bits__[position >> 3] & (1 << (position & 7)) for position in self.__positions__(item))
+
+    def __len__(self):
+        return self.__count__
+
+
+class FingerprintSet(object):
+    """
+    精确去重，保存16字节指纹而不是完整链接
+    """
+
+    def __init__(self):
+        self.__items__ = set()
+
+    def add(self, item: bytes) -> bool:
+        if item in self.__items__:
+            return False
+        self.__items__.add(item)
+        return True
+
+    def __contains__(self, item: bytes):
+        return item in self.__items__
+
+    def __len__(self):
+        return len(self.__items__)
+
+
+class Job(object):
+    """
+    调度任务
+    """
+    __slots__ = ['job_type', 'url', 'body', 'handler', 'priority', 'host', 'fingerprint']
+
+    def __init__(self, job_type: JobType, url: str, handler, body: dict = None, priority: int = None):
+        """
+        :param job_type: 任务类型
+        :param url: 请求链接，用于去重和按域名限流
+        :param handler: 执行函数，参数为Job，返回后续任务列表（或None）
+        :param body: POST参数，参与去重
+        :param priority: 优先级，数值越小越先执行，默认按任务类型
+        """
+        self.job_type = job_type
+        self.url = url
+        self.body = body
+        self.handler = handler
+        self.priority = job_type.value if priority is None else priority
+        self.host = parse.urlparse(url).netloc
+        self.fingerprint = fingerprint(url, body)
+
+    def __str__(self):
+        return "{job_type}\t{priority}\t{url}".format_map(
+            {'job_type': self.job_type.name, 'priority': self.priority, 'url': self.url})
+
+
+class HostPolicy(object):
+    """
+    单个域名的并发数和频率限制
+    """
+    __slots__ = ['concurrency', 'rate']
+
+    def __init__(self, concurrency: int = 4, rate: float = None):
+        """
+        :param concurrency: 同时进行的请求数
+        :param rate: 每秒最多请求数，None表示不限制
+        """
+        self.concurrency = concurrency
+        self.rate = rate
+
+
+DEFAULT_HOST_POLICIES = {
+    'you.ctrip.com': HostPolicy(4, 5),
+    'fund.10jqka.com.cn': HostPolicy(8, 20),
+    'gz-fund.10jqka.com.cn': HostPolicy(8, 20),
+}
+
+
+class InlineExecutor(object):
+    """
+    在调用线程中立即执行任务，配合假时钟可得到确定的执行顺序
+    """
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class CrawlScheduler(object):
+    """
+    爬取调度器：任务按指纹去重，按优先级排序，在每个域名的并发数和频率限制内尽可能多地同时执行
+    """
+
+    def __init__(self, concurrency: int = 16, host_policies: dict = None, default_policy: HostPolicy = None,
+                 dedup=None, executor=None, clock=time.monotonic, sleep=time.sleep):
+        """
+        :param concurrency: 全局同时进行的任务数
+        :param host_policies: 域名限制，存储格式{域名:HostPolicy}，默认DEFAULT_HOST_POLICIES
+        :param default_policy: 未单独设置的域名使用的限制
+        :param dedup: 去重集合，需实现add(指纹)->是否新加入，默认FingerprintSet，海量任务可用BloomFilter
+        :param executor: 执行器，默认线程池，测试时可用InlineExecutor
+        :param clock: 时钟
+        :param sleep: 等待函数
+        """
+        self.concurrency = concurrency
+        self.host_policies = dict(DEFAULT_HOST_POLICIES if host_policies is None else host_policies)
+        self.default_policy = default_policy if default_policy is not None else HostPolicy()
+        self.dedup = dedup if dedup is not None else FingerprintSet()
+        self.clock = clock
+        self.sleep = sleep
+        self.failed = list()  # 执行失败的任务，存储格式[(Job, 异常)]
+        self.completed = 0  # 执行成功的任务数
+        self.duplicates = 0  # 因重复被丢弃的任务数
+        self.__executor__ = executor
+        self.__queues__ = dict()  # 存储格式{域名:[(优先级, 序号, Job)]}
+        self.__running__ = dict()  # 存储格式{域名:正在执行的任务数}
+        self.__next_time__ = dict()  # 存储格式{域名:下一次允许发起请求的时间}
+        self.__sequence__ = itertools.count()
+        self.__lock__ = threading.Lock()
+
+    def policy(self, host: str) -> HostPolicy:
+        return self.host_policies.get(host, self.default_policy)
+
+    def submit(self, job: Job) -> bool:
+        """
+        加入任务
+        :return:是否加入，重复任务返回False
+        """
+        with self.__lock__:
+            if not self.dedup.add(job.fingerprint):
+                self.duplicates += 1
+                return False
+            heapq.heappush(self.__queues__.setdefault(job.host, list()), (job.priority, next(self.__sequence__), job))
+            return True
+
+    def submit_all(self, jobs) -> int:
+        """
+        :return:加入的任务数
+        """
+        return sum(1 for job in jobs if self.submit(job))
+
+    def pending(self) -> int:
+        with self.__lock__:
+            return sum(len(queue) for queue in self.__queues__.values())
+
+    def __pick__(self, now: float):
+        """
+        在所有可发起请求的域名中取优先级最高的任务
+        :return:(Job, 最近可发起请求的等待时间)，没有可执行任务时Job为None，等待时间为None表示没有被限流的任务
+        """
+        with self.__lock__:
+            best = None
+            delay = None
+            for host, queue in self.__queues__.items():
+                if not queue:
+                    continue
+                policy = self.policy(host)
+                if self.__running__.get(host, 0) >= policy.concurrency:
+                    continue
+                next_time = self.__next_time__.get(host, now)
+                if next_time > now:
+                    delay = next_time - now if delay is None else min(delay, next_time - now)
+                    continue
+                if best is None or queue[0] < self.__queues__[best][0]:
+                    best = host
+            if best is None:
+                return None, delay
+            job = heapq.heappop(self.__queues__[best])[2]
+            policy = self.policy(best)
+            if policy.rate:
+                self.__next_time__[best] = max(self.__next_time__.get(best, now), now) + 1.0 / policy.rate
+            self.__running__[best] = self.__running__.get(best, 0) + 1
+            return job, None
+
+    def run(self, max_jobs: int = None) -> int:
+        """
+        执行任务直到队列为空，任务返回的后续任务会继续调度
+        :param max_jobs: 最多执行的任务数，None表示不限制
+        :return:执行的任务数
+        """
+        executor = self.__executor__
+        own_executor = executor is None
+        if own_executor:
+            executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        in_flight = dict()  # 存储格式{future:Job}
+        started = 0
+        try:
+            while True:
+                delay = None
+                while len(in_flight) < self.concurrency and (max_jobs is None or started < max_jobs):
+                    job, delay = self.__pick__(self.clock())
+                    if job is None:
+                        break
+                    in_flight[executor.submit(job.handler, job)] = job
+                    started += 1
+                if not in_flight:
+                    if delay is None:
+                        break
+                    self.sleep(delay)
+                    continue
+                done, _ = wait(in_flight.keys(), timeout=delay, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = in_flight.pop(future)
+                    with self.__lock__:
+                        self.__running__[job.host] -= 1
+                    try:
+                        follow_up = future.result()
+                    except Exception as e:
+                        self.failed.append((job, e))
+                        continue
+                    self.completed += 1
+                    if follow_up:
+                        self.submit_all(follow_up)
+        finally:
+            for future in in_flight:
+                future.cancel()
+            if own_executor:
+                executor.shutdown(wait=True)
+        return started
+
+
+def comment_page_job(view: CommentView, page: int, callback) -> Job:
+    """
+    评论页任务，页面非空时自动加入下一页
+    :param view: 已解析景点信息的CommentView，各页任务共用，不修改其page_now
+    :param page: 页码
+    :param callback: 参数为(CommentView, 页码, SingleComment列表)
+    :return:
+    """
+    body = {
+        'poiID': view.poi_id,
+        'districtId': view.district_id,
+        'districtEName': view.district_name,
+        'pagenow': page,
+        'resourceId': view.resource_id,
+    }
+    key = view.__cache_key__(page)
+
+    def handler(job: Job) -> List[Job]:
+        elements = view.__load_page__(key)
+        if len(elements) == 0:
+            return list()
+        callback(view, page, elements)
+        return [comment_page_job(view, page + 1, callback)]
+
+    return Job(JobType.COMMENT_PAGE, view.comment_url, handler, body)
+
+
+def list_page_job(view: AttractionListView, page: int, callback) -> Job:
+    """
+    景点列表页任务，页面非空时自动加入下一页
+    :param view: 已调用resolve_search的AttractionListView
+    :param page: 页码
+    :param callback: 参数为(AttractionInfo列表)，返回后续任务列表（如景点的评论任务）或None
+    :return:
+    """
+    key = view.__cache_key__(page)
+    url = view.request_url + parse.urlencode({'query': view.keyword_query, 'PageNo': page})
+
+    def handler(job: Job) -> List[Job]:
+        elements = view.__load_page__(key)
+        if len(elements) == 0:
+            return list()
+        jobs = [list_page_job(view, page + 1, callback)]
+        jobs.extend(callback(elements) or list())
+        return jobs
+
+    return Job(JobType.LIST_PAGE, url, handler)
+
+
+def search_job(keyword: str, callback, transport: HttpTransport = None) -> Job:
+    """
+    搜索任务，解析出景点标签后加入第一页景点列表任务
+    :param keyword: 搜索关键词
+    :param callback: 同list_page_job
+    :param transport: 共享连接池
+    :return:
+    """
+    transport = transport if transport is not None else get_default_transport()
+    view = AttractionListView(keyword, transport=transport)
+    url = CityVacationsAdView.search_url + parse.urlencode({'query': keyword})
+
+    def handler(job: Job) -> List[Job]:
+        view.resolve_search(keyword)
+        return [list_page_job(view, 1, callback)]
+
+    return Job(JobType.SEARCH, url, handler)
+
+
+def fund_detail_job(fund_info: FundInfo, fund_code: str, callback) -> Job:
+    """
+    基金详情任务
+    :param fund_info: 基金信息接口
+    :param fund_code: 基金代码
+    :param callback: 参数为(基金代码, 基金信息列表或None)
+    :return:
+    """
+
+    def handler(job: Job):
+        callback(fund_code, fund_info.get_func_info(fund_code))
+
+    return Job(JobType.FUND_DETAIL, fund_info.fund_detail_url + fund_code, handler)
@@ -1,5 +1,10 @@
-import requests, re, json
+import json
+import numpy as np
 from src.export_file import *
+from src.transport import HttpTransport, get_default_transport
+from src.extraction import strip_hqjson
+from src.metrics import METRICS
+from src.valuation import ValuationSeries, parse_valuation_payload
 
 
 class FundTrend(Enum):
@@ -17,6 +22,53 @@ class FundTrend(Enum):
     FALL = [-1, -2]
     SMALL_FALL = [0, -1]
 
+    @classmethod
+    def classify(cls, rate: float):
+        """
+        涨跌幅所在区间，区间为[较小值, 较大值)
+        :param rate: 涨跌幅（百分比）
+        :return:FundTrend，不在任何区间时为None
+        """
+        if rate is None:
+            return None
+        return FUND_TREND_INDEX.labels([rate])[0]
+
+
+class FundTrendIndex(object):
+    """
+    按区间下界排序的涨跌区间索引，一次searchsorted即可完成整批涨跌幅的分类
+    """
+
+    def __init__(self, trends=FundTrend):
+        """
+        :param trends: 参与分类的FundTrend成员
+        """
+        intervals = sorted((min(trend.value), max(trend.value), trend) for trend in trends)
+        self.lows = np.array([interval[0] for interval in intervals], dtype=np.float64)
+        self.highs = np.array([interval[1] for interval in intervals], dtype=np.float64)
+        self.trends = [interval[2] for interval in intervals]
+
+    def classify(self, rates) -> np.ndarray:
+        """
+        :param rates: 涨跌幅数组（百分比）
+        :return:每个涨跌幅所在区间在self.trends中的位置，不在任何区间（或为NaN）时为-1
+        """
+        rates = np.asarray(rates, dtype=np.float64)
+        positions = np.searchsorted(self.lows, rates, side='right') - 1
+        clipped = np.clip(positions, 0, None)
+        inside = (positions >= 0) & (rates < self.highs[clipped])
+        return np.where(inside, positions, -1)
+
+    def labels(self, rates) -> list:
+        """
+        :param rates: 涨跌幅数组（百分比）
+        :return:FundTrend列表，不在任何区间时为None
+        """
+        return [self.trends[i] if i >= 0 else None for i in self.classify(rates)]
+
+
+FUND_TREND_INDEX = FundTrendIndex()
+
 
 class FundCodeInfo(object):
     def __init__(self, c1, c2):
@@ -25,19 +77,23 @@ class FundCodeInfo(object):
 
 
 class FundInfo(object):
+    fund_detail_url: str = 'http://fund.10jqka.com.cn/data/client/myfund/'  # 基金详情接口
+    valuation_url: str = 'http://gz-fund.10jqka.com.cn/?module=api&controller=index&action=chart' \
+                         '&info=vm_fd_{0}&start={1}'  # 实时估值接口
 
-    def __init__(self):
+    def __init__(self, transport: HttpTransport = None):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_13_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/69.0.3497.100 Safari/537.36'
         }
+        self.transport = transport if transport is not None else get_default_transport()
         self.xlsx = None
 
     def get_all_fund_base_info(self, url=None):
         if url is None:
             url = 'http://fund.10jqka.com.cn/hqcode.js'
-        response = requests.get(url=url, headers=self.headers)
+        response = self.transport.get(url=url, headers=self.headers, endpoint='fund_code_list')
         if response.status_code == 200:
-            result = re.sub('var hqjson=', '', response.text)
+            result = strip_hqjson(response.text)
         else:
             result = None
         if result:
@@ -45,10 +101,19 @@ class FundInfo(object):
             for fund_code, special_code in fund_code_info.items():
                 yield FundCodeInfo(fund_code, special_code)
 
-    def get_func_info(self, fund_code) -> list:
-        response = requests.get(url='http://fund.10jqka.com.cn/data/client/myfund/' + fund_code, headers=self.headers)
+    def get_func_info(self, fund_code, raise_on_error: bool = False) -> list:
+        """
+        获取基金详情
+        :param fund_code: 基金代码
+        :param raise_on_error: 请求失败（4xx/5xx）时抛出requests.HTTPError，否则返回None
+        :return:
+        """
+        response = self.transport.get(url=self.fund_detail_url + fund_code, headers=self.headers, endpoint='fund_detail')
+        if raise_on_error:
+            response.raise_for_status()
         if response.status_code == 200:
-            result = json.loads(response.text)
+            with METRICS.timer('parse', 'fund_detail'):
+                result = json.loads(response.text)
         else:
             result = None
         if result:
@@ -71,53 +136,58 @@ class FundInfo(object):
                     fund_info_list.append(theme_name)
                 return fund_info_list
 
-    def get_realtime_rate(self, special_code, low_rate):
-        response = requests.get(
-            url='http://gz-fund.10jqka.com.cn/?module=api&controller=index&action=chart&info=vm_fd_{0}&start=0930'.format(
-                special_code), headers=self.headers)
+    def get_valuation_series(self, special_code, start: str = '0930') -> ValuationSeries:
+        """
+        获取当日实时估值序列
+        :param special_code: 信息代码
+        :param start: 起始时间，HHMM格式
+        :return:ValuationSeries，没有数据时为None
+        """
+        response = self.transport.get(url=self.valuation_url.format(special_code, start), headers=self.headers,
+                                      endpoint='valuation')
         if response.status_code == 200:
-            result = re.search('~(\d{4}.*)', response.text)
-            if result:
-                result = result.group(1)
-                valuation_info = result.split(';')
-                sum = 0
-                count = 0
-                for valuation in valuation_info:
-                    info = valuation.split(',')
-                    realtime = info[0]
-                    now_valuation = float(info[1])
-                    yesterday_valuation = float(info[2])
-                    difference = (now_valuation - yesterday_valuation) / yesterday_valuation * 100
-                    sum += difference
-                    count += 1
-                relative_rate = sum / count
-                if low_rate.value[0] < 0:
-                    if low_rate.value[1] <= relative_rate < low_rate.value[0]:
-                        return (True, relative_rate)
-
-                    else:
-                        return (False, relative_rate)
-                else:
-                    if low_rate.value[0] <= relative_rate < low_rate.value[1]:
-                        return (True, relative_rate)
-
-                    else:
-                        return (False, relative_rate)
-
-
-            else:
-                return (False, None)
-        else:
+            with METRICS.timer('parse', 'valuation') as timer:
+                series = parse_valuation_payload(response.text)
+                timer.items = 0 if series is None else len(series)
+            return series
+
+    def get_realtime_valuation(self, special_code):
+        """
+        获取当日实时估值相对昨日的平均涨跌幅
+        :param special_code: 信息代码
+        :return:涨跌幅（百分比），没有数据时为None
+        """
+        series = self.get_valuation_series(special_code)
+        if series is not None:
+            return float(series.change.mean())
+
+    def get_realtime_rate(self, special_code, low_rate):
+        relative_rate = self.get_realtime_valuation(special_code)
+        if relative_rate is None:
             return (False, None)
+        return (FundTrend.classify(relative_rate) == low_rate, relative_rate)
 
-    def write_info(self, info_list: list, filename: str, filetype: FileType):
+    def write_info(self, info_list: list, filename: str, filetype: FileType, streaming: bool = False):
+        """
+        追加写入基金信息
+        :param info_list: 基金信息列表
+        :param filename: 文件名
+        :param filetype: 文件类型
+        :param streaming: 流式写入，需在全部写完后调用close
+        :return:
+        """
         if self.xlsx is None:
-            self.xlsx = ExportFile(filename, filetype, FileModel.ADD)
+            self.xlsx = ExportFile(filename, filetype, FileModel.ADD, streaming)
         max_for = 40
-        for item in info_list:
-            self.xlsx.add_row(item)
-            max_for -= 1
-            if max_for == 0:
-                self.xlsx.save()
-                max_for = 40
-        self.xlsx.save()
+        for i in range(0, len(info_list), max_for):
+            self.xlsx.add_rows(info_list[i:i + max_for])
+            self.xlsx.save()
+
+    def close(self):
+        """
+        完成文件写入
+        :return:
+        """
+        if self.xlsx is not None:
+            self.xlsx.close()
+            self.xlsx = None
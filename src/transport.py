@@ -0,0 +1,193 @@
+import itertools
+import re
+import threading
+import time
+import requests
+from urllib import parse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from src.cache import ResponseCache
+from src.metrics import METRICS
+
+DIGIT_PATTERN = re.compile(r'\d')
+__transport_ids__ = itertools.count(1)
+
+
+class HostRateLimiter(object):
+    """
+    按域名限制请求频率
+    """
+
+    def __init__(self, default_rate: float = None, host_rates: dict = None):
+        """
+        :param default_rate: 默认每秒最多请求数，None表示不限制
+        :param host_rates: 单独设置的域名频率，存储格式{域名:每秒请求数}
+        """
+        self.default_rate = default_rate
+        self.host_rates = dict(host_rates or {})
+        self.__next_time__ = dict()  # 存储格式{域名:下一次允许请求的时间}
+        self.__lock__ = threading.Lock()
+
+    def set_rate(self, host: str, rate: float):
+        self.host_rates[host] = rate
+
+    def wait(self, host: str):
+        """
+        阻塞直到该域名允许下一次请求
+        :param host: 域名
+        :return:
+        """
+        rate = self.host_rates.get(host, self.default_rate)
+        if not rate:
+            return
+        interval = 1.0 / rate
+        with self.__lock__:
+            now = time.monotonic()
+            next_time = max(self.__next_time__.get(host, now), now)
+            self.__next_time__[host] = next_time + interval
+        delay = next_time - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def route_template(url: str) -> str:
+    """
+    链接转为统计用的接口模板：去掉查询参数，含数字的路径段替换为{id}，避免每个景点、基金各占一个标签，
+    如you.ctrip.com/sight/guangzhou152/107540.html -> you.ctrip.com/sight/{id}/{id}
+    :param url: 链接
+    :return:
+    """
+    res = parse.urlparse(url)
+    segments = ['{id}' if DIGIT_PATTERN.search(segment) else segment for segment in res.path.split('/')]
+    return res.netloc + '/'.join(segments)
+
+
+class HttpTransport(object):
+    """
+    共享的HTTP连接池，所有爬虫通过它发送请求以复用TCP/TLS连接
+    """
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 10, retries: int = 3,
+                 backoff_factor: float = 0.5, timeout: float = 10, rate_limiter: HostRateLimiter = None,
+                 host_pool_sizes: dict = None, cache: ResponseCache = None):
+        """
+        :param pool_connections: 缓存的域名连接池个数
+        :param pool_maxsize: 每个域名连接池的最大连接数
+        :param retries: 失败重试次数，429/5xx重试用完后返回最后一次的响应，由调用方检查状态码
+        :param backoff_factor: 重试退避系数，第n次重试等待 backoff_factor * 2^(n-1) 秒
+        :param timeout: 默认超时时间（秒）
+        :param rate_limiter: 域名频率限制器
+        :param host_pool_sizes: 单独设置的域名连接数，存储格式{域名:连接数}
+        :param cache: 响应缓存，命中时不发送请求
+        """
+        self.transport_id = next(__transport_ids__)  # 进程内唯一编号，用于区分不同连接池的缓存结果
+        self.timeout = timeout
+        self.cache = cache
+        self.rate_limiter = rate_limiter if rate_limiter is not None else HostRateLimiter()
+        self.session = requests.Session()
+        self.__retries__ = retries
+        self.__backoff_factor__ = backoff_factor
+        self.__pool_connections__ = pool_connections
+        self.__pool_maxsize__ = pool_maxsize
+        self.__host_pool_sizes__ = dict()  # 存储格式{域名:连接数}
+        self.__pool_lock__ = threading.Lock()
+        adapter = self.__build_adapter__(pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        for host, size in (host_pool_sizes or {}).items():
+            self.set_host_pool_size(host, size)
+
+    def __build_adapter__(self, pool_maxsize: int) -> HTTPAdapter:
+        retry = Retry(total=self.__retries__, backoff_factor=self.__backoff_factor__,
+                      status_forcelist=(429, 500, 502, 503, 504), raise_on_status=False,
+                      allowed_methods=frozenset(['GET', 'POST', 'HEAD']))
+        return HTTPAdapter(pool_connections=self.__pool_connections__, pool_maxsize=pool_maxsize,
+                           max_retries=retry)
+
+    def set_host_pool_size(self, host: str, pool_maxsize: int):
+        """
+        设置某个域名的连接池大小
+        :param host: 域名，如you.ctrip.com
+        :param pool_maxsize: 最大连接数
+        :return:
+        """
+        with self.__pool_lock__:
+            self.__mount_host__(host, pool_maxsize)
+
+    def ensure_host_pool_size(self, host: str, pool_maxsize: int):
+        """
+        保证某个域名的连接池不小于给定大小，已经足够时不重建连接池，
+        供按并发数设置连接池的组件共用同一个连接池时使用，不会缩小其他组件设置的连接数
+        :param host: 域名，如you.ctrip.com
+        :param pool_maxsize: 最少连接数，一般为并发请求数
+        :return:
+        """
+        # 比较和替换在同一把锁内完成，并发调用时较小的设置不会覆盖较大的
+        with self.__pool_lock__:
+            if pool_maxsize > self.__host_pool_sizes__.get(host, self.__pool_maxsize__):
+                self.__mount_host__(host, pool_maxsize)
+
+    def __mount_host__(self, host: str, pool_maxsize: int):
+        """
+        为域名挂载新的连接池并关闭被替换的连接池，调用前需持有__pool_lock__
+        """
+        prefixes = ('http://' + host, 'https://' + host)
+        replaced = [self.session.adapters.get(prefix) for prefix in prefixes]  # 只取该域名单独挂载的连接池
+        adapter = self.__build_adapter__(pool_maxsize)
+        self.__host_pool_sizes__[host] = pool_maxsize
+        for prefix in prefixes:
+            self.session.mount(prefix, adapter)
+        for old in set(item for item in replaced if item is not None):
+            old.close()  # 正在使用的连接归还时由已关闭的连接池直接断开
+
+    def request(self, method: str, url: str, endpoint: str = None, **kwargs) -> requests.Response:
+        """
+        :param method: 请求方法
+        :param url: 链接
+        :param endpoint: 统计数据中的接口名，如fund_detail，默认为route_template(url)
+        :param kwargs: 同requests.Session.request
+        :return:
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        if not METRICS.enabled:
+            return self.__request__(method, url, **kwargs)
+        with METRICS.timer('http', endpoint if endpoint is not None else route_template(url)) as timer:
+            response = self.__request__(method, url, **kwargs)
+            timer.nbytes = len(response.content)
+            timer.error = response.status_code >= 400
+        return response
+
+    def __request__(self, method: str, url: str, **kwargs) -> requests.Response:
+        if self.cache is not None:
+            return self.cache.request(self.__send__, method, url, **kwargs)
+        return self.__send__(method, url, **kwargs)
+
+    def __send__(self, method: str, url: str, **kwargs) -> requests.Response:
+        self.rate_limiter.wait(parse.urlparse(url).netloc)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, data=None, **kwargs) -> requests.Response:
+        return self.request('POST', url, data=data, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+__default_transport__ = None
+__default_lock__ = threading.Lock()
+
+
+def get_default_transport() -> HttpTransport:
+    """
+    获取进程内共享的默认连接池
+    :return:
+    """
+    global __default_transport__
+    if __default_transport__ is None:
+        with __default_lock__:
+            if __default_transport__ is None:
+                __default_transport__ = HttpTransport()
+    return __default_transport__
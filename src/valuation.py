@@ -0,0 +1,128 @@
+import re
+import numpy as np
+from typing import Iterable, List
+
+__payload_pattern__ = re.compile(r'~(\d{4}.*)')
+
+
+class ValuationSeries(object):
+    """
+    单只基金当日的实时估值序列
+    """
+    __slots__ = ['time', 'now', 'prev']
+
+    def __init__(self, time: np.ndarray, now: np.ndarray, prev: np.ndarray):
+        """
+        :param time: 时间，HHMM格式整数，如930
+        :param now: 实时估值
+        :param prev: 昨日净值
+        """
+        self.time = time
+        self.now = now
+        self.prev = prev
+
+    def __len__(self):
+        return len(self.time)
+
+    @property
+    def minutes(self) -> np.ndarray:
+        """
+        距当日零点的分钟数
+        """
+        return self.time // 100 * 60 + self.time % 100
+
+    @property
+    def change(self) -> np.ndarray:
+        """
+        每个时间点相对昨日的涨跌幅（百分比）
+        """
+        return (self.now - self.prev) / self.prev * 100
+
+    def stats(self) -> dict:
+        """
+        :return:{'mean':平均涨跌幅, 'min':最小, 'max':最大, 'twap':按时间加权的平均涨跌幅, 'last':最新涨跌幅}
+        """
+        change = self.change
+        return {
+            'mean': float(change.mean()),
+            'min': float(change.min()),
+            'max': float(change.max()),
+            'twap': float(np.average(change, weights=__time_weights__(self.minutes))),
+            'last': float(change[-1]),
+        }
+
+
+def __time_weights__(minutes: np.ndarray) -> np.ndarray:
+    """
+    每个点的权重为距下一个点的分钟数，最后一个点权重为1
+    """
+    weights = np.ones(len(minutes), dtype=np.float64)
+    if len(minutes) > 1:
+        weights[:-1] = np.maximum(np.diff(minutes), 1)
+    return weights
+
+
+def parse_valuation_payload(text: str) -> ValuationSeries:
+    """
+    解析实时估值接口返回的 ~HHMM,实时估值,昨日净值;... 数据
+    :param text: 接口返回文本
+    :return:ValuationSeries，没有数据时为None
+    """
+    result = __payload_pattern__.search(text)
+    if result is None:
+        return None
+    body = result.group(1).strip().strip(';')
+    if not body:
+        return None
+    values = np.array(body.replace(';', ',').split(','), dtype=np.float64).reshape(-1, 3)
+    return ValuationSeries(values[:, 0].astype(np.int64), values[:, 1], values[:, 2])
+
+
+class BatchStats(object):
+    """
+    多只基金的估值统计，每个字段为与输入顺序一致的数组，没有数据的基金为NaN
+    """
+    __slots__ = ['mean', 'min', 'max', 'twap', 'last']
+
+    def __init__(self, mean: np.ndarray, min: np.ndarray, max: np.ndarray, twap: np.ndarray, last: np.ndarray):
+        self.mean = mean
+        self.min = min
+        self.max = max
+        self.twap = twap
+        self.last = last
+
+
+def batch_stats(series_list: Iterable) -> BatchStats:
+    """
+    一次性计算多只基金的估值统计
+    :param series_list: ValuationSeries（或None）的可迭代对象
+    :return:
+    """
+    series_list: List = list(series_list)
+    n = len(series_list)
+    result = [np.full(n, np.nan) for _ in range(5)]
+    valid = [i for i, series in enumerate(series_list) if series is not None and len(series) > 0]
+    if not valid:
+        return BatchStats(*result)
+    lengths = np.array([len(series_list[i]) for i in valid])
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    ends = starts + lengths
+    now = np.concatenate([series_list[i].now for i in valid])
+    prev = np.concatenate([series_list[i].prev for i in valid])
+    time = np.concatenate([series_list[i].time for i in valid])
+    minutes = time // 100 * 60 + time % 100
+    change = (now - prev) / prev * 100
+
+    # 时间权重：同一基金内为距下一个点的分钟数，每只基金最后一个点为1
+    weights = np.ones(len(change), dtype=np.float64)
+    if len(change) > 1:
+        weights[:-1] = np.maximum(np.diff(minutes), 1)
+    weights[ends - 1] = 1
+
+    index = np.array(valid)
+    result[0][index] = np.add.reduceat(change, starts) / lengths
+    result[1][index] = np.minimum.reduceat(change, starts)
+    result[2][index] = np.maximum.reduceat(change, starts)
+    result[3][index] = np.add.reduceat(change * weights, starts) / np.add.reduceat(weights, starts)
+    result[4][index] = change[ends - 1]
+    return BatchStats(*result)
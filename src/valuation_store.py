@@ -0,0 +1,96 @@
+import sqlite3
+import threading
+import numpy as np
+from collections import OrderedDict
+from src.tonghuashun import FundInfo
+from src.valuation import ValuationSeries
+
+
+class ValuationStore(object):
+    """
+    基金实时估值的本地时间序列存储（SQLite），按信息代码+日期+时间索引，只追加不修改
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: 数据库文件路径
+        """
+        self.path = path
+        self.__lock__ = threading.Lock()
+        self.__conn__ = sqlite3.connect(path, check_same_thread=False)
+        self.__conn__.execute("PRAGMA journal_mode=WAL")
+        self.__conn__.execute("CREATE TABLE IF NOT EXISTS points ("
+                              "special_code TEXT NOT NULL, date TEXT NOT NULL, time INTEGER NOT NULL, "
+                              "now REAL NOT NULL, prev REAL NOT NULL, "
+                              "PRIMARY KEY (special_code, date, time)) WITHOUT ROWID")
+        self.__conn__.commit()
+
+    def last_time(self, special_code: str, date: str):
+        """
+        已存储的最新时间点
+        :param special_code: 信息代码
+        :param date: 日期，YYYY-MM-DD
+        :return:HHMM格式整数，没有数据时为None
+        """
+        with self.__lock__:
+            row = self.__conn__.execute("SELECT MAX(time) FROM points WHERE special_code = ? AND date = ?",
+                                        (special_code, date)).fetchone()
+        return row[0]
+
+    def append(self, special_code: str, date: str, series: ValuationSeries) -> int:
+        """
+        追加估值点，已存在的时间点忽略
+        :return:新增点数
+        """
+        if series is None or len(series) == 0:
+            return 0
+        rows = zip([special_code] * len(series), [date] * len(series), series.time.tolist(), series.now.tolist(),
+                   series.prev.tolist())
+        with self.__lock__:
+            before = self.__conn__.total_changes
+            self.__conn__.executemany("INSERT OR IGNORE INTO points VALUES (?, ?, ?, ?, ?)", rows)
+            self.__conn__.commit()
+            return self.__conn__.total_changes - before
+
+    def update(self, fund_info: FundInfo, special_code: str, date: str) -> int:
+        """
+        增量抓取：只请求已存储最新时间点之后的数据
+        :param fund_info: 基金信息接口
+        :param special_code: 信息代码
+        :param date: 估值数据所属的交易日，YYYY-MM-DD。接口返回的数据不带日期，跨零点或非交易日时返回的是上一交易日的数据，
+                     不能用当天日期代替，需由调用方根据交易日历给出
+        :return:新增点数
+        """
+        last = self.last_time(special_code, date)
+        start = '0930' if last is None else '{0:04d}'.format(last)
+        return self.append(special_code, date, fund_info.get_valuation_series(special_code, start))
+
+    def query(self, special_code: str, start_date: str, end_date: str = None) -> OrderedDict:
+        """
+        按日期范围查询
+        :param special_code: 信息代码
+        :param start_date: 起始日期（含），YYYY-MM-DD
+        :param end_date: 结束日期（含），默认与起始日期相同
+        :return:存储格式{日期:ValuationSeries}，按日期排序
+        """
+        if end_date is None:
+            end_date = start_date
+        with self.__lock__:
+            rows = self.__conn__.execute("SELECT date, time, now, prev FROM points "
+                                         "WHERE special_code = ? AND date BETWEEN ? AND ? ORDER BY date, time",
+                                         (special_code, start_date, end_date)).fetchall()
+        result = OrderedDict()
+        if not rows:
+            return result
+        dates = [row[0] for row in rows]
+        values = np.array([row[1:] for row in rows], dtype=np.float64)
+        begin = 0
+        for i in range(1, len(rows) + 1):
+            if i == len(rows) or dates[i] != dates[begin]:
+                block = values[begin:i]
+                result[dates[begin]] = ValuationSeries(block[:, 0].astype(np.int64), block[:, 1], block[:, 2])
+                begin = i
+        return result
+
+    def close(self):
+        self.__conn__.close()
@@ -1,11 +1,20 @@
 import requests
-import re
 import abc
-import copy
+import asyncio
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from urllib import parse
 from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
 from typing import List
+from src.transport import HttpTransport, get_default_transport
+from src.metrics import METRICS
+from src.extraction import find_poiid, parse_sight_url, parse_star, parse_tab, strip_whitespace
 
 
 class KeyWordException(AttributeError):
@@ -13,8 +22,65 @@ class KeyWordException(AttributeError):
         AttributeError.__init__(self, err)
 
 
-class ListView(object):
-    __metaclass__ = abc.ABCMeta
+class PageCache(object):
+    """
+    容量有限的最近页面缓存，超出容量时淘汰最久未访问的页面，可设置过期时间
+    """
+
+    def __init__(self, max_size: int = 16, ttl: float = None, clock=time.monotonic):
+        """
+        :param max_size: 最多缓存的页面数
+        :param ttl: 过期时间（秒），None表示不过期
+        :param clock: 时钟
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.__pages__ = OrderedDict()  # 存储格式{键:(过期时间, 页面)}
+        self.__lock__ = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.__lock__:
+            item = self.__pages__.get(key)
+            if item is None:
+                return default
+            if item[0] is not None and item[0] <= self.clock():
+                del self.__pages__[key]
+                return default
+            self.__pages__.move_to_end(key)
+            return item[1]
+
+    def put(self, key, value):
+        with self.__lock__:
+            self.__pages__[key] = (None if self.ttl is None else self.clock() + self.ttl, value)
+            self.__pages__.move_to_end(key)
+            while len(self.__pages__) > self.max_size:
+                self.__pages__.popitem(last=False)
+
+    def __contains__(self, key):
+        with self.__lock__:
+            item = self.__pages__.get(key)
+            return item is not None and (item[0] is None or item[0] > self.clock())
+
+    def __len__(self):
+        return len(self.__pages__)
+
+    def clear(self):
+        with self.__lock__:
+            self.__pages__.clear()
+
+
+class ListView(object, metaclass=abc.ABCMeta):
+    """
+    分页视图：可迭代，翻页结果缓存在最近页面缓存中，并可在后台预取后续页面。
+    开启预取时用完需调用close（或使用with）关闭后台线程
+    """
+    page_now: int = 1
+    prefetch: int = 0  # 后台预取的页数
+    cache_size: int = 16  # 最近页面缓存容量
+    __page_cache__: PageCache = None
+    __prefetching__: dict = None  # 正在预取的页面，存储格式{缓存键:future}
+    __prefetch_executor__: ThreadPoolExecutor = None
 
     @abc.abstractmethod
     def show_current_view(self):
@@ -28,6 +94,106 @@ class ListView(object):
     def before_page(self):
         pass
 
+    @abc.abstractmethod
+    def __cache_key__(self, page: int) -> tuple:
+        """
+        页面缓存键，需包含请求该页所需的全部参数
+        """
+        pass
+
+    @abc.abstractmethod
+    def __load_page__(self, key: tuple) -> List:
+        """
+        根据缓存键请求页面
+        """
+        pass
+
+    def __get_page__(self, page: int) -> List:
+        """
+        获取某一页：优先读取缓存和预取结果，并预取之后的页面
+        :param page: 页码
+        :return:
+        """
+        if self.__page_cache__ is None:
+            self.__page_cache__ = PageCache(self.cache_size)
+            self.__prefetching__ = dict()
+        key = self.__cache_key__(page)
+        elements = self.__page_cache__.get(key)
+        if elements is None:
+            future = self.__prefetching__.get(key)
+            elements = None
+            if future is not None:
+                try:
+                    elements = future.result()
+                except Exception:
+                    elements = None
+            else:
+                elements = self.__page_cache__.get(key)  # 预取可能在两次查找之间完成
+            if elements is None:
+                elements = self.__load_page__(key)
+            self.__page_cache__.put(key, elements)
+        if len(elements) > 0:
+            self.__schedule_prefetch__(page)
+        return elements
+
+    def __schedule_prefetch__(self, page: int):
+        if self.prefetch <= 0:
+            return
+        if self.__prefetch_executor__ is None:
+            self.__prefetch_executor__ = ThreadPoolExecutor(max_workers=self.prefetch)
+        for next_page in range(page + 1, page + 1 + self.prefetch):
+            key = self.__cache_key__(next_page)
+            if key in self.__page_cache__ or key in self.__prefetching__:
+                continue
+            future = self.__prefetch_executor__.submit(self.__load_page__, key)
+            self.__prefetching__[key] = future
+            future.add_done_callback(lambda f, k=key: self.__prefetched__(k, f))
+
+    def __prefetched__(self, key: tuple, future):
+        if not future.cancelled() and future.exception() is None:
+            self.__page_cache__.put(key, future.result())
+        self.__prefetching__.pop(key, None)
+
+    def close(self):
+        """
+        取消尚未开始的预取并关闭预取线程，已缓存的页面仍可读取，之后翻页会重新创建线程
+        """
+        executor = self.__prefetch_executor__
+        if executor is None:
+            return
+        self.__prefetch_executor__ = None
+        for future in list(self.__prefetching__.values()):
+            future.cancel()
+        executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def __iter__(self):
+        """
+        从当前页开始逐条产出数据，直到出现空页
+        """
+        page = self.page_now
+        while True:
+            elements = self.__get_page__(page)
+            if len(elements) == 0:
+                return
+            for element in elements:
+                yield element
+            page += 1
+
+
+class ParserBackend(Enum):
+    """
+    评论网页解析方式
+    """
+    BS4 = 'bs4'  # BeautifulSoup构建完整文档树
+    LXML = 'lxml'  # lxml直接XPath提取，不构建BeautifulSoup树
+
 
 class SingleComment(object):
     __slots__ = ['author', 'star', 'comment', 'date_published']
@@ -43,6 +209,117 @@ class SingleComment(object):
             {'author': self.author, 'star': self.star, 'date_published': self.date_published, 'comment': self.comment})
 
 
+def __has_class__(tag: str, cls: str) -> str:
+    return "{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {cls} ')]".format(tag=tag, cls=cls)
+
+
+__xpath_comment_box__ = etree.XPath('(//' + __has_class__('div', 'comment_ctrip') + ')[1]')
+__xpath_comment_single__ = etree.XPath('.//' + __has_class__('div', 'comment_single'))
+__xpath_author__ = etree.XPath("(.//a[@itemprop='author'])[1]")
+__xpath_star__ = etree.XPath('(.//' + __has_class__('span', 'starlist') + ')[1]')
+__xpath_first_span__ = etree.XPath('(.//span)[1]')
+__xpath_heightbox__ = etree.XPath('(.//' + __has_class__('span', 'heightbox') + ')[1]')
+__xpath_date__ = etree.XPath("(.//em[@itemprop='datePublished'])[1]")
+__xpath_text__ = etree.XPath('string()')
+__xml_declaration__ = re.compile(r'^<\?xml[^>]*\?>')  # lxml不接受带编码声明的str
+
+
+def __parse_comment_bs4__(html: str) -> List:
+    """
+    解析评论网页
+    :param html: 网页文本
+    :return:SingleComment列表
+    """
+    elements = list()  # 存放评论数据
+    soup = BeautifulSoup(html, 'lxml')
+    sight_commentbox = soup.find(name='div', class_='comment_ctrip')
+    comment_singles = sight_commentbox.find_all(name='div', class_='comment_single')
+    if len(comment_singles) == 0:  # 没有评论数据
+        return elements
+    for single_comment in comment_singles:
+        if len(single_comment) > 2:
+            author: str = single_comment.find(name='a', attrs={'itemprop': 'author'}).text  # 作者
+            star: str = single_comment.find(name='span', class_='starlist').find(name='span').attrs['style']  # 评分
+            comment: str = single_comment.find(name='span', class_='heightbox').text  # 评论
+            date_published: str = single_comment.find(name='em', attrs={'itemprop': 'datePublished'}).text  # 发布日期
+            star: int = parse_star(star)  # 评分转换
+            elements.append(SingleComment(author, star, comment, date_published))
+    return elements
+
+
+def __node_count__(element) -> int:
+    """
+    统计子节点数目（包括文本节点），与BeautifulSoup中len(tag)一致
+    """
+    count = 1 if element.text else 0
+    for child in element:
+        count += 2 if child.tail else 1
+    return count
+
+
+def __first__(nodes: list, name: str):
+    """
+    取XPath结果的第一个节点，没有时抛出AttributeError，与BeautifulSoup中find返回None后取属性的行为一致
+    :param nodes: XPath结果
+    :param name: 查找的节点，用于错误信息
+    """
+    if len(nodes) == 0:
+        raise AttributeError("评论中没有{0}".format(name))
+    return nodes[0]
+
+
+def __parse_comment_lxml__(html: str) -> List:
+    """
+    使用lxml XPath解析评论网页，结果与__parse_comment_bs4__一致
+    :param html: 网页文本
+    :return:SingleComment列表
+    """
+    elements = list()  # 存放评论数据
+    try:
+        root = lxml_html.fromstring(__xml_declaration__.sub('', html, count=1))
+    except etree.ParserError as e:
+        # 空网页或只有注释，与BeautifulSoup找不到评论区时一致
+        raise AttributeError("网页中没有comment_ctrip评论区") from e
+    boxes = __xpath_comment_box__(root)
+    if len(boxes) == 0:
+        raise AttributeError("网页中没有comment_ctrip评论区")
+    sight_commentbox = boxes[0]
+    comment_singles = __xpath_comment_single__(sight_commentbox)
+    if len(comment_singles) == 0:  # 没有评论数据
+        return elements
+    for single_comment in comment_singles:
+        if __node_count__(single_comment) > 2:
+            author: str = __xpath_text__(__first__(__xpath_author__(single_comment), 'author'))  # 作者
+            starlist = __first__(__xpath_star__(single_comment), 'starlist')
+            star: str = __first__(__xpath_first_span__(starlist), 'starlist span').attrib['style']  # 评分
+            comment: str = __xpath_text__(__first__(__xpath_heightbox__(single_comment), 'heightbox'))  # 评论
+            date_published: str = __xpath_text__(__first__(__xpath_date__(single_comment), 'datePublished'))  # 发布日期
+            star: int = parse_star(star)  # 评分转换
+            elements.append(SingleComment(author, star, comment, date_published))
+    return elements
+
+
+__comment_parsers__ = {
+    ParserBackend.BS4: __parse_comment_bs4__,
+    ParserBackend.LXML: __parse_comment_lxml__,
+}
+
+
+def parse_comment_page(html: str, parser: ParserBackend = ParserBackend.BS4) -> List:
+    """
+    解析评论网页
+    :param html: 网页文本
+    :param parser: 解析方式
+    :return:SingleComment列表
+    """
+    with METRICS.timer('parse', 'comment_' + parser.value) as timer:
+        elements = __comment_parsers__[parser](html)
+        if METRICS.enabled:
+            timer.nbytes = len(html.encode('utf-8'))  # 网页字节数，与http统计一致
+        timer.items = len(elements)
+    return elements
+
+
 class CommentView(ListView):
     """
     获取景区评论数据
@@ -53,8 +330,23 @@ class CommentView(ListView):
     page_now: int = 1
     resource_id: int = 1
     current_view: List = None
+    archive = None  # 原始网页归档
+    comment_url: str = 'https://you.ctrip.com/destinationsite/TTDSecond/SharedView/AsynCommentView'  # 评论接口
 
-    def __init__(self, user_agent=None, cookie=None):
+    def __init__(self, user_agent=None, cookie=None, transport: HttpTransport = None,
+                 parser: ParserBackend = ParserBackend.BS4, prefetch: int = 0, cache_size: int = 16, archive=None):
+        """
+        :param user_agent:
+        :param cookie:
+        :param transport: 共享连接池
+        :param parser: 评论网页解析方式
+        :param prefetch: 后台预取的页数
+        :param cache_size: 最近页面缓存容量
+        :param archive: 原始网页归档（如page_archive.PageArchive），请求到的评论网页会写入归档
+        """
+        self.archive = archive
+        self.prefetch = prefetch
+        self.cache_size = cache_size
         if user_agent is None:
             user_agent = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_13_6) AppleWebKit/537.36 (KHTML, like Gecko)" \
                          " Chrome/69.0.3497.100 Safari/537.36"
@@ -62,6 +354,8 @@ class CommentView(ListView):
             'user-agent': user_agent,
             'cookie': cookie
         }
+        self.transport = transport if transport is not None else get_default_transport()
+        self.parser = parser
 
     def get_comment_detail(self, url):
         """
@@ -69,18 +363,37 @@ class CommentView(ListView):
         :param url:
         :return:
         """
-        response = requests.get(url=url, headers=self.headers)
-        try:
-            self.poi_id = int(re.search('poiid\D+(\d+)"', response.text).group(1))
-        except AttributeError:
+        self.resolve_sight(url)
+        self.current_view = self.__get_page__(self.page_now)
+        return self.current_view
+
+    def resolve_sight(self, url):
+        """
+        只解析景点网页链接中的景点信息，不请求评论
+        :param url:
+        :return:
+        """
+        response = self.transport.get(url=url, headers=self.headers, endpoint='sight')
+        poi_id = find_poiid(response.content)
+        if poi_id is None:
             raise KeyWordException
-        self.district_name = re.search('sight/([a-zA-Z]+)\d', url).group(1).capitalize()
-        self.district_id = int(re.search('sight/[a-zA-Z]+(\d+)\D', url).group(1))
-        self.resource_id = int(re.search('\d+/(\d+)\Shtml', url).group(1))
+        sight = parse_sight_url(url)
+        if sight is None:
+            raise AttributeError("景点链接格式错误")
+        self.poi_id = poi_id
+        self.district_name = sight.district_name
+        self.district_id = sight.district_id
+        self.resource_id = sight.resource_id
         self.page_now = 1
-        self.current_view = self.__get_comment_view__(self.poi_id, self.district_id, self.district_name, self.page_now,
-                                                      self.resource_id)
-        return self.current_view
+
+    def fetch_page(self, page_now: int) -> str:
+        """
+        请求当前景点某一页评论的原始网页
+        :param page_now: 评论分页
+        :return:网页文本
+        """
+        return self.__fetch_comment_page__(self.poi_id, self.district_id, self.district_name, page_now,
+                                           self.resource_id)
 
     def __get_comment_view__(self, poi_id: int, district_id: int, district_name: str, page_now: int,
                              resource_id: int) -> List:
@@ -94,8 +407,20 @@ class CommentView(ListView):
         :param resource_id:景区id
         :return:SingleComment的GeneratorType
         """
-        elements = list()  # 存放评论数据
+        return parse_comment_page(self.__fetch_comment_page__(poi_id, district_id, district_name, page_now, resource_id),
+                                  self.parser)
 
+    def __fetch_comment_page__(self, poi_id: int, district_id: int, district_name: str, page_now: int,
+                               resource_id: int) -> str:
+        """
+        请求某一页评论的原始网页
+        :param poi_id:
+        :param district_id:城市id
+        :param district_name:城市名
+        :param page_now:评论分页
+        :param resource_id:景区id
+        :return:网页文本
+        """
         post_data = {
             'poiID': poi_id,
             'districtId': district_id,
@@ -104,35 +429,73 @@ class CommentView(ListView):
             'resourceId': resource_id,
         }
 
-        response = requests.post(url='https://you.ctrip.com/destinationsite/TTDSecond/SharedView/AsynCommentView',
-                                 data=post_data,
-                                 headers=self.headers)
-        soup = BeautifulSoup(response.text, 'lxml')
-        sight_commentbox = soup.find(name='div', class_='comment_ctrip')
-        comment_singles = sight_commentbox.find_all(name='div', class_='comment_single')
-        if len(comment_singles) == 0:  # 没有评论数据
-            return elements
-        for single_comment in comment_singles:
-            if len(single_comment) > 2:
-                author: str = single_comment.find(name='a', attrs={'itemprop': 'author'}).text  # 作者
-                star: str = single_comment.find(name='span', class_='starlist').find(name='span').attrs['style']  # 评分
-                comment: str = single_comment.find(name='span', class_='heightbox').text  # 评论
-                date_published: str = single_comment.find(name='em', attrs={'itemprop': 'datePublished'}).text  # 发布日期
-                star: int = int(re.match('\D+(\d+)', star).group(1)) / 20  # 评分转换
-                elements.append(SingleComment(author, star, comment, date_published))
-        return elements
+        response = self.transport.post(url=self.comment_url, data=post_data, headers=self.headers,
+                                       endpoint='comment')
+        if self.archive is not None:
+            self.archive.put('comment', self.comment_url, post_data, response.text, response.url)
+        return response.text
+
+    async def iter_all_comments(self, concurrency: int = 4, start_page: int = 1):
+        """
+        并发抓取全部评论页，按页面返回顺序逐条产出评论，遇到空页即停止。
+        需先调用get_comment_detail解析景点信息
+        :param concurrency: 同时进行的请求数
+        :param start_page: 起始页
+        :return:SingleComment的异步生成器
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency必须大于0")
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        pending = dict()  # 存储格式{task:页码}
+        next_page = start_page
+        stop_page = None  # 第一个空页的页码
+        try:
+            while True:
+                while len(pending) < concurrency and (stop_page is None or next_page < stop_page):
+                    task = loop.run_in_executor(executor, self.__get_comment_view__, self.poi_id, self.district_id,
+                                                self.district_name, next_page, self.resource_id)
+                    pending[task] = next_page
+                    next_page += 1
+                if not pending:
+                    break
+                done, _ = await asyncio.wait(pending.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    page = pending.pop(task)
+                    if stop_page is not None and page > stop_page:
+                        continue
+                    elements = task.result()
+                    if len(elements) == 0:
+                        stop_page = page if stop_page is None else min(stop_page, page)
+                        continue
+                    for element in elements:
+                        yield element
+                # 空页之后的页面不再需要
+                if stop_page is not None:
+                    for task, page in list(pending.items()):
+                        if page > stop_page:
+                            task.cancel()
+                            pending.pop(task)
+        finally:
+            for task in pending:
+                task.cancel()
+            executor.shutdown(wait=False)
+
+    def __cache_key__(self, page: int) -> tuple:
+        return (self.poi_id, self.district_id, self.district_name, page, self.resource_id)
+
+    def __load_page__(self, key: tuple) -> List:
+        return self.__get_comment_view__(*key)
 
     def next_page(self):
 
         self.page_now += 1
-        self.current_view = self.__get_comment_view__(self.poi_id, self.district_id, self.district_name, self.page_now,
-                                                      self.resource_id)
+        self.current_view = self.__get_page__(self.page_now)
         return self.current_view
 
     def before_page(self):
         self.page_now -= 1
-        self.current_view = self.__get_comment_view__(self.poi_id, self.district_id, self.district_name, self.page_now,
-                                                      self.resource_id)
+        self.current_view = self.__get_page__(self.page_now)
         return self.current_view
 
     def show_current_view(self):
@@ -178,6 +541,39 @@ class AttractionInfo(object):
         return "{name:30}{url:20}".format_map({'name': self.name, 'url': self.url})
 
 
+def parse_attraction_list(html: str, page_url: str) -> List:
+    """
+    解析景区列表网页
+    :param html: 网页文本
+    :param page_url: 网页链接（重定向之后），用于拼接景区入口
+    :return:AttractionInfo列表
+    """
+    soup = BeautifulSoup(html, 'lxml')
+    ul_tag = soup.find(name='ul', class_='jingdian-ul')
+
+    res = parse.urlparse(page_url)
+    domain = ''.join([res.scheme, '://', res.netloc])  # 域名
+    elements = list()
+    if ul_tag is None:  # 超出最后一页
+        return elements
+    for li_tag in ul_tag.children:
+        if len(li_tag) <= 1:
+            continue
+
+        a_tag = li_tag.find(name='a', class_='pic')
+        url = ''.join([domain, a_tag.attrs['href']])  # 景区入口
+        dt_tag = li_tag.find(name='dt')
+        info_list = list()
+        # 提取景区名字和所处地区
+        for a_tag_info in dt_tag.find_all(name='a'):
+            title = strip_whitespace(a_tag_info.text)
+            info_list.append(title)
+        info_list.reverse()
+        attractions_info = ''.join(info_list)  # 景区信息如：广州广州塔
+        elements.append(AttractionInfo(url, attractions_info))
+    return elements
+
+
 class DataType(Enum):
     ATTRACTION = '景点'
     DESTINATION = '目的地'
@@ -189,12 +585,24 @@ class DataType(Enum):
     TRAVEL = '游记'
 
 
+def normalize_keyword(search_keyword: str) -> str:
+    """
+    搜索关键词归一化：全角转半角、去掉首尾空白、合并连续空白、转小写
+    """
+    return ' '.join(unicodedata.normalize('NFKC', search_keyword).split()).lower()
+
+
+# 进程内共享的搜索结果缓存，只保存解析结果不保存响应体，存储格式{(连接池编号, 搜索接口, 归一化关键词):(tab_map, domain)}
+SEARCH_RESULT_CACHE = PageCache(128, ttl=3600)
+
+
 class CityVacationsAdView(object):
     """
     获取城市景点
     """
 
     ResponseView = None
+    search_url: str = 'https://you.ctrip.com/SearchSite/?'  # 搜索接口
 
     class ResponseInfo(object):
         """
@@ -203,7 +611,7 @@ class CityVacationsAdView(object):
 
         def __init__(self, response: requests.Response, tab_map: dict, domain: str):
             """
-            :param response: 请求响应体
+            :param response: 请求响应体，结果来自搜索结果缓存时为None
             :param tab_map:响应标签信息，存储格式{序号:TabInfo}
             :param domain:域名
             """
@@ -219,7 +627,14 @@ class CityVacationsAdView(object):
                 list_info.append("{key:^5}\t{tabInfo}\n ".format_map({'key': i, 'tabInfo': value}))
             return ''.join(list_info)
 
-    def __init__(self, user_agent=None, cookie=None):
+    def __init__(self, user_agent=None, cookie=None, transport: HttpTransport = None,
+                 search_cache: PageCache = SEARCH_RESULT_CACHE):
+        """
+        :param user_agent:
+        :param cookie:
+        :param transport: 共享连接池
+        :param search_cache: 搜索结果缓存，默认进程内共享，None表示不缓存
+        """
         if user_agent is None:
             user_agent = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_13_6) AppleWebKit/537.36 (KHTML, like Gecko)" \
                          " Chrome/69.0.3497.100 Safari/537.36"
@@ -227,6 +642,9 @@ class CityVacationsAdView(object):
             'user-agent': user_agent,
             'cookie': cookie
         }
+        self.transport = transport if transport is not None else get_default_transport()
+        self.search_cache = search_cache
+        self.search_keyword = None  # ResponseView对应的归一化关键词
 
     def __get_request_response__(self, search_keyword: str) -> ResponseInfo:
         """
@@ -234,45 +652,64 @@ class CityVacationsAdView(object):
         :param search_keyword: 搜索关键词
         :return:
         """
-        href = 'https://you.ctrip.com/SearchSite/?'
+        href = self.search_url
         paramer = {
             'query': search_keyword
         }
         url = href + parse.urlencode(paramer)
-        response = requests.get(url=url, headers=self.headers)
+        response = self.transport.get(url=url, headers=self.headers, endpoint='search')
         res = parse.urlparse(response.url)
         domain = ''.join([res.scheme, '://', res.netloc])  # 域名
         # 提取搜索结果标签信息
-        soup = BeautifulSoup(response.text, 'lxml')
-        ul_tag = soup.find(name='ul', class_='list-tabs')
-        tab_map = dict()  # 存储标签信息
-        for i, li_tag in enumerate(ul_tag.children):
-            if len(li_tag) <= 1:
-                continue
-            a_tag = li_tag.find(name='a')
-            href = ''.join([domain, a_tag.attrs['href']])  # 标签内容入口
-            tab_info = re.sub('\s', '', a_tag.text)  # 标签信息
-            temp = re.match("(\D+)(\d+)", tab_info)
-            tab = temp.group(1)  # 标签
-            result_num = int(temp.group(2))  # 此类标签搜索结果数目
-            tab_map[tab] = TabInfo(tab, href, result_num)
+        with METRICS.timer('parse', 'search_tabs') as timer:
+            soup = BeautifulSoup(response.text, 'lxml')
+            ul_tag = soup.find(name='ul', class_='list-tabs')
+            tab_map = dict()  # 存储标签信息
+            for i, li_tag in enumerate(ul_tag.children):
+                if len(li_tag) <= 1:
+                    continue
+                a_tag = li_tag.find(name='a')
+                href = ''.join([domain, a_tag.attrs['href']])  # 标签内容入口
+                tab, result_num = parse_tab(a_tag.text)  # 标签, 此类标签搜索结果数目
+                tab_map[tab] = TabInfo(tab, href, result_num)
+            timer.items = len(tab_map)
         return self.ResponseInfo(response, tab_map, domain)
 
-    def send_search_request(self, search_keyword: str):
+    def __search__(self, search_keyword: str, refresh: bool = False) -> ResponseInfo:
+        """
+        搜索并解析标签，结果按归一化关键词缓存，重复或重试的搜索不再请求和解析
+        :param search_keyword: 搜索关键词
+        :param refresh: 忽略缓存重新搜索
+        :return:
+        """
+        # 键包含连接池，回放和实际请求的结果互不混用
+        key = (self.transport.transport_id, self.search_url, normalize_keyword(search_keyword))
+        if self.search_cache is not None and not refresh:
+            cached = self.search_cache.get(key)
+            if cached is not None:
+                return self.ResponseInfo(None, *cached)
+        response_info = self.__get_request_response__(search_keyword)
+        if self.search_cache is not None:
+            self.search_cache.put(key, (response_info.tab_map, response_info.domain))
+        return response_info
+
+    def send_search_request(self, search_keyword: str, refresh: bool = False):
         """
         发送搜索请求
         :param search_keyword: 搜索关键字
+        :param refresh: 忽略缓存重新搜索
         :return:
         """
-        self.ResponseView = self.__get_request_response__(search_keyword)
+        self.ResponseView = self.__search__(search_keyword, refresh)
+        self.search_keyword = normalize_keyword(search_keyword)
 
     def get_search_result(self, search_keyword: str):
         """
         获取搜索结果
         :return:
         """
-        if self.ResponseView is None:
-            self.ResponseView = self.__get_request_response__(search_keyword)
+        if self.ResponseView is None or self.search_keyword != normalize_keyword(search_keyword):
+            self.send_search_request(search_keyword)
 
         return self.ResponseView
 
@@ -295,9 +732,23 @@ class AttractionListView(ListView):
     current_list_view: List = None  # 当前景点列表视图
     comment_view: CommentView = None  # 评论数据视图
     last_list_view: List = None  # 上一个景区列表视图
+    archive = None  # 原始网页归档
 
-    def __init__(self, key_word: str = None, user_agent=None, cookie=None):
+    def __init__(self, key_word: str = None, user_agent=None, cookie=None, transport: HttpTransport = None,
+                 prefetch: int = 0, cache_size: int = 16, archive=None):
+        """
+        :param key_word: 搜索关键词
+        :param user_agent:
+        :param cookie:
+        :param transport: 共享连接池
+        :param prefetch: 后台预取的页数
+        :param cache_size: 最近页面缓存容量
+        :param archive: 原始网页归档（如page_archive.PageArchive），请求到的景点列表网页会写入归档
+        """
         self.keyword_query = key_word
+        self.archive = archive
+        self.prefetch = prefetch
+        self.cache_size = cache_size
         if user_agent is None:
             user_agent = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_13_6) AppleWebKit/537.36 (KHTML, like Gecko)" \
                          " Chrome/69.0.3497.100 Safari/537.36"
@@ -305,6 +756,7 @@ class AttractionListView(ListView):
             'user-agent': user_agent,
             'cookie': cookie
         }
+        self.transport = transport if transport is not None else get_default_transport()
 
     def get_vacation_list_view(self, search_keyword: str):
         """
@@ -312,53 +764,50 @@ class AttractionListView(ListView):
         :param search_keyword:
         :return:
         """
-        engine = CityVacationsAdView()
+        self.resolve_search(search_keyword)
+        self.current_list_view = self.__get_page__(self.page_now)
+        return self.current_list_view
+
+    def resolve_search(self, search_keyword: str):
+        """
+        搜索关键词，只解析景点标签的入口，不请求景点列表
+        :param search_keyword:
+        :return:
+        """
+        engine = CityVacationsAdView(transport=self.transport)
         engine.send_search_request(search_keyword)
         vacation_info: TabInfo = engine.select_tab(DataType.ATTRACTION)
+        if vacation_info is None:
+            raise KeyWordException
         url = vacation_info.url_entrance
         res = parse.urlparse(url)
         self.request_url = ''.join([res.scheme, "://", res.netloc, res.path, '/?'])
         self.keyword_query = parse.parse_qs(res.query)['query'][0]
-        self.current_list_view = self.__get_vacations_list_detail__()
-        return self.current_list_view
 
-    def __get_vacations_list_detail__(self) -> List:
+    def __get_vacations_list_detail__(self, page_now: int = None, request_url: str = None,
+                                      keyword_query: str = None) -> List:
         """
         获取相关景区列表
-        :param url:
+        :param page_now: 页码，默认当前页
+        :param request_url: 请求链接，默认当前链接
+        :param keyword_query: 搜索关键词，默认当前关键词
         :return:
         """
         parameters = {
-            'query': self.keyword_query,
+            'query': self.keyword_query if keyword_query is None else keyword_query,
             'isAnswered': '',
             'isRecommended': '',
             'publishDate': '',
-            'PageNo': self.page_now
+            'PageNo': self.page_now if page_now is None else page_now
         }
-        url = self.request_url + parse.urlencode(parameters)
-        response = requests.get(url=url, headers=self.headers)
-        soup = BeautifulSoup(response.text, 'lxml')
-        ul_tag = soup.find(name='ul', class_='jingdian-ul')
-
-        res = parse.urlparse(response.url)
-        domain = ''.join([res.scheme, '://', res.netloc])  # 域名
-        elements = list()
-        for li_tag in ul_tag.children:
-            if len(li_tag) <= 1:
-                continue
-
-            a_tag = li_tag.find(name='a', class_='pic')
-            url = ''.join([domain, a_tag.attrs['href']])  # 景区入口
-            dt_tag = li_tag.find(name='dt')
-            info_list = list()
-            # 提取景区名字和所处地区
-            for a_tag_info in dt_tag.find_all(name='a'):
-                title = a_tag_info.text
-                title = re.sub('\s', '', title)
-                info_list.append(title)
-            info_list.reverse()
-            attractions_info = ''.join(info_list)  # 景区信息如：广州广州塔
-            elements.append(AttractionInfo(url, attractions_info))
+        url = (self.request_url if request_url is None else request_url) + parse.urlencode(parameters)
+        response = self.transport.get(url=url, headers=self.headers, endpoint='attraction_list')
+        response.raise_for_status()  # 出错的响应没有景点列表，不能当作最后一页
+        if self.archive is not None:
+            self.archive.put('attraction_list', url, None, response.text, response.url)
+        with METRICS.timer('parse', 'attraction_list') as timer:
+            elements = parse_attraction_list(response.text, response.url)
+            timer.items = len(elements)
         return elements
 
     def show_current_view(self):
@@ -369,22 +818,29 @@ class AttractionListView(ListView):
             self.get_vacation_list_view(self.keyword_query)
             self.show_current_view()
 
+    def __cache_key__(self, page: int) -> tuple:
+        return (self.request_url, self.keyword_query, page)
+
+    def __load_page__(self, key: tuple) -> List:
+        request_url, keyword_query, page = key
+        return self.__get_vacations_list_detail__(page, request_url, keyword_query)
+
     def next_page(self):
 
         self.page_now += 1
-        self.last_list_view = copy.deepcopy(self.current_list_view)
-        self.current_list_view = self.__get_vacations_list_detail__()
+        self.last_list_view = self.current_list_view
+        self.current_list_view = self.__get_page__(self.page_now)
         return self.current_list_view
 
     def before_page(self):
         self.page_now -= 1
-        self.last_list_view = copy.deepcopy(self.current_list_view)
-        self.current_list_view = self.__get_vacations_list_detail__()
+        self.last_list_view = self.current_list_view
+        self.current_list_view = self.__get_page__(self.page_now)
         return self.current_list_view
 
     def parse_url(self, url):
         if self.comment_view is None:
-            self.comment_view = CommentView()
+            self.comment_view = CommentView(transport=self.transport, archive=self.archive)
         self.comment_view.get_comment_detail(url)
         return self.comment_view
 
@@ -401,7 +857,7 @@ class AttractionListView(ListView):
         except KeyWordException:
             # 更新视图
             print("失败！！！失败！！即将重新搜索与之相关的所有信息")
-            self.last_list_view = copy.deepcopy(self.current_list_view)
+            self.last_list_view = self.current_list_view
             self.keyword_query = attraction.name[:-1]
             self.get_vacation_list_view(self.keyword_query)
 
@@ -0,0 +1,122 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import parse
+
+
+class StubResponse(object):
+    """
+    桩服务返回的响应
+    """
+    __slots__ = ['status', 'body', 'headers']
+
+    def __init__(self, body=b'', status: int = 200, headers: dict = None):
+        """
+        :param body: 响应内容，str按utf-8编码
+        :param status: 状态码
+        :param headers: 响应头
+        """
+        self.body = body.encode('utf-8') if isinstance(body, str) else body
+        self.status = status
+        self.headers = dict(headers or {'Content-Type': 'text/html; charset=utf-8'})
+
+
+class StubRequest(object):
+    """
+    桩服务收到的请求
+    """
+    __slots__ = ['method', 'path', 'query', 'form', 'headers']
+
+    def __init__(self, method: str, path: str, query: dict, form: dict, headers):
+        self.method = method
+        self.path = path
+        self.query = query  # 存储格式{参数名:值}，重复参数取第一个
+        self.form = form  # POST表单，格式同query
+        self.headers = headers
+
+
+class StubServer(object):
+    """
+    本地HTTP桩服务，按路径前缀把请求交给处理函数，用于测试和基准测试
+
+    with StubServer({'/SearchSite': handler}) as server:
+        requests.get(server.url('/SearchSite/?query=x'))
+    """
+
+    def __init__(self, routes: dict):
+        """
+        :param routes: 存储格式{路径前缀:处理函数}，处理函数参数为StubRequest，返回StubResponse；
+                       匹配最长的前缀，没有匹配时返回404
+        """
+        self.routes = sorted(routes.items(), key=lambda item: len(item[0]), reverse=True)
+        self.requests = list()  # 收到的请求
+        self.connections = 0  # 建立的TCP连接数
+        self.__lock__ = threading.Lock()
+        self.__server__ = ThreadingHTTPServer(('127.0.0.1', 0), self.__handler__())
+        self.__server__.daemon_threads = True
+        self.__thread__ = None
+
+    @property
+    def base_url(self) -> str:
+        return 'http://127.0.0.1:{0}'.format(self.__server__.server_address[1])
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    def __handler__(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True  # 长连接下响应头和内容分两次发送，避免与延迟确认叠加产生40ms等待
+
+            def setup(self):
+                BaseHTTPRequestHandler.setup(self)
+                with server.__lock__:
+                    server.connections += 1
+
+            def __reply__(self, method: str):
+                res = parse.urlsplit(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length).decode('utf-8') if length else ''
+                request = StubRequest(method, res.path, dict(parse.parse_qsl(res.query, keep_blank_values=True)),
+                                      dict(parse.parse_qsl(body, keep_blank_values=True)), self.headers)
+                with server.__lock__:
+                    server.requests.append(request)
+                response = StubResponse(status=404)
+                for prefix, handler in server.routes:
+                    if res.path.startswith(prefix):
+                        response = handler(request)
+                        break
+                self.send_response(response.status)
+                for name, value in response.headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(response.body)))
+                self.end_headers()
+                self.wfile.write(response.body)
+
+            def do_GET(self):
+                self.__reply__('GET')
+
+            def do_POST(self):
+                self.__reply__('POST')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.__thread__ = threading.Thread(target=self.__server__.serve_forever, daemon=True)
+        self.__thread__.start()
+        return self
+
+    def close(self):
+        self.__server__.shutdown()
+        self.__server__.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
@@ -0,0 +1,195 @@
+"""
+测试和基准测试共用的桩站点与数据生成函数
+"""
+import json
+import os
+import random
+import time
+from contextlib import contextmanager
+from unittest import mock
+from urllib import parse
+from src import replay
+from src.tonghuashun import FundInfo
+from src.transport import HttpTransport
+from src.xiecheng import CommentView, CityVacationsAdView
+from tests.stub_server import StubServer, StubResponse
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+SEARCH_PAGE = '<ul class="list-tabs"><li>\n<a href="/SearchSite/Sight?query=gz">景点 40</a>\n</li></ul>'
+SIGHT_URL = 'https://you.ctrip.com/sight/guangzhou152/107540.html'
+KEYWORD = '广州'
+FUND_CODES = ['{0:06d}'.format(i) for i in range(1, 6)]
+SPECIAL_CODES = ['J' + code for code in FUND_CODES]
+
+
+def load_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def list_page(page: int) -> str:
+    return '<ul class="jingdian-ul">{0}</ul>'.format(''.join(
+        '<li><a class="pic" href="/sight/guangzhou152/{0}.html"></a><dl><dt><a>景点{0}</a></dt></dl></li>'.format(
+            page * 10 + i) for i in range(2)))
+
+
+def comment_html(author: str, date_published: str) -> str:
+    return ('<div class="comment_single"><span class="starlist"><span style="width:100%"></span></span>'
+            '<span class="heightbox">{0}的评论</span><a itemprop="author">{0}</a>'
+            '<em itemprop="datePublished">{1}</em></div>').format(author, date_published)
+
+
+def __minutes__() -> list:
+    """
+    交易时间9:30-11:30、13:00-15:00，HHMM格式
+    """
+    minutes = list(range(9 * 60 + 30, 11 * 60 + 31)) + list(range(13 * 60 + 1, 15 * 60 + 1))
+    return ['{0:02d}{1:02d}'.format(m // 60, m % 60) for m in minutes]
+
+
+def generate_payloads(count: int, seed: int = 0) -> list:
+    """
+    :param count: 基金数
+    :param seed: 随机数种子
+    :return:与接口返回格式相同的文本列表
+    """
+    rng = random.Random(seed)
+    minutes = __minutes__()
+    payloads = list()
+    for i in range(count):
+        prev = round(rng.uniform(0.5, 5), 4)
+        now = prev
+        points = list()
+        for hhmm in minutes:
+            now = max(0.01, now * (1 + rng.gauss(0, 0.001)))
+            points.append('{0},{1:.4f},{2}'.format(hhmm, now, prev))
+        payloads.append('vm_fd_J{0:06d}~{1};'.format(i, ';'.join(points)))
+    return payloads
+
+
+def valuation_payload(special_code: str, points: int = 240, change: float = 0.5) -> str:
+    """
+    与实时估值接口返回格式相同的文本
+    :param change: 每个点相对昨日净值的涨跌幅（百分比）
+    """
+    values = ['{0:02d}{1:02d},{2:.4f},1.0000'.format(9 + (30 + i) // 60, (30 + i) % 60, 1 + change / 100)
+              for i in range(points)]
+    return 'vm_fd_{0}~{1};'.format(special_code, ';'.join(values))
+
+
+class CommentSite(object):
+    """
+    桩评论接口：共pages页，每页3条评论，之后为空页，可模拟接口延迟
+    """
+
+    def __init__(self, pages: int, latency: float = 0):
+        self.pages = pages
+        self.latency = latency
+
+    def sight(self, request):
+        return StubResponse('<script>var poiid = "99";</script>')
+
+    def comment(self, request):
+        if self.latency:
+            time.sleep(self.latency)
+        page = int(request.form['pagenow'])
+        if page > self.pages:
+            return StubResponse(load_fixture('comment_page_empty.html'))
+        return StubResponse('<div class="comment_ctrip">{0}</div>'.format(''.join(
+            comment_html('p{0}c{1}'.format(page, i), '2019-10-01') for i in range(3))))
+
+    def server(self) -> StubServer:
+        return StubServer({'/sight': self.sight, '/comment': self.comment})
+
+
+async def collect(view: CommentView, concurrency: int) -> list:
+    return [comment.author async for comment in view.iter_all_comments(concurrency=concurrency)]
+
+
+class ScraperSite(object):
+    """
+    桩站点：景点、评论、搜索、景点列表、基金详情和实时估值接口，路径与线上一致，用于录制回放数据
+    """
+
+    def __init__(self, pages: int = 5):
+        """
+        :param pages: 评论和景点列表的页数，之后为空页
+        """
+        self.pages = pages
+
+    def sight(self, request):
+        return StubResponse('<script>var poiid = "99";</script>')
+
+    def comment(self, request):
+        if int(request.form['pagenow']) > self.pages:
+            return StubResponse(load_fixture('comment_page_empty.html'))
+        return StubResponse(load_fixture('comment_page.html'))
+
+    def search(self, request):
+        return StubResponse(SEARCH_PAGE)
+
+    def attraction_list(self, request):
+        page = int(request.query['PageNo'])
+        return StubResponse(list_page(page) if page <= self.pages else '<html></html>')
+
+    def fund_detail(self, request):
+        fund_code = request.path.rsplit('/', 1)[1]
+        return StubResponse(json.dumps({'data': [{'name': '基金' + fund_code, 'hqcode': 'J' + fund_code,
+                                                  'fundtype': '股票型', 'levelOfRisk': '中', 'themeList': []}]}))
+
+    def valuation(self, request):
+        return StubResponse(valuation_payload(request.query['info'][len('vm_fd_'):]))
+
+    def server(self) -> StubServer:
+        return StubServer({
+            '/sight': self.sight,
+            parse.urlsplit(CommentView.comment_url).path: self.comment,
+            '/SearchSite/Sight': self.attraction_list,
+            '/SearchSite': self.search,
+            parse.urlsplit(FundInfo.fund_detail_url).path: self.fund_detail,
+            '/': self.valuation,
+        })
+
+
+def rebase(url: str, base_url: str) -> str:
+    """
+    把链接的协议和域名换成base_url的
+    """
+    res = parse.urlsplit(url)
+    return base_url + url[len('{0}://{1}'.format(res.scheme, res.netloc)):]  # 保留结尾的?，不能用urlunsplit
+
+
+@contextmanager
+def site_urls(base_url: str):
+    """
+    各接口链接临时指向base_url
+    """
+    with mock.patch.object(CommentView, 'comment_url', rebase(CommentView.comment_url, base_url)), \
+            mock.patch.object(CityVacationsAdView, 'search_url', rebase(CityVacationsAdView.search_url, base_url)), \
+            mock.patch.object(FundInfo, 'fund_detail_url', rebase(FundInfo.fund_detail_url, base_url)), \
+            mock.patch.object(FundInfo, 'valuation_url', rebase(FundInfo.valuation_url, base_url)):
+        yield
+
+
+def scenarios(transport: HttpTransport, sight_url: str = SIGHT_URL, pages: int = 5) -> list:
+    """
+    各爬虫的基准测试场景
+    :return:存储格式[(场景名, 场景函数, 参数)]
+    """
+    return [
+        ('comments', replay.bench_comments, (transport, sight_url, pages)),
+        ('attraction_list', replay.bench_attraction_list, (transport, KEYWORD, pages)),
+        ('search', replay.bench_search, (transport, KEYWORD, pages)),
+        ('fund', replay.bench_fund, (transport, FUND_CODES, SPECIAL_CODES)),
+    ]
+
+
+def record_site(archive: replay.FixtureArchive, pages: int = 5):
+    """
+    运行全部场景，把桩站点的响应录制到回放数据中
+    """
+    with ScraperSite(pages).server() as server, site_urls(server.base_url):
+        transport = replay.RecordingTransport(archive)
+        for name, scenario, args in scenarios(transport, rebase(SIGHT_URL, server.base_url), pages):
+            scenario(*args)
+        transport.close()
@@ -0,0 +1,29 @@
+import asyncio
+import unittest
+from unittest import mock
+from src.transport import HttpTransport
+from src.xiecheng import CommentView, ParserBackend
+from tests.support import CommentSite, collect
+
+
+class AsyncCommentTest(unittest.TestCase):
+
+    def test_iter_all_comments_stops_at_empty_page(self):
+        site = CommentSite(pages=10, latency=0.01)
+        with site.server() as server, mock.patch.object(CommentView, 'comment_url', server.url('/comment')):
+            view = CommentView(transport=HttpTransport(pool_maxsize=4), parser=ParserBackend.LXML)
+            view.resolve_sight(server.url('/sight/guangzhou152/107540.html'))
+            authors = asyncio.run(collect(view, 4))
+            pages = [int(request.form['pagenow']) for request in server.requests if request.path == '/comment']
+        self.assertEqual(sorted(authors), sorted('p{0}c{1}'.format(p, i) for p in range(1, 11) for i in range(3)))
+        self.assertLessEqual(max(pages), 10 + 4)  # 空页之后最多多请求concurrency页
+        self.assertEqual(len(pages), len(set(pages)))
+
+    def test_concurrency_must_be_positive(self):
+        view = CommentView(transport=HttpTransport())
+        with self.assertRaises(ValueError):
+            asyncio.run(collect(view, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
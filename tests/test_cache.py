@@ -0,0 +1,150 @@
+import gzip
+import os
+import tempfile
+import unittest
+from unittest import mock
+from src.cache import DirectoryCacheBackend, ResponseCache, SqliteCacheBackend
+from src.transport import HttpTransport
+from tests.stub_server import StubServer, StubResponse
+
+
+class FakeTime(object):
+    """
+    可控的time模块，只提供time()
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self) -> float:
+        self.now += 0.001  # 每次取时间都前进，保证最近访问时间有先后
+        return self.now
+
+
+def page(request):
+    if request.path.startswith('/etag'):
+        if request.headers.get('If-None-Match') == '"v1"':
+            return StubResponse(status=304, headers={'ETag': '"v1"'})
+        return StubResponse('etag', headers={'Content-Type': 'text/html; charset=utf-8', 'ETag': '"v1"'})
+    if request.path.startswith('/gzip'):
+        return StubResponse(gzip.compress('压缩内容'.encode('utf-8')),
+                            headers={'Content-Type': 'text/html; charset=utf-8', 'Content-Encoding': 'gzip'})
+    return StubResponse(request.path)
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.clock = FakeTime()
+        patcher = mock.patch('src.cache.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.server = StubServer({'/': page}).start()
+        self.addCleanup(self.server.close)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def backends(self):
+        yield SqliteCacheBackend(os.path.join(self.directory.name, 'cache.db'), touch_batch=4)
+        yield DirectoryCacheBackend(os.path.join(self.directory.name, 'cache'))
+
+    def transport(self, backend, **kwargs) -> HttpTransport:
+        kwargs.setdefault('endpoint_ttls', {self.server.url('/'): 60, self.server.url('/short'): 1,
+                                            self.server.url('/none'): 0})
+        return HttpTransport(cache=ResponseCache(backend, **kwargs))
+
+    def requested(self, path: str) -> int:
+        return sum(1 for request in self.server.requests if request.path == path)
+
+    def test_ttl_prefix(self):
+        cache = ResponseCache(SqliteCacheBackend(':memory:'), {'http://a.com/': 10, 'http://a.com/list': 20,
+                                                               'http://a.com/list/none': 0})
+        self.assertEqual(cache.ttl_for('http://a.com/x'), 10)
+        self.assertEqual(cache.ttl_for('http://a.com/list?page=1'), 20)
+        self.assertEqual(cache.ttl_for('http://a.com/list/none'), 0)
+        self.assertEqual(cache.ttl_for('http://b.com/'), 0)
+
+    def test_hit_miss_and_expiry(self):
+        for backend in self.backends():
+            self.server.requests.clear()
+            transport = self.transport(backend)
+            for path in ['/a', '/a', '/short', '/none', '/none']:
+                self.assertEqual(transport.get(self.server.url(path)).text, path)
+            self.assertEqual(self.requested('/a'), 1)
+            self.assertEqual(self.requested('/none'), 2)  # 缓存时间为0的接口不缓存
+            self.clock.now += 2
+            transport.get(self.server.url('/short'))
+            transport.get(self.server.url('/a'))
+            self.assertEqual(self.requested('/short'), 2)
+            self.assertEqual(self.requested('/a'), 1)
+            self.assertEqual(transport.cache.stats, {'hits': 2, 'misses': 3, 'revalidated': 0, 'stores': 3,
+                                                     'evictions': 0})
+            self.assertEqual(len(backend), 2)
+
+    def test_keyed_on_body(self):
+        for backend in self.backends():
+            transport = self.transport(backend)
+            for form in [{'a': 1, 'b': 2}, {'b': 2, 'a': 1}, {'a': 2}]:
+                transport.post(self.server.url('/post'), data=form)
+            self.assertEqual(transport.cache.stats['hits'], 1)
+            self.assertEqual(len(backend), 2)
+
+    def test_revalidation(self):
+        for backend in self.backends():
+            self.server.requests.clear()
+            transport = self.transport(backend)
+            self.assertEqual(transport.get(self.server.url('/etag')).text, 'etag')
+            self.clock.now += 120
+            response = transport.get(self.server.url('/etag'))
+            self.assertEqual((response.status_code, response.text), (200, 'etag'))
+            self.assertEqual(transport.cache.stats['revalidated'], 1)
+            self.assertEqual(self.server.requests[-1].headers['If-None-Match'], '"v1"')
+            transport.get(self.server.url('/etag'))  # 重新验证后延长了过期时间
+            self.assertEqual(self.requested('/etag'), 2)
+
+    def test_drops_content_headers(self):
+        for backend in self.backends():
+            transport = self.transport(backend)
+            self.assertEqual(transport.get(self.server.url('/gzip')).text, '压缩内容')
+            response = transport.get(self.server.url('/gzip'))
+            self.assertEqual(transport.cache.stats['hits'], 1)
+            self.assertEqual(response.text, '压缩内容')
+            self.assertNotIn('Content-Encoding', response.headers)
+            self.assertNotIn('Content-Length', response.headers)
+
+    def test_lru_eviction(self):
+        for backend in self.backends():
+            transport = self.transport(backend, max_entries=2)
+            for path in ['/a', '/b', '/a', '/c']:  # 访问过的/a比/b新，/b被淘汰
+                transport.get(self.server.url(path))
+            self.assertEqual(transport.cache.stats['evictions'], 1)
+            self.assertEqual(len(backend), 2)
+            self.server.requests.clear()
+            for path in ['/a', '/c', '/b']:
+                transport.get(self.server.url(path))
+            self.assertEqual([request.path for request in self.server.requests], ['/b'], backend)
+
+
+class SqliteCacheBackendTest(unittest.TestCase):
+
+    def test_count_and_touch_batching(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cache.db')
+            backend = SqliteCacheBackend(path, touch_batch=100)
+            cache = ResponseCache(backend, default_ttl=60)
+            response = mock.Mock(status_code=200, url='http://a.com/', headers={}, content=b'x')
+            for _ in range(3):
+                cache.request(lambda method, url, **kwargs: response, 'GET', 'http://a.com/')
+            self.assertEqual(len(backend), 1)  # 重复写入同一个键不增加条目数
+            with mock.patch.object(backend, '__flush_touched__', wraps=backend.__flush_touched__) as flush:
+                for _ in range(50):
+                    cache.request(lambda method, url, **kwargs: response, 'GET', 'http://a.com/')
+                self.assertEqual(flush.call_count, 0)  # 命中时不写入文件
+            backend.close()
+            self.assertEqual(len(SqliteCacheBackend(path)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
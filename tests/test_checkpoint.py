@@ -0,0 +1,116 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from src.checkpoint import CrawlCheckpoint, crawl_keyword
+from src.transport import HttpTransport
+from tests.support import ScraperSite, site_urls
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Interrupted(Exception):
+    pass
+
+
+class CrawlCheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'checkpoint.json')
+
+    def read(self) -> dict:
+        with open(self.path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def test_saves_at_interval(self):
+        clock = FakeClock()
+        checkpoint = CrawlCheckpoint(self.path, interval=5, clock=clock)
+        checkpoint.reset('广州')
+        checkpoint.advance('a', 2)
+        checkpoint.advance('a', 3)
+        self.assertEqual(self.read()['in_flight'], {})  # 未到间隔只修改内存
+        clock.now = 5
+        checkpoint.complete('a')
+        self.assertEqual(self.read()['completed'], ['a'])
+        restored = CrawlCheckpoint(self.path)
+        self.assertEqual((restored.keyword, restored.in_flight, restored.is_completed('a')), ('广州', {}, True))
+
+    def test_interrupted_write_keeps_previous_checkpoint(self):
+        checkpoint = CrawlCheckpoint(self.path, interval=0)
+        checkpoint.reset('广州')
+        checkpoint.advance('a', 2)
+        before = self.read()
+
+        def broken_dump(state, f, **kwargs):
+            f.write('{"keyword": "广')  # 写到一半中断
+            raise Interrupted()
+
+        with mock.patch('src.checkpoint.json.dump', broken_dump):
+            with self.assertRaises(Interrupted):
+                checkpoint.advance('a', 3)
+        self.assertEqual(self.read(), before)
+        with mock.patch('src.checkpoint.os.replace', side_effect=Interrupted()):
+            with self.assertRaises(Interrupted):
+                checkpoint.advance('a', 4)
+        self.assertEqual(self.read(), before)
+        self.assertEqual(CrawlCheckpoint(self.path).comment_page('a'), 2)
+        checkpoint.advance('a', 5)  # 临时文件残留不影响之后的写入
+        self.assertEqual(CrawlCheckpoint(self.path).comment_page('a'), 5)
+
+
+class CrawlResumeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'checkpoint.json')
+        self.server = ScraperSite(pages=2).server().start()
+        self.addCleanup(self.server.close)
+        urls = site_urls(self.server.base_url)
+        urls.__enter__()
+        self.addCleanup(urls.__exit__, None, None, None)
+
+    def crawl(self, interval: float, fail_at: int = None) -> list:
+        """
+        :param fail_at: 第几次回调时模拟进程中断
+        :return:处理过的(景点编号, 评论页)列表
+        """
+        handled = list()
+
+        def on_comments(attraction, page, comments):
+            if fail_at is not None and len(handled) + 1 == fail_at:
+                raise Interrupted()
+            handled.append((attraction.url.rsplit('/', 1)[1], page))
+
+        checkpoint = CrawlCheckpoint(self.path, interval=interval)
+        try:
+            crawl_keyword('广州', checkpoint, on_comments, transport=HttpTransport())
+        except Interrupted:
+            pass
+        return handled
+
+    def test_resume_after_interruption(self):
+        for interval in (0, 3600):  # 每次都写入，或只在中断时写入
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            first = self.crawl(interval, fail_at=6)
+            self.assertEqual(first, [('10.html', 1), ('10.html', 2), ('11.html', 1), ('11.html', 2), ('20.html', 1)])
+            state = CrawlCheckpoint(self.path)
+            self.assertEqual((state.list_page, state.in_flight), (2, {self.server.url('/sight/guangzhou152/20.html'): 2}))
+            second = self.crawl(interval)
+            self.assertEqual(second, [('20.html', 2), ('21.html', 1), ('21.html', 2)])
+            self.assertEqual(self.crawl(interval), [])  # 已全部完成
+
+
+if __name__ == '__main__':
+    unittest.main()
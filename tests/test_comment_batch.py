@@ -0,0 +1,61 @@
+import unittest
+from src.comment_batch import CommentBatch
+from src.xiecheng import SingleComment
+
+
+def rows(batch: CommentBatch) -> list:
+    return [(row.author, row.star, row.comment, row.date_published) for row in batch]
+
+
+class CommentBatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.comments = [SingleComment('作者{0}'.format(i), float(i % 5 + 1), '评论' * i,
+                                       '2019-10-{0:02d}'.format(i + 1))
+                         for i in range(10)]
+        self.expected = [(c.author, c.star, c.comment, c.date_published) for c in self.comments]
+        self.batch = CommentBatch.from_comments(self.comments)
+
+    def test_append_and_index(self):
+        batch = CommentBatch(capacity=1)  # 触发扩容
+        batch.extend(self.comments)
+        self.assertEqual(len(batch), 10)
+        self.assertEqual(rows(batch), self.expected)
+        self.assertEqual(str(batch[-1]), str(self.comments[-1]))
+        with self.assertRaises(IndexError):
+            batch[10]
+
+    def test_slices_match_list(self):
+        for item in [slice(2, 7), slice(None, None, 2), slice(None, None, -1), slice(8, 1, -3),
+                     slice(-1, -4, -1), slice(5, 2), slice(3, 3, -1), slice(100, None, -2)]:
+            self.assertEqual(rows(self.batch[item]), self.expected[item], item)
+            self.assertEqual(self.batch[item].star.tolist(), [row[1] for row in self.expected[item]], item)
+
+    def test_slice_can_grow(self):
+        batch = self.batch[::-2]
+        batch.append(self.comments[0])
+        self.assertEqual(rows(batch), self.expected[::-2] + self.expected[:1])
+
+    def test_append_after_to_arrow(self):
+        table = self.batch.to_arrow()
+        with self.assertRaises(BufferError):
+            self.batch.append(self.comments[0])
+        self.assertEqual(len(self.batch), 10)
+        self.assertEqual(rows(self.batch), self.expected)
+        self.assertEqual(table.column('author').to_pylist(), [row[0] for row in self.expected])
+        del table
+        self.batch.append(self.comments[0])
+        self.assertEqual(rows(self.batch), self.expected + self.expected[:1])
+
+    def test_append_rolls_back_partially_exported_columns(self):
+        view = memoryview(self.batch.comment.data)  # 只有comment列被导出
+        with self.assertRaises(BufferError):
+            self.batch.append(self.comments[3])
+        self.assertEqual(rows(self.batch), self.expected)
+        view.release()
+        self.batch.append(self.comments[3])
+        self.assertEqual(len(self.batch), 11)
+
+
+if __name__ == '__main__':
+    unittest.main()
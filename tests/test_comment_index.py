@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+from src.comment_index import CommentIndex, tokenize
+from src.xiecheng import SingleComment
+
+COMMENTS = [
+    SingleComment('a', 5.0, '景色很美，okNice!', '2025-01-02'),
+    SingleComment('b', 2.0, '排队两小时，不推荐', '2025-01-20'),
+    SingleComment('c', 1.0, '排了很久的队 OK', '2024-12-31'),
+    SingleComment('d', 4.0, '门票120元，排队还好', '2025-02-01'),
+]
+
+
+def comments(rows: list) -> list:
+    return [row.comment for row in rows]
+
+
+class CommentIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = CommentIndex()
+        self.assertEqual(self.index.add(1, COMMENTS[:3]), 3)
+        self.assertEqual(self.index.add(2, COMMENTS[3:] + COMMENTS[:1]), 2)
+        self.assertEqual(self.index.add(1, COMMENTS[:1]), 0)  # 重复评论忽略
+
+    def brute_force(self, term: str) -> list:
+        docs = [c for poi, group in ((1, COMMENTS[:3]), (2, COMMENTS[3:] + COMMENTS[:1])) for c in group]
+        return [c.comment for c in docs if term.lower() in c.comment.lower()]
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize('排队 OKn'), {'排队', 'ok', 'kn'})
+        self.assertEqual(tokenize('好 a'), set())
+
+    def test_substring_semantics(self):
+        for term in ['ok', 'OK', 'nice', 'kni', 'o', '排队', '排', '排队两', '队 ok', '12', '120元', '很美，ok', 'xyz']:
+            self.assertEqual(comments(self.index.query(term)), self.brute_force(term), term)
+
+    def test_filters_and_aggregates(self):
+        self.assertEqual(comments(self.index.query('排队', poi_id=1, year=2025, max_star=2)), ['排队两小时，不推荐'])
+        self.assertEqual(self.index.count(year=2025), 4)
+        self.assertEqual(len(self.index.query(limit=2)), 2)
+        self.assertEqual(self.index.star_histogram(1), [0, 1, 1, 0, 0, 1])
+        self.assertAlmostEqual(self.index.average_star(2), 4.5)
+        self.assertEqual(self.index.monthly(1, 2025), {'2025-01': (2, 3.5)})
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'index.npz')
+            self.index.save(path)
+            loaded = CommentIndex.load(path)
+        self.assertEqual(len(loaded), len(self.index))
+        self.assertEqual(comments(loaded.query('ok')), comments(self.index.query('ok')))
+        self.assertEqual(loaded.monthly(1), self.index.monthly(1))
+        self.assertEqual(loaded.add(1, COMMENTS[:1]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import warnings
+from src.xiecheng import ParserBackend, parse_comment_page
+from tests.support import load_fixture
+
+
+def parse(html: str, parser: ParserBackend):
+    """
+    :return:评论元组列表，解析失败时返回异常类型
+    """
+    try:
+        return [(item.author, item.star, item.comment, item.date_published)
+                for item in parse_comment_page(html, parser)]
+    except Exception as e:
+        return type(e)
+
+
+class CommentParserTest(unittest.TestCase):
+
+    def assert_same(self, name: str, expected):
+        html = load_fixture(name)
+        self.assertEqual(parse(html, ParserBackend.BS4), expected)
+        self.assertEqual(parse(html, ParserBackend.LXML), expected)
+
+    def test_comment_page(self):
+        self.assert_same('comment_page.html', [
+            ('旅行者A', 5.0, '风景很美 & 人不多，值得一去\xa0!', '2019-10-01'),
+            ('张三', 3.0, '  门票偏贵，排队一小时 <不推荐>  ', '2019-09-30'),
+            ("Mr. O'Neil", 4.0, '', '2019-09-29'),
+        ])
+
+    def test_empty_page(self):
+        self.assert_same('comment_page_empty.html', [])
+
+    def test_missing_comment_box(self):
+        self.assert_same('comment_page_no_box.html', AttributeError)
+
+    def test_missing_nodes(self):
+        self.assert_same('comment_missing_author.html', AttributeError)
+        self.assert_same('comment_missing_star.html', AttributeError)
+        self.assert_same('comment_bad_style.html', AttributeError)
+        self.assert_same('comment_missing_style.html', KeyError)
+
+    def test_empty_body(self):
+        for html in ['', '  \n\t', '<!-- 空网页 -->']:
+            self.assertEqual(parse(html, ParserBackend.BS4), AttributeError, repr(html))
+            self.assertEqual(parse(html, ParserBackend.LXML), AttributeError, repr(html))
+
+    def test_xml_declaration(self):
+        declaration = '<?xml version="1.0" encoding="utf-8"?>\n'
+        expected = parse(load_fixture('comment_page.html'), ParserBackend.BS4)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')  # BeautifulSoup提示按HTML解析XML
+            for html, result in [(declaration + load_fixture('comment_page.html'), expected),
+                                 (declaration, AttributeError)]:
+                self.assertEqual(parse(html, ParserBackend.BS4), result)
+                self.assertEqual(parse(html, ParserBackend.LXML), result)
+
+
+if __name__ == '__main__':
+    unittest.main()
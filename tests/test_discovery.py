@@ -0,0 +1,65 @@
+import unittest
+from unittest import mock
+from src.discovery import AttractionDiscovery
+from src.transport import HttpTransport
+from src.xiecheng import CityVacationsAdView
+from tests.stub_server import StubServer, StubResponse
+from tests.support import SEARCH_PAGE, list_page
+
+MALFORMED_PAGE = '<ul class="jingdian-ul"><li><a>缺少入口</a><dl><dt></dt></dl></li></ul>'
+
+
+class AttractionDiscoveryTest(unittest.TestCase):
+
+    def test_failed_page_does_not_truncate_keyword(self):
+        calls = dict()  # 存储格式{页码:请求次数}
+
+        def attraction_list(request):
+            page = int(request.query['PageNo'])
+            calls[page] = calls.get(page, 0) + 1
+            if page == 2 and calls[page] == 1:
+                return StubResponse(MALFORMED_PAGE)  # 第一次出错，重试成功
+            if page == 3:
+                return StubResponse(MALFORMED_PAGE)  # 一直出错
+            return StubResponse(list_page(page) if page <= 4 else '<html></html>')
+
+        with StubServer({'/SearchSite/Sight': attraction_list,
+                         '/SearchSite': lambda request: StubResponse(SEARCH_PAGE)}) as server:
+            with mock.patch.object(CityVacationsAdView, 'search_url', server.url('/SearchSite/?')):
+                discovery = AttractionDiscovery(HttpTransport(), concurrency=4, pages_ahead=2, page_retries=1)
+                attractions = discovery.discover(['广州'])
+        self.assertEqual(sorted(a.name for a in attractions),
+                         ['景点10', '景点11', '景点20', '景点21', '景点40', '景点41'])
+        self.assertEqual(calls[2], 2)
+        self.assertEqual(calls[3], 2)
+        self.assertEqual(discovery.failed_pages, [('广州', 3)])
+
+    def test_gives_up_on_keyword_that_always_fails(self):
+        calls = dict()  # 存储格式{搜索关键词:请求次数}
+
+        def attraction_list(request):
+            query = request.query['query']
+            calls[query] = calls.get(query, 0) + 1
+            if query == 'bad':
+                return StubResponse(status=500)
+            page = int(request.query['PageNo'])
+            return StubResponse(list_page(page) if page <= 2 else '<html></html>')
+
+        def search(request):
+            return StubResponse(SEARCH_PAGE.replace('gz', 'bad' if request.query['query'] == '坏' else 'gz'))
+
+        with StubServer({'/SearchSite/Sight': attraction_list, '/SearchSite': search}) as server:
+            with mock.patch.object(CityVacationsAdView, 'search_url', server.url('/SearchSite/?')):
+                discovery = AttractionDiscovery(HttpTransport(retries=0), concurrency=4, pages_ahead=2,
+                                                page_retries=1, max_failed_pages=3)
+                attractions = discovery.discover(['坏', '广州'])
+        self.assertEqual(sorted(a.name for a in attractions), ['景点10', '景点11', '景点20', '景点21'])
+        self.assertEqual(discovery.failed_keywords, ['坏'])
+        # 连续3页失败后放弃，已发出的页最多多请求pages_ahead-1页，每页请求1+page_retries次
+        self.assertLessEqual(calls['bad'], (3 + 1) * 2)
+        self.assertEqual({keyword for keyword, page in discovery.failed_pages}, {'坏'})
+        self.assertEqual(len(discovery.failed_pages), calls['bad'] // 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
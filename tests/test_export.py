@@ -0,0 +1,154 @@
+import csv
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from src.export_backend import ExportBackend, get_backend, register_backend
+from src.export_file import ExportFile, FileModel, FileType
+from src.tonghuashun import FundInfo
+
+
+def fund_rows(start: int, count: int) -> list:
+    return [['基金{0}'.format(i), '{0:06d}'.format(i), 'J{0}'.format(i), '股票型', i * 0.5]
+            for i in range(start, start + count)]
+
+
+class StreamingExportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.base = os.path.join(self.directory.name, 'funds')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_in_batches(self, file_type: FileType, rows: list):
+        """
+        与FundInfo.write_info相同：每40行保存一次，全部写完后close
+        """
+        fund_info = FundInfo()
+        fund_info.write_info(rows, self.base, file_type, streaming=True)
+        fund_info.close()
+
+    def test_streaming_xlsx_append(self):
+        self.write_in_batches(FileType.XLSX, fund_rows(0, 150))
+        self.write_in_batches(FileType.XLSX, fund_rows(150, 50))  # 再次打开追加
+        rows = list(ExportFile(self.base, FileType.XLSX).read_rows())
+        self.assertEqual(len(rows), 200)
+        self.assertEqual(rows[0], fund_rows(0, 1)[0])
+        self.assertEqual(rows[-1], fund_rows(199, 1)[0])
+
+    def test_streaming_csv_append(self):
+        self.write_in_batches(FileType.CSV, fund_rows(0, 150))
+        self.write_in_batches(FileType.CSV, fund_rows(150, 50))
+        with open(self.base + '.csv', newline='') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(len(rows), 200)
+        self.assertEqual(rows[199][1], '000199')
+        writer = ExportFile(self.base, FileType.CSV, FileModel.ADD, streaming=True)
+        self.assertEqual(writer.add_rows(iter(fund_rows(200, 2500)), batch_size=1000), 2500)
+        self.assertEqual(writer.row, 2700)
+        writer.close()
+
+    def test_streaming_xlsx_writes_on_close(self):
+        writer = ExportFile(self.base, FileType.XLSX, FileModel.ADD, streaming=True)
+        writer.add_rows(fund_rows(0, 10))
+        writer.save()
+        self.assertFalse(os.path.exists(writer.file_name))
+        writer.close()
+        self.assertEqual(len(list(ExportFile(self.base, FileType.XLSX).read_rows())), 10)
+
+    def test_write_info_without_close(self):
+        fund_info = FundInfo()
+        fund_info.write_info(fund_rows(0, 100), self.base, FileType.XLSX)
+        self.assertEqual(len(list(ExportFile(self.base, FileType.XLSX).read_rows())), 100)
+        fund_info.write_info(fund_rows(100, 20), self.base, FileType.XLSX)
+        rows = list(ExportFile(self.base, FileType.XLSX).read_rows())
+        self.assertEqual(len(rows), 120)
+        self.assertEqual(rows[-1], fund_rows(119, 1)[0])
+
+    def test_streaming_xls_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ExportFile(self.base, FileType.XLS, FileModel.ADD, streaming=True)
+
+
+def read_back(file_name: str, file_type: FileType) -> list:
+    """
+    读回文件中的全部行，数值统一转为浮点数的字符串比较（xlsx会把0.0读成0）
+    """
+    if file_type == FileType.CSV:
+        with open(file_name, newline='') as f:
+            rows = list(csv.reader(f))
+    elif file_type == FileType.JSONL:
+        with open(file_name, encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f]
+    elif file_type == FileType.PARQUET:
+        import pyarrow.parquet as pq
+        rows = [list(row.values()) for row in pq.read_table(file_name).to_pylist()]
+    elif file_type == FileType.SQLITE:
+        with sqlite3.connect(file_name) as conn:
+            rows = [list(row) for row in conn.execute('SELECT * FROM "My Worksheet"')]
+    else:
+        rows = list(ExportFile(file_name[:file_name.rindex('.')], file_type).read_rows())
+    return [[normalize(value) for value in row] for row in rows]
+
+
+def normalize(value) -> str:
+    return str(float(value)) if isinstance(value, (int, float)) else str(value)
+
+
+class ExportBackendTest(unittest.TestCase):
+
+    def test_round_trip_and_append(self):
+        expected = [[normalize(value) for value in row] for row in fund_rows(0, 30)]
+        with tempfile.TemporaryDirectory() as directory:
+            for file_type in FileType:
+                base = os.path.join(directory, 'funds')
+                writer = ExportFile(base, file_type)
+                self.assertEqual(writer.add_rows(fund_rows(0, 20), 'My Worksheet'), 20)
+                writer.save()
+                writer.close()
+                writer = ExportFile(base, file_type, FileModel.ADD)
+                self.assertEqual(writer.add_rows(iter(fund_rows(20, 10)), 'My Worksheet', batch_size=4), 10)
+                self.assertEqual(writer.row, 30, file_type)
+                writer.close()
+                self.assertEqual(read_back(writer.file_name, file_type), expected, file_type)
+
+    def test_save_persists_without_close(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for file_type in FileType:
+                base = os.path.join(directory, 'saved')
+                writer = ExportFile(base, file_type)
+                for start in range(0, 30, 10):
+                    writer.add_rows(fund_rows(start, 10), 'My Worksheet')
+                    writer.save()
+                    expected = [[normalize(value) for value in row] for row in fund_rows(0, start + 10)]
+                    self.assertEqual(read_back(writer.file_name, file_type), expected, file_type)
+                self.assertEqual(writer.row, 30, file_type)
+                writer.close()
+                self.assertEqual(len(read_back(writer.file_name, file_type)), 30, file_type)
+
+    def test_registry(self):
+        class NullBackend(ExportBackend):
+            def add_rows(self, rows) -> int:
+                return len(list(rows))
+
+            def flush(self):
+                pass
+
+            def close(self):
+                pass
+
+        with self.assertRaises(ValueError):
+            get_backend('null')
+        register_backend('null', NullBackend)
+        try:
+            self.assertIs(get_backend('null'), NullBackend)
+        finally:
+            from src import export_backend
+            export_backend.__backends__.pop('null')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+from src.extraction import find_poiid, has_comment, parse_sight_url, parse_star, parse_tab, strip_hqjson, \
+    strip_whitespace
+
+SIGHT_PAGE = '<html><script>var poiid = "76865";</script><title>广州塔</title></html>'
+
+
+class ExtractionTest(unittest.TestCase):
+
+    def test_find_poiid(self):
+        self.assertEqual(find_poiid(SIGHT_PAGE), 76865)
+        self.assertEqual(find_poiid(SIGHT_PAGE.encode('utf-8')), 76865)  # 不解码直接匹配
+        self.assertEqual(find_poiid(memoryview(SIGHT_PAGE.encode('utf-8'))), 76865)
+        self.assertIsNone(find_poiid(b'<html></html>'))
+
+    def test_parse_sight_url(self):
+        sight = parse_sight_url('https://you.ctrip.com/sight/guangzhou152/107540.html')
+        self.assertEqual((sight.district_name, sight.district_id, sight.resource_id), ('Guangzhou', 152, 107540))
+        self.assertIsNone(parse_sight_url('https://you.ctrip.com/place/guangzhou152.html'))
+
+    def test_parse_star(self):
+        self.assertEqual(parse_star('width:80%'), 4.0)
+        self.assertEqual(parse_star('width:100%;'), 5.0)
+        with self.assertRaises(AttributeError):
+            parse_star('display:none')
+
+    def test_parse_tab(self):
+        self.assertEqual(parse_tab(' 景点\n 120 '), ('景点', 120))
+        self.assertEqual(strip_whitespace(' 广州\t塔 '), '广州塔')
+
+    def test_strip_hqjson(self):
+        self.assertEqual(strip_hqjson('var hqjson={"000001":"J1"}'), '{"000001":"J1"}')
+
+    def test_has_comment(self):
+        self.assertTrue(has_comment('<div class="comment_single">'))
+        self.assertTrue(has_comment("<div id='c1' class='clearfix comment_single'>"))
+        self.assertFalse(has_comment('<div class="comment_single_extra">'))
+        self.assertFalse(has_comment('<p>comment_single</p>'))
+
+
+if __name__ == '__main__':
+    unittest.main()
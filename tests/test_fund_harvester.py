@@ -0,0 +1,55 @@
+import json
+import time
+import unittest
+from src.fund_harvester import FundHarvester
+from src.tonghuashun import FundInfo, FundCodeInfo
+from src.transport import HttpTransport
+from tests.stub_server import StubServer, StubResponse
+
+
+class ListWriter(object):
+    """
+    记录写入行的导出文件
+    """
+
+    def __init__(self):
+        self.rows = list()
+
+    def add_rows(self, rows: list) -> int:
+        self.rows.extend(rows)
+        return len(rows)
+
+    def save(self):
+        pass
+
+
+def fund_detail(request):
+    fund_code = request.path.rsplit('/', 1)[1]
+    if fund_code == '000404':
+        return StubResponse(json.dumps({'data': []}))
+    return StubResponse(json.dumps({'data': [{'name': '基金' + fund_code, 'hqcode': 'J' + fund_code,
+                                              'fundtype': '股票型', 'levelOfRisk': '中', 'themeList': []}]}))
+
+
+class FundHarvesterTest(unittest.TestCase):
+
+    def test_rate_is_scoped_to_harvester(self):
+        with StubServer({'/myfund/': fund_detail}) as server:
+            transport = HttpTransport()
+            fund_info = FundInfo(transport)
+            fund_info.fund_detail_url = server.url('/myfund/')
+            harvester = FundHarvester(fund_info, concurrency=4, rate=50)
+            writer = ListWriter()
+            start = time.monotonic()
+            count = harvester.harvest([FundCodeInfo(code, None) for code in ('000001', '000002', '000404',
+                                                                                '000003', '000004')], writer)
+            self.assertGreaterEqual(time.monotonic() - start, 0.08)
+            self.assertEqual(count, 4)
+            self.assertEqual(sorted(row[1] for row in writer.rows), ['000001', '000002', '000003', '000004'])
+            self.assertEqual(harvester.empty, ['000404'])
+            self.assertEqual(transport.rate_limiter.host_rates, {})  # 共享连接池的频率不变
+            transport.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+from src.fund_watcher import FundWatcher
+from src.tonghuashun import FundCodeInfo, FundInfo, FundTrend
+from src.transport import HttpTransport
+from tests.stub_server import StubServer, StubResponse
+from tests.support import valuation_payload
+
+
+class FakeClock(object):
+    """
+    假时钟：sleep只推进时间
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+class FundWatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.changes = {'J1': 0.5, 'J2': 1.5, 'J3': -2.5}  # 存储格式{信息代码:涨跌幅}
+        self.server = StubServer({'/': self.valuation}).start()
+        self.addCleanup(self.server.close)
+        fund_info = FundInfo(HttpTransport(retries=0))
+        fund_info.valuation_url = self.server.url('/?info=vm_fd_{0}&start={1}')
+        funds = [FundCodeInfo(code[1:], code) for code in ['J1', 'J2', 'J3', 'J4']]
+        self.watcher = FundWatcher(fund_info, funds, concurrency=4)
+        self.addCleanup(self.watcher.close)
+
+    def valuation(self, request):
+        special_code = request.query['info'][len('vm_fd_'):]
+        if special_code not in self.changes:
+            return StubResponse('vm_fd_{0}~0930,abc,1.0;'.format(special_code))  # 格式错误
+        return StubResponse(valuation_payload(special_code, points=5, change=self.changes[special_code]))
+
+    def test_reports_only_changed_trends(self):
+        with self.assertLogs('src.fund_watcher', 'WARNING') as logs:
+            changes = self.watcher.tick()
+        self.assertIn('J4', logs.output[0])
+        self.assertEqual(sorted((c.fund_code, c.trend, c.previous) for c in changes),
+                         [('1', FundTrend.SMALL_ROSE, None), ('2', FundTrend.ROSE, None),
+                          ('3', FundTrend.MUCH_FALL, None)])
+        with self.assertLogs('src.fund_watcher', 'WARNING'):
+            self.assertEqual(self.watcher.tick(), [])
+        self.changes['J2'] = 0.2
+        with self.assertLogs('src.fund_watcher', 'WARNING'):
+            changes = self.watcher.tick()
+        self.assertEqual([(c.fund_code, c.trend, c.previous) for c in changes],
+                         [('2', FundTrend.SMALL_ROSE, FundTrend.ROSE)])
+
+    def test_request_errors_are_logged(self):
+        self.watcher.fund_info.valuation_url = 'http://127.0.0.1:1/?info=vm_fd_{0}&start={1}'  # 拒绝连接
+        with self.assertLogs('src.fund_watcher', 'WARNING') as logs:
+            self.assertEqual(self.watcher.tick(), [])
+        self.assertEqual(len(logs.output), 4)
+        self.assertIn('请求实时估值失败', logs.output[0])
+
+    def test_run_skips_missed_intervals(self):
+        clock = FakeClock()
+        durations = [10, 130, 10, 70, 10]  # 每次扫描耗时
+        started = list()
+
+        def tick():
+            started.append(clock())
+            clock.now += durations[len(started) - 1]
+            return []
+
+        self.watcher.tick = tick
+        self.watcher.interval = 60
+        self.watcher.run(lambda changes: None, ticks=5, clock=clock, sleep=clock.sleep)
+        # 第2次扫描到190秒才结束，120和180秒的扫描不补做；第4次到370秒结束，跳过360秒
+        self.assertEqual(started, [0, 60, 240, 300, 420])
+
+
+if __name__ == '__main__':
+    unittest.main()
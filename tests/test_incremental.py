@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+from src.incremental import WatermarkStore, crawl_new_comments
+from src.xiecheng import ParserBackend
+from tests.support import comment_html
+
+PAGE_SIZE = 3
+
+
+class FakeView(object):
+    """
+    按发布日期从新到旧分页返回评论，publish插入的新评论使旧评论后移
+    """
+    parser = ParserBackend.LXML
+    poi_id = 1
+    resource_id = 2
+
+    def __init__(self, comments: list):
+        self.comments = comments  # [(作者, 发布日期)]，从新到旧
+        self.pages = list()  # 请求过的分页
+
+    def publish(self, author: str, date_published: str):
+        self.comments.insert(0, (author, date_published))
+
+    def resolve_sight(self, url):
+        pass
+
+    def fetch_page(self, page_now: int) -> str:
+        self.pages.append(page_now)
+        start = (page_now - 1) * PAGE_SIZE
+        return '<div class="comment_ctrip">{0}</div>'.format(
+            ''.join(comment_html(*item) for item in self.comments[start:start + PAGE_SIZE]))
+
+
+def authors(comments: list) -> list:
+    return [comment.author for comment in comments]
+
+
+class IncrementalCrawlTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'watermarks.json')
+        self.view = FakeView([('c{0}'.format(i), '2019-10-{0:02d}'.format(20 - i)) for i in range(8)])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def crawl(self, max_pages: int = None) -> list:
+        self.view.pages = list()
+        return authors(crawl_new_comments(self.view, '', WatermarkStore(self.path), max_pages))
+
+    def test_stops_at_seen_comments(self):
+        self.assertEqual(self.crawl(), ['c{0}'.format(i) for i in range(8)])
+        self.view.publish('n1', '2019-10-21')
+        self.view.publish('n2', '2019-10-21')
+        self.assertEqual(self.crawl(), ['n2', 'n1'])
+        self.assertEqual(self.view.pages, [1])
+        self.assertEqual(self.crawl(), [])
+
+    def test_truncated_crawl_resumes(self):
+        self.assertEqual(self.crawl(max_pages=1), ['c0', 'c1', 'c2'])
+        store = WatermarkStore(self.path)
+        self.assertIsNone(store.get(1, 2))  # 未翻到最后一页，不推进抓取位置
+        self.assertEqual(store.get_resume(1, 2).page, 2)
+        self.view.publish('n1', '2019-10-21')  # c2后移到第2页
+        self.assertEqual(self.crawl(max_pages=1), ['c3', 'c4'])
+        self.assertEqual(self.crawl(max_pages=1), ['c5', 'c6', 'c7'])
+        self.assertEqual(self.crawl(max_pages=1), [])  # 空页，抓取完成
+        self.assertEqual(WatermarkStore(self.path).get(1, 2).date_published, '2019-10-20')
+        self.assertEqual(self.crawl(), ['n1'])
+        self.assertEqual(self.view.pages, [1])
+
+    def test_truncated_crawl_keeps_old_watermark(self):
+        self.crawl()
+        for i in range(7):
+            self.view.publish('n{0}'.format(i), '2019-11-{0:02d}'.format(i + 1))
+        self.assertEqual(self.crawl(max_pages=2), ['n6', 'n5', 'n4', 'n3', 'n2', 'n1'])
+        self.assertEqual(WatermarkStore(self.path).get(1, 2).date_published, '2019-10-20')
+        self.assertEqual(self.crawl(max_pages=2), ['n0'])
+        self.assertEqual(WatermarkStore(self.path).get(1, 2).date_published, '2019-11-07')
+        self.assertIsNone(WatermarkStore(self.path).get_resume(1, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import threading
+import unittest
+from src.transport import HttpTransport
+from src.xiecheng import CommentView, ListView, ParserBackend
+from tests.support import SIGHT_URL, ScraperSite, rebase, site_urls
+
+
+class NumberView(ListView):
+    """
+    每页3个数字，共pages页，记录每页的请求次数
+    """
+
+    def __init__(self, pages: int, fail_once: set = (), **kwargs):
+        """
+        :param fail_once: 第一次请求时出错的页码
+        """
+        self.pages = pages
+        self.fail_once = set(fail_once)
+        self.loads = dict()  # 存储格式{页码:请求次数}
+        self.threads = set()  # 请求页面的线程名
+        self.__lock__ = threading.Lock()
+        for name, value in kwargs.items():
+            setattr(self, name, value)
+
+    def __cache_key__(self, page: int) -> tuple:
+        return ('numbers', page)
+
+    def __load_page__(self, key: tuple) -> list:
+        page = key[1]
+        with self.__lock__:
+            self.loads[page] = self.loads.get(page, 0) + 1
+            self.threads.add(threading.current_thread().name)
+            if page in self.fail_once:
+                self.fail_once.discard(page)
+                raise ValueError(page)
+        return [page * 10 + i for i in range(3)] if page <= self.pages else []
+
+    def next_page(self):
+        self.page_now += 1
+        return self.__get_page__(self.page_now)
+
+    def before_page(self):
+        self.page_now -= 1
+        return self.__get_page__(self.page_now)
+
+    def show_current_view(self):
+        print(self.__get_page__(self.page_now))
+
+
+class ListViewTest(unittest.TestCase):
+
+    def test_abstract_hooks_are_enforced(self):
+        with self.assertRaises(TypeError):
+            ListView()
+
+        class Incomplete(ListView):
+            def __cache_key__(self, page: int) -> tuple:
+                return (page,)
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+        NumberView(1)
+
+    def test_iterates_until_empty_page(self):
+        view = NumberView(3, page_now=2)
+        self.assertEqual(list(view), [20, 21, 22, 30, 31, 32])
+        self.assertEqual(view.loads, {2: 1, 3: 1, 4: 1})
+
+    def test_page_cache_is_lru(self):
+        view = NumberView(5, cache_size=2)
+        for page in [1, 2, 1, 3, 1, 2]:  # 访问3时淘汰2，访问2时淘汰3
+            view.__get_page__(page)
+        self.assertEqual(view.loads, {1: 1, 2: 2, 3: 1})
+
+    def test_prefetch(self):
+        with NumberView(4, prefetch=2) as view:
+            self.assertEqual(view.next_page(), [20, 21, 22])
+            self.assertEqual(list(view), [20, 21, 22, 30, 31, 32, 40, 41, 42])
+            executor = view.__prefetch_executor__
+        self.assertEqual(view.loads, {2: 1, 3: 1, 4: 1, 5: 1})  # 每页只请求一次
+        self.assertGreater(len(view.threads), 1)  # 后续页在预取线程中请求
+        self.assertIsNone(view.__prefetch_executor__)
+        self.assertTrue(executor._shutdown)
+        self.assertEqual(view.__get_page__(3), [30, 31, 32])  # 关闭后仍可读取缓存
+        view.close()
+
+    def test_failed_prefetch_is_reloaded(self):
+        view = NumberView(3, prefetch=1, fail_once={3})
+        self.assertEqual(list(view), [10, 11, 12, 20, 21, 22, 30, 31, 32])
+        self.assertEqual(view.loads[3], 2)
+        view.close()
+        view.close()  # 重复关闭不出错
+
+    def test_comment_view_prefetch(self):
+        with ScraperSite(pages=3).server() as server, site_urls(server.base_url):
+            with CommentView(transport=HttpTransport(), parser=ParserBackend.LXML, prefetch=2) as view:
+                view.resolve_sight(rebase(SIGHT_URL, server.base_url))
+                view.page_now = 1
+                comments = list(view)
+            pages = [int(request.form['pagenow']) for request in server.requests if 'pagenow' in request.form]
+        self.assertEqual(len(comments), 9)
+        self.assertEqual(sorted(set(pages)), sorted(pages))  # 每页只请求一次
+        self.assertTrue({1, 2, 3, 4} <= set(pages))
+
+
+if __name__ == '__main__':
+    unittest.main()
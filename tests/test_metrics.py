@@ -0,0 +1,47 @@
+import unittest
+from src.metrics import METRICS, enable_metrics
+from src.transport import HttpTransport, route_template
+from src.xiecheng import ParserBackend, parse_comment_page
+from tests.stub_server import StubServer, StubResponse
+from tests.support import load_fixture
+
+
+class MetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        enable_metrics()
+        METRICS.reset()
+
+    def tearDown(self):
+        enable_metrics(False)
+        METRICS.reset()
+
+    def test_route_template(self):
+        self.assertEqual(route_template('https://you.ctrip.com/sight/guangzhou152/107540.html?a=1'),
+                         'you.ctrip.com/sight/{id}/{id}')
+        self.assertEqual(route_template('http://fund.10jqka.com.cn/data/client/myfund/000001'),
+                         'fund.10jqka.com.cn/data/client/myfund/{id}')
+        self.assertEqual(route_template('https://you.ctrip.com/SearchSite/?query=x'), 'you.ctrip.com/SearchSite/')
+
+    def test_http_endpoint_labels(self):
+        with StubServer({'/': lambda request: StubResponse('数据')}) as server:
+            transport = HttpTransport()
+            for code in ('000001', '000002'):
+                transport.get(server.url('/myfund/' + code))
+            transport.get(server.url('/myfund/000003'), endpoint='fund_detail')
+            transport.close()
+        http = METRICS.snapshot()['http']
+        self.assertEqual(sorted(http), ['127.0.0.1:{0}/myfund/{{id}}'.format(server.base_url.rsplit(':', 1)[1]),
+                                        'fund_detail'])
+        self.assertEqual(http['fund_detail']['bytes'], len('数据'.encode('utf-8')))
+
+    def test_parse_counts_bytes(self):
+        html = load_fixture('comment_page.html')
+        parse_comment_page(html, ParserBackend.LXML)
+        stats = METRICS.get('parse', 'comment_lxml')
+        self.assertEqual(stats.nbytes, len(html.encode('utf-8')))
+        self.assertEqual(stats.items, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+from src.page_archive import PageArchive, reparse, zstd_available
+from src.xiecheng import ParserBackend
+from tests.support import load_fixture
+
+
+class PageArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.archive = PageArchive(self.directory.name, codec='zlib')
+        for page, name in enumerate(['comment_page.html', 'comment_missing_author.html',
+                                     'comment_missing_star.html', 'comment_missing_style.html']):
+            self.archive.put('comment', 'https://you.ctrip.com/comment', {'pagenow': page}, load_fixture(name))
+
+    def tearDown(self):
+        self.archive.close()
+        self.directory.cleanup()
+
+    def test_get_latest_version(self):
+        self.archive.put('comment', 'https://you.ctrip.com/comment', {'pagenow': 0}, '<html></html>')
+        self.assertEqual(self.archive.get('https://you.ctrip.com/comment', {'pagenow': 0}).html, '<html></html>')
+        self.assertEqual(len(self.archive), 4)
+        self.assertEqual(self.archive.rebuild_index(), 4)
+
+    def test_reparse_skips_malformed_pages(self):
+        for parser in (ParserBackend.BS4, ParserBackend.LXML):
+            pages = list(reparse(self.archive, 'comment', workers=1, parser=parser, chunk_size=2))
+            self.assertEqual([page.body['pagenow'] for page in pages], [0, 1, 2, 3])
+            self.assertEqual(len(pages[0].elements), 3)
+            self.assertEqual([page.elements for page in pages[1:]], [None, None, None])
+
+    def test_segment_rollover(self):
+        with tempfile.TemporaryDirectory() as directory:
+            archive = PageArchive(directory, segment_size=4096, codec='zlib')
+            pages = {page: os.urandom(1024).hex() + load_fixture('comment_page.html')
+                     for page in range(20)}  # 随机内容难以压缩，每条记录超过1KB
+            for page, html in pages.items():
+                archive.put('comment', 'https://you.ctrip.com/comment', {'pagenow': page}, html)
+            segments = archive.segments()
+            self.assertGreater(len(segments), 5)
+            for segment in segments[:-1]:
+                self.assertLessEqual(os.path.getsize(archive.segment_path(segment)), 4096)
+            for page, html in pages.items():
+                self.assertEqual(archive.get('https://you.ctrip.com/comment', {'pagenow': page}).html, html)
+            self.assertEqual(archive.rebuild_index(), 20)
+            parsed = list(reparse(archive, 'comment', workers=1, chunk_size=3))
+            self.assertEqual(sorted(page.body['pagenow'] for page in parsed), list(range(20)))
+            archive.close()
+            reopened = PageArchive(directory, segment_size=4096, codec='zlib')  # 从最后一个分段继续写入
+            reopened.put('comment', 'https://you.ctrip.com/comment', {'pagenow': 20}, '<html></html>')
+            self.assertEqual(reopened.segments()[:len(segments)], segments)
+            self.assertEqual(len(reopened), 21)
+            reopened.close()
+
+    @unittest.skipUnless(zstd_available(), '未安装zstandard')
+    def test_zstd_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            archive = PageArchive(directory, codec='zstd')
+            html = load_fixture('comment_page.html')
+            archive.put('comment', 'https://you.ctrip.com/comment', {'pagenow': 1}, html)
+            self.archive.put('comment', 'https://you.ctrip.com/comment', {'pagenow': 9}, html)  # zlib归档不受影响
+            self.assertEqual(archive.get('https://you.ctrip.com/comment', {'pagenow': 1}).html, html)
+            self.assertEqual(archive.rebuild_index(), 1)
+            pages = list(reparse(archive, 'comment', workers=1))
+            self.assertEqual(len(pages[0].elements), 3)
+            archive.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
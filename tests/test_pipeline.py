@@ -0,0 +1,44 @@
+import unittest
+from unittest import mock
+from src.pipeline import CommentPipeline
+from src.transport import HttpTransport
+from src.xiecheng import CommentView
+from tests.stub_server import StubServer, StubResponse
+from tests.support import load_fixture
+
+# 存储格式{resourceId:[各分页网页]}，超出的分页为没有评论的网页
+PAGES = {
+    '1': [load_fixture('comment_page.html'), load_fixture('comment_missing_style.html'),
+          load_fixture('comment_page.html')],
+    '2': ['<?xml version="1.0" encoding="utf-8"?>' + load_fixture('comment_page.html')],  # 带编码声明
+}
+
+
+def sight(request):
+    if 'missing' in request.path:
+        return StubResponse('<html>景点不存在</html>')
+    return StubResponse('<script>var poiid = "99";</script>')
+
+
+def comments(request):
+    pages = PAGES[request.form['resourceId']]
+    page = int(request.form['pagenow'])
+    return StubResponse(pages[page - 1] if page <= len(pages) else load_fixture('comment_page_empty.html'))
+
+
+class CommentPipelineTest(unittest.TestCase):
+
+    def test_bad_pages_do_not_abort_run(self):
+        with StubServer({'/sight': sight, '/comment': comments}) as server:
+            urls = [server.url('/sight/guangzhou152/1.html'), server.url('/sight/guangzhou152/2.html'),
+                    server.url('/sight/missing152/3.html')]
+            with mock.patch.object(CommentView, 'comment_url', server.url('/comment')):
+                pipeline = CommentPipeline(io_workers=2, parse_workers=2, transport=HttpTransport())
+                result = sorted((page.url[-6:], page.page, len(page.comments)) for page in pipeline.run(urls))
+        self.assertEqual(result, [('1.html', 1, 3), ('1.html', 3, 3), ('2.html', 1, 3)])
+        self.assertEqual(pipeline.failed_pages, [(urls[0], 2)])
+        self.assertEqual(pipeline.failed_urls, [urls[2]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import json
+import os
+import tempfile
+import unittest
+from src.cache import DirectoryCacheBackend, SqliteCacheBackend
+from src.replay import BenchmarkResult, FixtureArchive, FixtureMissing, ReplayServer, ReplayTransport, \
+    compare_results, fixture_key, run_benchmark, save_results
+from src.transport import HttpTransport
+from tests.support import SIGHT_URL, record_site, scenarios
+
+
+class ReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def archives(self):
+        yield FixtureArchive(SqliteCacheBackend(os.path.join(self.directory.name, 'fixtures.db')))
+        yield FixtureArchive(DirectoryCacheBackend(os.path.join(self.directory.name, 'fixtures')))
+
+    def test_fixture_key_ignores_host_and_order(self):
+        self.assertEqual(fixture_key('post', 'https://a.com/c?b=2&a=1', data={'y': 1, 'x': 2}),
+                         fixture_key('POST', '/c?a=1&b=2', data=b'x=2&y=1'))
+        self.assertNotEqual(fixture_key('GET', '/c?a=1'), fixture_key('GET', '/c?a=2'))
+
+    def test_record_and_replay_all_scrapers(self):
+        for archive in self.archives():
+            record_site(archive, pages=3)
+            self.assertGreater(len(archive), 0)
+            transport = ReplayTransport(archive)
+            for name, scenario, args in scenarios(ReplayTransport(archive), pages=3):
+                pages, items = scenario(*args)
+                self.assertGreater(items, 0, (archive.backend, name))
+            with self.assertRaises(FixtureMissing):
+                transport.get('https://you.ctrip.com/not-recorded')
+            self.assertEqual(ReplayTransport(archive, strict=False).get('https://a.com/missing').status_code, 404)
+            archive.close()
+
+    def test_latency_and_jitter(self):
+        delays = list()
+        for archive in self.archives():
+            record_site(archive, pages=1)
+            transport = ReplayTransport(archive, latency=0.05, jitter=0.01, seed=1, sleep=delays.append)
+            transport.get(SIGHT_URL)
+            transport.get(SIGHT_URL)
+            archive.close()
+        self.assertEqual(delays[:2], delays[2:])  # 种子相同，延迟相同
+        self.assertTrue(all(0.04 <= delay <= 0.06 for delay in delays))
+
+    def test_replay_server(self):
+        archive = FixtureArchive.open(os.path.join(self.directory.name, 'fixtures.db'))
+        record_site(archive, pages=1)
+        server = ReplayServer(archive).start()
+        try:
+            transport = HttpTransport()
+            response = transport.get(server.base_url + '/sight/guangzhou152/107540.html')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('poiid', response.text)
+            self.assertEqual(transport.get(server.base_url + '/missing').status_code, 404)
+            transport.close()
+        finally:
+            server.close()
+            archive.close()
+
+    def test_compare_results(self):
+        baseline = os.path.join(self.directory.name, 'baseline.json')
+        save_results([BenchmarkResult('comments', 100, 1000, 1.0, 0.5, 1000)], baseline)
+        self.assertEqual(compare_results([BenchmarkResult('comments', 100, 1000, 1.1, 0.55, 1100)], baseline), [])
+        regressions = compare_results([BenchmarkResult('comments', 100, 1000, 2.0, 1.0, 2000),
+                                       BenchmarkResult('new', 1, 1, 1.0, 1.0, 1)], baseline)
+        self.assertEqual(len(regressions), 3)
+        with open(baseline, encoding='utf-8') as f:
+            self.assertEqual(json.load(f)[0]['pages_per_second'], 100)
+
+    def test_run_benchmark(self):
+        archive = FixtureArchive.open(os.path.join(self.directory.name, 'fixtures.db'))
+        record_site(archive, pages=2)
+        name, scenario, args = scenarios(ReplayTransport(archive), pages=2)[0]
+        result = run_benchmark(name, scenario, *args)
+        archive.close()
+        self.assertEqual(result.pages, 3)
+        self.assertGreater(result.items, 0)
+        self.assertGreater(result.parse_seconds, 0)
+        self.assertGreater(result.peak_memory, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import threading
+import time
+import unittest
+from src.scheduler import BloomFilter, CrawlScheduler, FingerprintSet, HostPolicy, InlineExecutor, Job, JobType, \
+    fingerprint
+
+
+class FakeClock(object):
+    """
+    假时钟：sleep只推进时间，不真正等待
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+class CrawlSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.started = list()  # 存储格式[(时间, 链接)]
+
+    def scheduler(self, **kwargs) -> CrawlScheduler:
+        return CrawlScheduler(executor=InlineExecutor(), clock=self.clock, sleep=self.clock.sleep, **kwargs)
+
+    def job(self, url: str, job_type: JobType = JobType.COMMENT_PAGE, follow_up: list = None, **kwargs) -> Job:
+        def handler(job: Job):
+            self.started.append((self.clock(), job.url))
+            return follow_up
+
+        return Job(job_type, url, handler, **kwargs)
+
+    def test_dedup_by_url_and_body(self):
+        scheduler = self.scheduler()
+        self.assertTrue(scheduler.submit(self.job('http://a.com/c', body={'page': 1, 'poi': 2})))
+        self.assertFalse(scheduler.submit(self.job('http://a.com/c', body={'poi': 2, 'page': 1})))
+        self.assertTrue(scheduler.submit(self.job('http://a.com/c', body={'page': 2, 'poi': 2})))
+        self.assertEqual(scheduler.duplicates, 1)
+        self.assertEqual(scheduler.run(), 2)
+
+    def test_priority_and_host_rate(self):
+        scheduler = self.scheduler(host_policies={'a.com': HostPolicy(1, rate=2)})
+        scheduler.submit_all([self.job('http://a.com/search', JobType.SEARCH),
+                              self.job('http://a.com/list', JobType.LIST_PAGE),
+                              self.job('http://a.com/comment', JobType.COMMENT_PAGE),
+                              self.job('http://a.com/urgent', JobType.SEARCH, priority=-1)])
+        self.assertEqual(scheduler.run(), 4)
+        self.assertEqual(self.started, [(0.0, 'http://a.com/urgent'), (0.5, 'http://a.com/comment'),
+                                        (1.0, 'http://a.com/list'), (1.5, 'http://a.com/search')])
+
+    def test_hosts_are_limited_independently(self):
+        scheduler = self.scheduler(host_policies={'a.com': HostPolicy(1, rate=1), 'b.com': HostPolicy(1, rate=4)})
+        scheduler.submit_all([self.job('http://a.com/{0}'.format(i)) for i in range(2)] +
+                             [self.job('http://b.com/{0}'.format(i)) for i in range(4)])
+        scheduler.run()
+        self.assertEqual([t for t, url in self.started if 'a.com' in url], [0.0, 1.0])
+        self.assertEqual([t for t, url in self.started if 'b.com' in url], [0.0, 0.25, 0.5, 0.75])
+        self.assertEqual(self.clock(), 1.0)  # 两个域名交替执行，不需要等待到1.75
+
+    def test_follow_up_and_failures(self):
+        def fail(job: Job):
+            raise ValueError(job.url)
+
+        scheduler = self.scheduler(default_policy=HostPolicy(2))
+        second = self.job('http://a.com/2', follow_up=[self.job('http://a.com/1')])  # 重复的后续任务被丢弃
+        scheduler.submit_all([self.job('http://a.com/1', follow_up=[second]), Job(JobType.SEARCH, 'http://a.com/x', fail)])
+        self.assertEqual(scheduler.run(), 3)
+        self.assertEqual(scheduler.completed, 2)
+        self.assertEqual(scheduler.duplicates, 1)
+        self.assertEqual([job.url for job, e in scheduler.failed], ['http://a.com/x'])
+        self.assertEqual(scheduler.run(max_jobs=1), 0)
+
+    def test_host_concurrency_with_threads(self):
+        running = {'now': 0, 'max': 0}
+        lock = threading.Lock()
+
+        def handler(job: Job):
+            with lock:
+                running['now'] += 1
+                running['max'] = max(running['max'], running['now'])
+            time.sleep(0.02)
+            with lock:
+                running['now'] -= 1
+
+        scheduler = CrawlScheduler(concurrency=8, host_policies={'a.com': HostPolicy(2)})
+        scheduler.submit_all(Job(JobType.COMMENT_PAGE, 'http://a.com/{0}'.format(i), handler) for i in range(10))
+        self.assertEqual(scheduler.run(), 10)
+        self.assertEqual(running['max'], 2)
+
+
+class DedupTest(unittest.TestCase):
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(capacity=10000, error_rate=0.01)
+        members = [fingerprint('http://a.com/{0}'.format(i)) for i in range(10000)]
+        self.assertGreater(sum(1 for item in members if bloom.add(item)), 9900)  # 误判的新元素add返回False
+        self.assertTrue(all(item in bloom for item in members))  # 不会漏判
+        self.assertFalse(bloom.add(members[0]))
+        false_positives = sum(1 for i in range(10000) if fingerprint('http://b.com/{0}'.format(i)) in bloom)
+        self.assertLess(false_positives, 200)  # 误判率约1%
+
+    def test_fingerprint_set(self):
+        dedup = FingerprintSet()
+        self.assertTrue(dedup.add(fingerprint('http://a.com/', {'b': 1})))
+        self.assertFalse(dedup.add(fingerprint('http://a.com/', {'b': 1})))
+        self.assertEqual(len(dedup), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+from unittest import mock
+from src.transport import HttpTransport
+from src.xiecheng import CityVacationsAdView, DataType, PageCache
+from tests.stub_server import StubServer, StubResponse
+from tests.support import SEARCH_PAGE
+
+
+class SearchCacheTest(unittest.TestCase):
+
+    def test_cache_per_transport(self):
+        cache = PageCache(16)
+        with StubServer({'/SearchSite': lambda request: StubResponse(SEARCH_PAGE)}) as server:
+            with mock.patch.object(CityVacationsAdView, 'search_url', server.url('/SearchSite/?')):
+                live, replay = HttpTransport(), HttpTransport()
+                first = CityVacationsAdView(transport=live, search_cache=cache)
+                first.send_search_request('广州')
+                self.assertIsNotNone(first.ResponseView.response)
+                second = CityVacationsAdView(transport=live, search_cache=cache)
+                second.send_search_request(' 广州 ')  # 归一化后命中缓存
+                self.assertIsNone(second.ResponseView.response)  # 缓存中不保存响应体
+                self.assertEqual(second.select_tab(DataType.ATTRACTION).url_entrance,
+                                 first.select_tab(DataType.ATTRACTION).url_entrance)
+                self.assertEqual(len(server.requests), 1)
+                CityVacationsAdView(transport=replay, search_cache=cache).send_search_request('广州')
+                self.assertEqual(len(server.requests), 2)  # 不同连接池不共用缓存
+                live.close()
+                replay.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import random
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import requests
+from src.transport import HttpTransport, HostRateLimiter
+from src.tonghuashun import FundInfo
+from tests.stub_server import StubServer, StubResponse
+
+
+class TransportTest(unittest.TestCase):
+
+    def test_reuses_connections(self):
+        with StubServer({'/': lambda request: StubResponse('ok')}) as server:
+            transport = HttpTransport()
+            for _ in range(20):
+                self.assertEqual(transport.get(server.url('/')).text, 'ok')
+            transport.close()
+            self.assertEqual(server.connections, 1)
+
+    def test_returns_response_after_retries(self):
+        with StubServer({'/': lambda request: StubResponse(status=503)}) as server:
+            transport = HttpTransport(retries=2, backoff_factor=0)
+            response = transport.get(server.url('/'))
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(len(server.requests), 3)
+            transport.close()
+
+    def test_fund_info_handles_server_errors(self):
+        with StubServer({'/': lambda request: StubResponse(status=503)}) as server:
+            fund_info = FundInfo(HttpTransport(retries=1, backoff_factor=0))
+            fund_info.valuation_url = server.url('/gz?info=vm_fd_{0}&start={1}')
+            fund_info.fund_detail_url = server.url('/myfund/')
+            self.assertEqual(fund_info.get_realtime_rate('J1', None), (False, None))
+            self.assertEqual(list(fund_info.get_all_fund_base_info(server.url('/hqcode.js'))), [])
+            self.assertIsNone(fund_info.get_func_info('000001'))
+            with self.assertRaises(requests.HTTPError):
+                fund_info.get_func_info('000001', raise_on_error=True)
+
+    def test_ensure_host_pool_size_only_grows(self):
+        transport = HttpTransport(pool_maxsize=10)
+        transport.ensure_host_pool_size('a.com', 4)
+        self.assertEqual(transport.session.get_adapter('http://a.com/').poolmanager.connection_pool_kw['maxsize'], 10)
+        transport.ensure_host_pool_size('a.com', 32)
+        transport.ensure_host_pool_size('a.com', 16)
+        self.assertEqual(transport.session.get_adapter('https://a.com/').poolmanager.connection_pool_kw['maxsize'], 32)
+        self.assertEqual(transport.session.get_adapter('https://b.com/').poolmanager.connection_pool_kw['maxsize'], 10)
+        transport.close()
+
+    def test_ensure_host_pool_size_is_atomic(self):
+        transport = HttpTransport(pool_maxsize=1)
+        sizes = list(range(2, 66))
+        random.Random(0).shuffle(sizes)
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            list(executor.map(lambda size: transport.ensure_host_pool_size('a.com', size), sizes))
+        self.assertEqual(transport.session.get_adapter('http://a.com/').poolmanager.connection_pool_kw['maxsize'], 65)
+        transport.close()
+
+    def test_replaced_host_pool_is_closed(self):
+        transport = HttpTransport(pool_maxsize=2)
+        default = transport.session.get_adapter('http://a.com/')
+        transport.ensure_host_pool_size('a.com', 4)
+        first = transport.session.get_adapter('http://a.com/')
+        with mock.patch.object(first, 'close', wraps=first.close) as close, \
+                mock.patch.object(default, 'close', wraps=default.close) as default_close:
+            transport.ensure_host_pool_size('a.com', 8)
+            transport.set_host_pool_size('a.com', 16)
+        self.assertEqual(close.call_count, 1)  # http和https共用一个连接池，只关闭一次
+        self.assertEqual(default_close.call_count, 0)  # 其他域名共用的连接池不关闭
+        transport.close()
+
+    def test_rate_limiter_spacing(self):
+        limiter = HostRateLimiter(host_rates={'a': 100})
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.wait('a')
+            limiter.wait('b')  # 未设置频率的域名不等待
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+
+
+if __name__ == '__main__':
+    unittest.main()
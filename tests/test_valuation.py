@@ -0,0 +1,30 @@
+import math
+import unittest
+from src.valuation import batch_stats, parse_valuation_payload
+from tests.support import generate_payloads
+
+
+class ValuationTest(unittest.TestCase):
+
+    def test_parse_payload(self):
+        series = parse_valuation_payload('vm_fd_J1~0930,1.01,1.00;0931,0.99,1.00;')
+        self.assertEqual(series.time.tolist(), [930, 931])
+        self.assertEqual(series.now.tolist(), [1.01, 0.99])
+        self.assertIsNone(parse_valuation_payload('vm_fd_J1~'))
+        self.assertIsNone(parse_valuation_payload('没有数据'))
+
+    def test_batch_matches_single_series(self):
+        series_list = [parse_valuation_payload(text) for text in generate_payloads(5, seed=1)]
+        series_list.insert(2, None)
+        stats = batch_stats(series_list)
+        for i, series in enumerate(series_list):
+            if series is None:
+                self.assertTrue(math.isnan(stats.mean[i]))
+                continue
+            expected = series.stats()
+            for name in ('mean', 'min', 'max', 'twap', 'last'):
+                self.assertAlmostEqual(getattr(stats, name)[i], expected[name], places=9)
+
+
+if __name__ == '__main__':
+    unittest.main()
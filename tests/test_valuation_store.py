@@ -0,0 +1,38 @@
+import os
+import tempfile
+import unittest
+from src.tonghuashun import FundInfo
+from src.transport import HttpTransport
+from src.valuation_store import ValuationStore
+from tests.stub_server import StubServer, StubResponse
+
+POINTS = ['0930,1.01,1.00', '0931,1.02,1.00', '0932,0.99,1.00']
+
+
+def valuation(request):
+    start = int(request.query['start'])
+    points = [point for point in POINTS if int(point[:4]) >= start]
+    return StubResponse('vm_fd_{0}~{1};'.format(request.query['info'], ';'.join(points)))
+
+
+class ValuationStoreTest(unittest.TestCase):
+
+    def test_update_is_incremental_per_trading_day(self):
+        with tempfile.TemporaryDirectory() as directory, StubServer({'/': valuation}) as server:
+            fund_info = FundInfo(HttpTransport())
+            fund_info.valuation_url = server.url('/?info=vm_fd_{0}&start={1}')
+            store = ValuationStore(os.path.join(directory, 'valuation.db'))
+            self.assertEqual(store.update(fund_info, 'J1', '2019-10-08'), 3)
+            self.assertEqual(server.requests[-1].query['start'], '0930')
+            self.assertEqual(store.update(fund_info, 'J1', '2019-10-08'), 0)
+            self.assertEqual(server.requests[-1].query['start'], '0932')  # 只请求最新时间点之后
+            self.assertEqual(store.update(fund_info, 'J1', '2019-10-09'), 3)
+            result = store.query('J1', '2019-10-08', '2019-10-09')
+            self.assertEqual(list(result), ['2019-10-08', '2019-10-09'])
+            self.assertEqual(result['2019-10-08'].time.tolist(), [930, 931, 932])
+            store.close()
+            fund_info.transport.close()
+
+
+if __name__ == '__main__':
+    unittest.main()